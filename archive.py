@@ -0,0 +1,277 @@
+"""Compact binary game archive with memory-mapped random access.
+
+A whole game database in one flat file, about two bytes per move, that
+readers mmap and index straight into: game k's header is a fixed-size
+record at a computable offset and its moves a slice of one contiguous
+array, so nothing before it is parsed.  Layout, little-endian:
+
+    file header   HEADER: magic, version, game and ply counts, section offsets
+    moves         ply_count uint16 moves, every game's back to back; a move
+                  is position.py's encoding (from | to << 6 | promotion << 12)
+    game table    game_count GAME_DTYPE records: first ply in the move array,
+                  length, date, result and string-table references
+    strings       string_count + 1 uint64 offsets, then the UTF-8 bytes
+
+Names, players and start FENs go to the string table once each however
+many games share them; index 0 is "none".  A date that is a plain
+'YYYY-MM-DD[ HH:MM:SS]' is stored as seconds since 1970 in the game
+record, anything else as a string.
+
+export_archive writes a GameStore out and import_archive reads an
+archive back into one.  The moves are the ones already checked when the
+games were stored, so neither direction replays them; replay.py can
+verify an imported database as usual.
+"""
+
+import mmap
+import os
+import struct
+import time
+from calendar import timegm
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("NumPy is needed for the binary game archive: pip install numpy") from None
+
+from gamestore import RESULTS, UNKNOWN_DATE
+
+MAGIC = b'SZGAMES\x00'
+VERSION = 1
+# magic, version, reserved, game_count, ply_count, moves_offset, games_offset, strings_offset, string_count
+HEADER = struct.Struct('<8sIIQQQQQQ')
+
+GAME_DTYPE = np.dtype([
+    ('first_ply', '<u8'),  # Index of the game's first move in the move array
+    ('plies', '<u4'),
+    ('played_at', '<u4'),  # Seconds since 1970, or a string index with DATE_IS_TEXT
+    ('name', '<u4'),  # String table indices, 0 for none
+    ('white', '<u4'),
+    ('black', '<u4'),
+    ('start_fen', '<u4'),
+    ('result', 'u1'),  # Index into gamestore.RESULTS
+    ('flags', 'u1'),
+    ('reserved', '<u2'),
+])
+
+# Game record flags
+DATE_ONLY = 1  # played_at holds a date without a time of day
+DATE_IS_TEXT = 2  # played_at is a string index
+
+MOVE_BUFFER = 1 << 16  # Moves gathered before a write
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def _encode_date(played_at):
+    """(seconds, flags), or None if the text is not a plain date."""
+    for layout, flags in (('%Y-%m-%d %H:%M:%S', 0), ('%Y-%m-%d', DATE_ONLY)):
+        try:
+            seconds = timegm(time.strptime(played_at, layout))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= seconds < 1 << 32:
+            return seconds, flags
+    return None
+
+
+def _decode_date(seconds, flags):
+    return time.strftime('%Y-%m-%d' if flags & DATE_ONLY else '%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+
+class ArchiveWriter:
+    """Streams games into a new archive file; use as a context manager or call close()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(bytes(HEADER.size))  # Filled in by close()
+        self.records = []
+        self.strings = {None: 0}
+        self.pending = []  # Moves not yet written
+        self.ply_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, text):
+        if not text:
+            return 0
+        return self.strings.setdefault(text, len(self.strings))
+
+    def add_game(self, moves, result='*', name=None, white=None, black=None, start_fen=None, played_at=None):
+        """Append one game; the arguments are as for GameStore.add_game."""
+        if result not in RESULTS:
+            raise ArchiveError(f"Unknown game result: {result}")
+        date = _encode_date(played_at)
+        if date is None:
+            date = self.string(played_at), DATE_IS_TEXT
+        self.records.append((self.ply_count, len(moves), date[0], self.string(name), self.string(white),
+                             self.string(black), self.string(start_fen), RESULTS.index(result), date[1], 0))
+        self.pending.extend(moves)
+        self.ply_count += len(moves)
+        if len(self.pending) >= MOVE_BUFFER:
+            self.flush_moves()
+
+    def flush_moves(self):
+        if self.pending:
+            self.file.write(np.array(self.pending, dtype='<u2').tobytes())
+            self.pending.clear()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush_moves()
+        games_offset = self.file.tell()
+        games_offset += -games_offset % 8  # Keep the game table 8-byte aligned
+        self.file.seek(games_offset)
+        self.file.write(np.array(self.records, dtype=GAME_DTYPE).tobytes())
+        strings_offset = self.file.tell()
+        texts = [text.encode('utf-8') for text in self.strings if text is not None]
+        offsets = np.zeros(len(texts) + 1, dtype='<u8')
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        self.file.write(offsets.tobytes())
+        self.file.write(b''.join(texts))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, len(self.records), self.ply_count, HEADER.size,
+                                    games_offset, strings_offset, len(texts)))
+        self.file.close()
+
+
+class GameArchive:
+    """Read-only, memory-mapped view of an archive file.
+
+    games and moves_array are NumPy arrays over the mapping itself: game(k),
+    moves(k) and move(k, ply) cost the same for the first game as for the
+    last, and a scan over moves_array runs at memory speed.  Game numbers
+    start at 0.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as archive_file:
+            try:
+                self.map = mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArchiveError(f"{path} is empty") from None
+        try:
+            if len(self.map) < HEADER.size:
+                raise ArchiveError(f"{path} is too short to be a game archive")
+            (magic, version, _, game_count, ply_count, moves_offset, games_offset, strings_offset,
+             string_count) = HEADER.unpack_from(self.map)
+            if magic != MAGIC:
+                raise ArchiveError(f"{path} is not a game archive")
+            if version != VERSION:
+                raise ArchiveError(f"{path} is archive version {version}, this program reads {VERSION}")
+            self.moves_array = np.frombuffer(self.map, dtype='<u2', count=ply_count, offset=moves_offset)
+            self.games = np.frombuffer(self.map, dtype=GAME_DTYPE, count=game_count, offset=games_offset)
+            self.string_offsets = np.frombuffer(self.map, dtype='<u8', count=string_count + 1,
+                                                offset=strings_offset)
+            self.text_offset = strings_offset + self.string_offsets.nbytes
+        except (ArchiveError, ValueError, struct.error) as e:
+            self.close()
+            raise ArchiveError(str(e)) from None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # The arrays point into the mapping, which cannot close while they exist
+        self.moves_array = self.games = self.string_offsets = None
+        self.map.close()
+
+    def __len__(self):
+        return len(self.games)
+
+    @property
+    def ply_count(self):
+        return len(self.moves_array)
+
+    def string(self, index):
+        if not index:
+            return None
+        start = self.text_offset + int(self.string_offsets[index - 1])
+        end = self.text_offset + int(self.string_offsets[index])
+        return self.map[start:end].decode('utf-8')
+
+    def moves(self, index):
+        """Game index's moves as a uint16 array over the file; no copy is made."""
+        record = self.games[index]
+        first = int(record['first_ply'])
+        return self.moves_array[first:first + int(record['plies'])]
+
+    def move(self, index, ply):
+        """The move played at ply (1 for the first move) of game index."""
+        record = self.games[index]
+        if not 1 <= ply <= record['plies']:
+            raise IndexError(f"Game {index} has no ply {ply}")
+        return int(self.moves_array[int(record['first_ply']) + ply - 1])
+
+    def game(self, index):
+        """(name, played_at, white, black, result, start_fen, ply_count), as GameStore.game returns."""
+        record = self.games[index]
+        flags = int(record['flags'])
+        played_at = record['played_at']
+        played_at = self.string(played_at) if flags & DATE_IS_TEXT else _decode_date(int(played_at), flags)
+        return (self.string(record['name']), played_at, self.string(record['white']), self.string(record['black']),
+                RESULTS[record['result']], self.string(record['start_fen']), int(record['plies']))
+
+    def iter_games(self):
+        """Yield (index, name, played_at, white, black, result, start_fen, moves) like GameStore.iter_games."""
+        for index in range(len(self.games)):
+            name, played_at, white, black, result, start_fen, _ = self.game(index)
+            yield index, name, played_at, white, black, result, start_fen, self.moves(index).tolist()
+
+
+def export_archive(store, path):
+    """Write every game of a GameStore to an archive; returns (games, seconds)."""
+    start = time.perf_counter()
+    exported = 0
+    with ArchiveWriter(path) as writer:
+        for _, name, played_at, white, black, result, start_fen, moves in store.iter_games():
+            writer.add_game(moves, result, name, white, black, start_fen, played_at)
+            exported += 1
+    return exported, time.perf_counter() - start
+
+
+def import_archive(store, path, batch_size=1000):
+    """Add every game of an archive to a GameStore, batch_size games per transaction; returns (games, seconds)."""
+    start = time.perf_counter()
+    imported = 0
+    with GameArchive(path) as archive:
+        games = archive.iter_games()
+        while imported < len(archive):
+            with store.transaction():
+                for _, name, played_at, white, black, result, start_fen, moves in games:
+                    store.add_game(moves, result, name=name, white=white, black=black, start_fen=start_fen,
+                                   played_at=played_at or UNKNOWN_DATE, validate=False)
+                    imported += 1
+                    if imported % batch_size == 0:
+                        break
+    return imported, time.perf_counter() - start
+
+
+def scan(path):
+    """Read every move of an archive in one pass; returns (plies, bytes, seconds).
+
+    Counts the promotions and folds all moves into a checksum, which
+    touches every byte of the move section the way a bulk replay does.
+    """
+    with GameArchive(path) as archive:
+        start = time.perf_counter()
+        np.count_nonzero(archive.moves_array >> 12)
+        np.bitwise_xor.reduce(archive.moves_array)
+        return archive.ply_count, archive.moves_array.nbytes, time.perf_counter() - start
+
+
+def file_size(path):
+    """Bytes on disk, a SQLite database's write-ahead log included."""
+    return sum(os.path.getsize(name) for name in (path, path + '-wal') if os.path.exists(name))
@@ -0,0 +1,327 @@
+"""Static evaluation of many positions at once with NumPy.
+
+For analysis over whole game databases (material curves, blunder
+candidates) where calling engine.evaluate once per position is the
+bottleneck.  Positions are encoded as an (N, 64) int8 array of
+position.Position piece codes plus an (N,) array of sides to move;
+planes() expands that to the (N, 12, 64) one-hot form for callers that
+want it.  evaluate_batch() scores the whole array in a handful of array
+operations:
+
+  material   piece values plus piece-square tables, the same numbers
+             engine.evaluate uses, so this term alone matches it exactly
+  mobility   squares each side attacks with knights, along diagonals
+             (bishops and queens) and along ranks and files (rooks and
+             queens), not counting its own pieces' squares; each square
+             counts once per kind of line however many pieces reach it,
+             and pins and checks are ignored
+  pawns      doubled, isolated and passed pawns
+
+Everything is computed on per-piece 64-bit boards (bit i is square i,
+row 0 being rank 8 as in position.py), packed from the int8 array, so
+the sliding attacks are a few shifts per direction for all N positions
+together rather than a walk over the board for each.  evaluate_position()
+is the same evaluation written square by square for one Position, the
+reference the batch version is checked and timed against.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("NumPy is needed for batch evaluation: pip install numpy") from None
+if not hasattr(np, 'bitwise_count'):  # The popcount everything below is counted with
+    raise ImportError(f"Batch evaluation needs NumPy 2.0 or later, found {np.__version__}: pip install -U numpy")
+
+from engine import SQUARE_SCORES, evaluate
+from position import (Position, WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK_FLAG, OCCUPANCY,
+                      KNIGHT_ATTACKS, rook_attacks, bishop_attacks)
+
+TERMS = ('material', 'mobility', 'pawns')
+
+# Centipawns per attacked square, by the way the square is reached
+MOBILITY_WEIGHTS = {'knight': 4, 'diagonal': 4, 'straight': 2}
+DOUBLED_PAWN = -10  # Per pawn beyond the first on a file
+ISOLATED_PAWN = -12  # Per pawn with no friendly pawn on either neighbouring file
+# Passed pawn bonus by row as seen by the pawn's own side (row 1 is its seventh rank)
+PASSED_PAWN = (0, 100, 60, 35, 20, 10, 5, 0)
+
+PIECE_KINDS = (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)
+PIECE_CODES = tuple(kind | color << 3 for color in (0, 1) for kind in PIECE_KINDS)  # Plane order of planes()
+
+
+def _byte_scores():
+    # BYTE_SCORES[piece, row, byte]: SQUARE_SCORES summed over the squares of one board row whose
+    # bits are set in byte, so a bitboard is scored with eight lookups instead of 64
+    squares = np.array(SQUARE_SCORES, dtype=np.int32).reshape(16, 8, 8)
+    bits = (np.arange(256)[:, None] >> np.arange(8) & 1).astype(np.int32)  # [byte, col]
+    return np.einsum('bc,prc->prb', bits, squares)
+
+
+BYTE_SCORES = _byte_scores()
+
+FILE_A = np.uint64(0x0101010101010101)
+FILE_H = FILE_A << np.uint64(7)
+NOT_FILE_A = ~FILE_A
+NOT_FILE_H = ~FILE_H
+ALL_SQUARES = ~np.uint64(0)
+FILES = np.array([0x0101010101010101 << col for col in range(8)], dtype=np.uint64)
+ROWS = np.array([0xFF << (row * 8) for row in range(8)], dtype=np.uint64)
+
+
+def _step(bits, d_col, d_row):
+    # Move every set square one step by (d_col, d_row); squares leaving the board are dropped
+    shift = np.uint64(abs(d_row * 8 + d_col))
+    bits = bits << shift if d_row * 8 + d_col > 0 else bits >> shift
+    if d_col > 0:
+        bits &= NOT_FILE_A
+    elif d_col < 0:
+        bits &= NOT_FILE_H
+    return bits
+
+
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def _knight_attacks(knights):
+    # Two-column jumps as two one-column steps, so both edge files are cleared on the way
+    east, west = _step(knights, 1, 0), _step(knights, -1, 0)
+    one = east | west
+    two = _step(east, 1, 0) | _step(west, -1, 0)
+    return _step(one, 0, 2) | _step(one, 0, -2) | _step(two, 0, 1) | _step(two, 0, -1)
+
+
+def _slide(pieces, empty, d_col, d_row):
+    """Squares attacked along one direction, up to and including the first piece in the way.
+
+    A Kogge-Stone fill: three doubling steps instead of seven single
+    ones.  pieces is (k, N); the empty squares (N,) serve every row.
+    """
+    delta = d_row * 8 + d_col
+    shift = np.left_shift if delta > 0 else np.right_shift
+    mask = NOT_FILE_A if d_col > 0 else NOT_FILE_H if d_col < 0 else ALL_SQUARES
+    open_squares = empty & mask
+    pieces = pieces.copy()
+    moved = np.empty_like(pieces)
+    for distance in (1, 2, 4):
+        step = np.uint64(abs(delta) * distance)
+        shift(pieces, step, out=moved)
+        moved &= open_squares
+        pieces |= moved
+        if distance < 4:
+            open_squares = open_squares & shift(open_squares, step)
+    return _step(pieces, d_col, d_row)
+
+
+def encode_positions(positions):
+    """(boards, sides): an (N, 64) int8 array of piece codes and an (N,) int8 array of sides to move."""
+    positions = list(positions)
+    boards = np.frombuffer(b''.join(bytes(position.board) for position in positions), dtype=np.int8)
+    sides = np.fromiter((position.side for position in positions), dtype=np.int8, count=len(positions))
+    return boards.reshape(len(positions), 64), sides
+
+
+def encode_fens(fens):
+    return encode_positions(Position.from_fen(fen) for fen in fens)
+
+
+def planes(boards):
+    """(N, 12, 64) one-hot planes: white pawn..king, then black pawn..king."""
+    return np.stack([boards == code for code in PIECE_CODES], axis=1).astype(np.int8)
+
+
+def piece_bitboards(boards):
+    """(16, N) uint64 bitboards indexed by piece code, like Position.bitboards."""
+    bitboards = np.zeros((16, len(boards)), dtype=np.uint64)
+    for code in PIECE_CODES:
+        packed = np.packbits(boards == code, axis=1, bitorder='little')
+        bitboards[code] = packed.view('<u8').ravel()
+    return bitboards
+
+
+def material_scores(bitboards):
+    """Material plus piece-square scores from white's point of view."""
+    rows = bitboards.view(np.uint8).reshape(16, -1, 8)  # Byte r of a bitboard is board row r
+    scores = np.zeros(bitboards.shape[1], dtype=np.int32)
+    for code in PIECE_CODES:
+        for row in range(8):
+            scores += BYTE_SCORES[code, row].take(rows[code, :, row])
+    return scores
+
+
+def mobility_scores(bitboards):
+    """Weighted count of squares each side attacks by knight, diagonal and straight line moves."""
+    white = np.bitwise_or.reduce(bitboards[1:7])
+    black = np.bitwise_or.reduce(bitboards[BLACK_FLAG | 1:BLACK_FLAG | 7])
+    empty = ~(white | black)
+    own = np.stack([white, black])
+    queens = bitboards[[QUEEN, BLACK_FLAG | QUEEN]]
+    scores = np.zeros(bitboards.shape[1], dtype=np.int32)
+    # Rows are white and black, so every shift below covers both sides at once
+    for line, pieces, directions in (('knight', bitboards[[KNIGHT, BLACK_FLAG | KNIGHT]], ()),
+                                     ('diagonal', bitboards[[BISHOP, BLACK_FLAG | BISHOP]] | queens,
+                                      BISHOP_DIRECTIONS),
+                                     ('straight', bitboards[[ROOK, BLACK_FLAG | ROOK]] | queens,
+                                      ROOK_DIRECTIONS)):
+        if directions:
+            attacks = _slide(pieces, empty, *directions[0])
+            for direction in directions[1:]:
+                attacks |= _slide(pieces, empty, *direction)
+        else:
+            attacks = _knight_attacks(pieces)
+        attacks &= ~own
+        count = np.bitwise_count(attacks).astype(np.int32)
+        scores += MOBILITY_WEIGHTS[line] * (count[0] - count[1])
+    return scores
+
+
+def pawn_scores(bitboards):
+    """Doubled, isolated and passed pawn terms from white's point of view."""
+    white, black = bitboards[PAWN], bitboards[BLACK_FLAG | PAWN]
+    scores = np.zeros(bitboards.shape[1], dtype=np.int32)
+    for sign, pawns, enemy, forward in ((1, white, black, -1), (-1, black, white, 1)):
+        files = np.bitwise_count(pawns & FILES[:, None]).astype(np.int32)  # [col, position]
+        scores += sign * DOUBLED_PAWN * np.maximum(files - 1, 0).sum(axis=0)
+        has = files > 0
+        neighbours = np.zeros_like(has)
+        neighbours[1:] |= has[:-1]
+        neighbours[:-1] |= has[1:]
+        scores += sign * ISOLATED_PAWN * (files * ~neighbours).sum(axis=0)
+
+        # Squares an enemy pawn on the same or a neighbouring file covers, filled back
+        # towards this side: a pawn on any of them is not passed
+        span = enemy | _step(enemy, 1, 0) | _step(enemy, -1, 0)
+        span = _step(span, 0, -forward)
+        for shift in (8, 16, 32):
+            span |= span >> np.uint64(shift) if forward > 0 else span << np.uint64(shift)
+        passed = pawns & ~span
+        bonus = PASSED_PAWN if forward < 0 else PASSED_PAWN[::-1]
+        for row, value in enumerate(bonus):
+            if value:
+                scores += sign * value * np.bitwise_count(passed & ROWS[row]).astype(np.int32)
+    return scores
+
+
+def evaluate_batch(boards, sides, terms=TERMS):
+    """Scores in centipawns from each side to move's point of view, as an (N,) int32 array.
+
+    With terms=('material',) every score equals engine.evaluate() of the
+    same position.
+    """
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    unknown = set(terms) - set(TERMS)
+    if unknown:
+        raise ValueError(f"Unknown evaluation terms: {', '.join(sorted(unknown))}")
+    bitboards = piece_bitboards(boards)
+    scores = np.zeros(len(boards), dtype=np.int32)
+    if 'material' in terms:
+        scores += material_scores(bitboards)
+    if 'mobility' in terms:
+        scores += mobility_scores(bitboards)
+    if 'pawns' in terms:
+        scores += pawn_scores(bitboards)
+    return np.where(np.asarray(sides) == WHITE, scores, -scores)
+
+
+def evaluate_position(position, terms=TERMS):
+    """evaluate_batch() for a single Position, square by square; the per-position reference."""
+    score = evaluate(position) if 'material' in terms else 0
+    if position.side != WHITE:
+        score = -score
+    bitboards = position.bitboards
+    occupied = bitboards[OCCUPANCY] | bitboards[OCCUPANCY | BLACK_FLAG]
+    for color in (0, 1):
+        sign = -1 if color else 1
+        own = bitboards[OCCUPANCY | color << 3]
+        if 'mobility' in terms:
+            knights = diagonal = straight = 0
+            for square in _squares(bitboards[KNIGHT | color << 3]):
+                knights |= KNIGHT_ATTACKS[square]
+            for square in _squares(bitboards[BISHOP | color << 3] | bitboards[QUEEN | color << 3]):
+                diagonal |= bishop_attacks(square, occupied)
+            for square in _squares(bitboards[ROOK | color << 3] | bitboards[QUEEN | color << 3]):
+                straight |= rook_attacks(square, occupied)
+            for line, attacked in (('knight', knights), ('diagonal', diagonal), ('straight', straight)):
+                score += sign * MOBILITY_WEIGHTS[line] * (attacked & ~own).bit_count()
+        if 'pawns' in terms:
+            pawns = bitboards[PAWN | color << 3]
+            enemy = bitboards[PAWN | (color ^ 1) << 3]
+            files = [(pawns & (0x0101010101010101 << col)).bit_count() for col in range(8)]
+            for col, count in enumerate(files):
+                score += sign * DOUBLED_PAWN * max(count - 1, 0)
+                if count and not (col > 0 and files[col - 1]) and not (col < 7 and files[col + 1]):
+                    score += sign * ISOLATED_PAWN * count
+            for square in _squares(pawns):
+                row, col = square >> 3, square & 7
+                ahead = range(row) if color == WHITE else range(row + 1, 8)
+                if not any(enemy >> (r * 8 + c) & 1 for r in ahead for c in (col - 1, col, col + 1) if 0 <= c < 8):
+                    score += sign * PASSED_PAWN[row if color == WHITE else 7 - row]
+    return score if position.side == WHITE else -score
+
+
+def _squares(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def game_positions(moves, start_fen=None):
+    """(boards, sides) for every position of a game, the start included."""
+    position = Position.from_fen(start_fen) if start_fen else Position.initial()
+    boards = [bytes(position.board)]
+    sides = [position.side]
+    for move in moves:
+        position.make_move(move)
+        boards.append(bytes(position.board))
+        sides.append(position.side)
+    return np.frombuffer(b''.join(boards), dtype=np.int8).reshape(-1, 64), np.array(sides, dtype=np.int8)
+
+
+def white_curve(moves, start_fen=None, terms=TERMS):
+    """Per-ply scores of a game from white's point of view, for material curves and blunder hunting."""
+    boards, sides = game_positions(moves, start_fen)
+    scores = evaluate_batch(boards, sides, terms)
+    return np.where(sides == WHITE, scores, -scores)
+
+
+def benchmark(count=100000, seed=1, reference_count=5000):
+    """Time evaluate_batch against per-position scoring on positions from random games.
+
+    The material term is compared with engine.evaluate over all positions,
+    the full evaluation with evaluate_position over the first
+    reference_count of them (a pure-Python loop being slow to time on
+    all); both must agree exactly.  Returns a dict of seconds per
+    position and the agreement checks.
+    """
+    import random
+    import time
+
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        for _ in range(rng.randrange(10, 120)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            positions.append(position.copy())
+    positions = positions[:count]
+    reference = positions[:reference_count]
+
+    def timed(function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - start
+
+    expected_material, scalar_material = timed(lambda: [evaluate(position) for position in positions])
+    expected_full, scalar_full = timed(lambda: [evaluate_position(position) for position in reference])
+    (boards, sides), encode = timed(encode_positions, positions)
+    material, batch_material = timed(evaluate_batch, boards, sides, ('material',))
+    full, batch_full = timed(evaluate_batch, boards, sides)
+    return {'positions': count, 'encode': encode / count,
+            'scalar material': scalar_material / count, 'batch material': batch_material / count,
+            'scalar full': scalar_full / len(reference), 'batch full': batch_full / count,
+            'material matches': bool(np.array_equal(material, expected_material)),
+            'full matches': bool(np.array_equal(full[:len(reference)], expected_full))}
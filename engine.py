@@ -0,0 +1,573 @@
+"""Alpha-beta search engine used by the "Human vs Computer" mode.
+
+Negamax with iterative deepening, a quiescence search over captures,
+MVV-LVA / killer / history move ordering, a fixed-size transposition
+table keyed by the position's Zobrist hash and, when tablebase.py's
+tables have been generated, exact endgame results.  It works on
+position.Position only, so it runs the same in the GUI, in worker
+processes and from the command line.  SearchPool runs searches in worker
+processes so a caller such as the GUI never waits on them, optionally as
+a Lazy SMP search over a transposition table in shared memory.
+"""
+
+import multiprocessing
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import tablebase
+from position import START_FEN, PERFT_SUITE, Position, WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK_FLAG, move_to_uci
+
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 20000)
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+MAX_PLY = 128
+
+# Transposition table bound types
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Piece-square tables from white's point of view, row 0 is rank 8 like the board
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+PIECE_TABLES = (None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE)
+
+
+def _square_scores():
+    # SQUARE_SCORES[piece][square]: material plus placement, signed from white's point of view
+    scores = [[0] * 64 for _ in range(16)]
+    for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        for square in range(64):
+            scores[kind][square] = PIECE_VALUES[kind] + PIECE_TABLES[kind][square]
+            # Black reads the table upside down
+            scores[BLACK_FLAG | kind][square] = -(PIECE_VALUES[kind] + PIECE_TABLES[kind][square ^ 56])
+    return scores
+
+
+SQUARE_SCORES = _square_scores()
+
+
+def evaluate(position):
+    """Static score in centipawns from the side to move's point of view."""
+    score = 0
+    for square, piece in enumerate(position.board):
+        if piece:
+            score += SQUARE_SCORES[piece][square]
+    return score if position.side == WHITE else -score
+
+
+class TranspositionTable:
+    """Fixed-memory hash table of search results.
+
+    The table is a flat array of 64-bit words grouped in buckets of two
+    entries.  The first entry of a bucket keeps the deepest result (or
+    whatever the current search stored last), the second is always
+    replaced.  An entry is two words, (key ^ data, data), so a probe only
+    accepts it when both words belong together.  data packs the best move
+    (bits 0-15), depth (16-23), bound (24-25), score (26-46) and the
+    search generation (48-55).
+
+    Passing a buffer (e.g. a SharedMemory's buf) lets several processes
+    use one table without locks: a torn or half-written entry fails the
+    key ^ data check and simply reads as a miss.
+    """
+
+    BUCKET_BYTES = 32
+    SCORE_OFFSET = 1 << 20
+
+    def __init__(self, size_mb=16, buffer=None):
+        size = self.bytes_for(size_mb)
+        self.mask = size // self.BUCKET_BYTES - 1
+        if buffer is None:
+            self.table = array('Q', bytes(size))
+        else:
+            self.table = memoryview(buffer)[:size].cast('Q')
+        self.generation = 0
+
+    @classmethod
+    def bytes_for(cls, size_mb):
+        buckets = max(1, size_mb * 1024 * 1024 // cls.BUCKET_BYTES)
+        # Power of two, so the bucket index is a mask
+        return (1 << (buckets.bit_length() - 1)) * cls.BUCKET_BYTES
+
+    @property
+    def size_bytes(self):
+        return len(self.table) * self.table.itemsize
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        for index in range(len(self.table)):
+            self.table[index] = 0
+
+    def probe(self, key):
+        """Return (move, score, depth, bound) stored for key, or None."""
+        table = self.table
+        index = (key & self.mask) << 2
+        data = table[index + 1]
+        if table[index] ^ data != key:
+            index += 2
+            data = table[index + 1]
+            if table[index] ^ data != key:
+                return None
+        return data & 0xFFFF, ((data >> 26) & 0x1FFFFF) - self.SCORE_OFFSET, (data >> 16) & 0xFF, (data >> 24) & 3
+
+    def store(self, key, move, score, depth, bound):
+        table = self.table
+        index = (key & self.mask) << 2
+        data = (move or 0) | max(depth, 0) << 16 | bound << 24 | (score + self.SCORE_OFFSET) << 26 | \
+            self.generation << 48
+        old = table[index + 1]
+        if table[index] ^ old == key or depth >= (old >> 16) & 0xFF or old >> 48 != self.generation:
+            table[index] = key ^ data
+            table[index + 1] = data
+        else:
+            table[index + 2] = key ^ data
+            table[index + 3] = data
+
+    def hashfull(self):
+        """Permille of the first thousand entries used by the current search."""
+        table = self.table
+        sample = min(1000, len(table) // 2)
+        used = sum(1 for entry in range(sample) if table[entry * 2 + 1] and
+                   table[entry * 2 + 1] >> 48 == self.generation)
+        return used * 1000 // sample
+
+
+def score_to_table(score, ply):
+    # Mate scores are stored relative to the node, not the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class SearchResult:
+    __slots__ = ('best_move', 'score', 'depth', 'nodes', 'elapsed', 'pv')
+
+    def __init__(self, best_move=None, score=0, depth=0, nodes=0, elapsed=0.0, pv=()):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def __str__(self):
+        pv = ' '.join(move_to_uci(move) for move in self.pv)
+        return (f"depth {self.depth} score cp {self.score} nodes {self.nodes} "
+                f"nps {self.nps} time {int(self.elapsed * 1000)} pv {pv}")
+
+
+class Engine:
+    def __init__(self, hash_mb=16, tt=None):
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+        self.nodes = 0
+        self.deadline = None
+        self.stop_requested = False
+        self.cancel_check = None  # Optional callable polled with the clock
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [0] * 4096
+        # Triangular PV table: pv_table[ply] is the best line found from that ply
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.previous_pv = []
+        self.tablebases = tablebase.default_tablebases()  # None when no tables have been generated
+        self.tb_hits = 0
+
+    def stop(self):
+        self.stop_requested = True
+
+    def search(self, position, time_limit=1.0, max_depth=MAX_PLY - 1, info_callback=None, helper_index=0):
+        """Iteratively deepen until the time budget or max_depth runs out.
+
+        Lazy SMP helpers pass helper_index > 0; odd helpers run one ply
+        ahead of the main search so the workers fill the shared table
+        with different depths.
+        """
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit else None
+        self.stop_requested = False
+        self.nodes = 0
+        self.tb_hits = 0
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [0] * 4096
+        self.previous_pv = []
+        self.tt.new_search()
+
+        moves = position.legal_moves()
+        result = SearchResult(best_move=moves[0] if moves else None)
+        if len(moves) <= 1:
+            return result
+
+        for depth in range(1 + (helper_index & 1), max_depth + 1):
+            try:
+                score = self.negamax(position, depth, -INFINITY, INFINITY, 0)
+            except SearchStopped:
+                break
+            pv = tuple(self.pv_table[0])
+            self.previous_pv = pv
+            result = SearchResult(pv[0] if pv else result.best_move, score, depth, self.nodes,
+                                  time.perf_counter() - start, pv)
+            if info_callback:
+                info_callback(result)
+            if abs(score) >= MATE_BOUND:
+                break
+            # An iteration takes several times longer than the previous one
+            if self.deadline and time.perf_counter() + (time.perf_counter() - start) > self.deadline:
+                break
+
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def check_time(self):
+        if self.stop_requested or (self.deadline and time.perf_counter() > self.deadline) or \
+                (self.cancel_check and self.cancel_check()):
+            raise SearchStopped()
+
+    def order_moves(self, position, moves, ply, hash_move=None):
+        board = position.board
+        killers = self.killers[ply]
+        history = self.history
+
+        def score(move):
+            if move == hash_move:
+                return 1 << 30
+            victim = board[(move >> 6) & 63]
+            if victim or move >> 12:
+                # MVV-LVA: most valuable victim first, cheapest attacker breaks ties
+                return (1 << 20) + PIECE_VALUES[victim & 7] * 16 + PIECE_VALUES[move >> 12] - (board[move & 63] & 7)
+            if move == killers[0]:
+                return 1 << 19
+            if move == killers[1]:
+                return (1 << 19) - 1
+            return history[move & 0xFFF]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_time()
+        self.pv_table[ply] = []
+
+        if ply and (position.halfmove_clock >= 100 or position.repetition_count() > 1):
+            return 0
+
+        # Within the tables the exact result replaces the search; at the root it is left
+        # to search the moves, whose children are probed in turn
+        if ply and self.tablebases:
+            found = self.tablebases.probe(position)
+            if found is not None:
+                self.tb_hits += 1
+                wdl, plies = found
+                return 0 if not wdl else wdl * (MATE_SCORE - ply - plies)
+
+        key = position.hash
+        entry = self.tt.probe(key)
+        hash_move = None
+        if entry:
+            hash_move, tt_score, tt_depth, bound = entry
+            if ply and tt_depth >= depth:
+                tt_score = score_from_table(tt_score, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and tt_score >= beta) or \
+                        (bound == UPPER_BOUND and tt_score <= alpha):
+                    return tt_score
+        if not hash_move and ply < len(self.previous_pv):
+            hash_move = self.previous_pv[ply]
+
+        in_check = position.in_check()
+        if in_check:
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(position, alpha, beta, ply)
+
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        board = position.board
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(position, moves, ply, hash_move):
+            quiet = not board[(move >> 6) & 63] and not move >> 12
+            undo = position.make_move(move)
+            try:
+                score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                # Also taken back when SearchStopped unwinds the tree
+                position.unmake_move(undo)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        if quiet:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[move & 0xFFF] += depth * depth
+                        break
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.tt.store(key, best_move, score_to_table(best_score, ply), depth, bound)
+        return best_score
+
+    def quiescence(self, position, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_time()
+
+        # Any earlier result for this position is at least as deep as a quiescence search
+        key = position.hash
+        entry = self.tt.probe(key)
+        if entry:
+            tt_score, bound = score_from_table(entry[1], ply), entry[3]
+            if bound == EXACT or (bound == LOWER_BOUND and tt_score >= beta) or \
+                    (bound == UPPER_BOUND and tt_score <= alpha):
+                return tt_score
+
+        stand_pat = evaluate(position)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        original_alpha = alpha
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = position.board
+        ep_square = position.ep_square
+        captures = [move for move in position.legal_moves()
+                    if board[(move >> 6) & 63] or move >> 12 == QUEEN or
+                    ((move >> 6) & 63 == ep_square and board[move & 63] & 7 == PAWN)]
+        for move in self.order_moves(position, captures, ply):
+            undo = position.make_move(move)
+            try:
+                score = -self.quiescence(position, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move(undo)
+            if score >= beta:
+                self.tt.store(key, move, score_to_table(score, ply), 0, LOWER_BOUND)
+                return score
+            if score > alpha:
+                alpha = score
+        self.tt.store(key, None, score_to_table(alpha, ply), 0, EXACT if alpha > original_alpha else UPPER_BOUND)
+        return alpha
+
+
+# Process pool plumbing.  Every worker keeps one Engine, and so one
+# transposition table, alive between searches.
+_worker_engine = None
+_cancel_below = None
+_finished = None
+_shared_table = None
+
+# Slots of SearchPool.finished; a search's slot holds the newest finished search id mapped to it
+FINISHED_SLOTS = 1024
+
+
+def _init_search_worker(cancel_below, hash_mb, shared_name=None, finished=None):
+    global _worker_engine, _cancel_below, _finished, _shared_table
+    tt = None
+    if shared_name:
+        _shared_table = shared_memory.SharedMemory(name=shared_name)
+        tt = TranspositionTable(hash_mb, _shared_table.buf)
+    _worker_engine = Engine(hash_mb, tt)
+    _cancel_below = cancel_below
+    _finished = finished
+
+
+def _search_in_worker(search_id, position, time_limit, max_depth, helper_index=0):
+    engine = _worker_engine
+    slot = search_id % FINISHED_SLOTS
+    if helper_index:
+        # Helpers only feed the shared table and run until their own main search is done;
+        # other searches running in the pool at the same time are left alone
+        engine.cancel_check = lambda: _cancel_below.value > search_id or _finished[slot] >= search_id
+    else:
+        engine.cancel_check = lambda: _cancel_below.value > search_id
+    if engine.cancel_check():
+        return SearchResult()
+    if helper_index:
+        return engine.search(position, time_limit, MAX_PLY - 1, helper_index=helper_index)
+    result = engine.search(position, time_limit, max_depth)
+    if _finished is not None and _finished[slot] < search_id:
+        _finished[slot] = search_id
+    return result
+
+
+class SearchPool:
+    """Runs engine searches in a pool of worker processes.
+
+    submit() returns a concurrent.futures.Future resolving to a
+    SearchResult.  Searches are numbered; cancel_all() raises a shared
+    counter above every search submitted so far, and the workers poll it
+    together with their clock, so in-flight searches stop within a few
+    milliseconds.
+
+    With threads > 1 every search is a Lazy SMP search: the main search
+    and threads - 1 helpers run in separate workers on one transposition
+    table in shared memory, and the main search's answer is the result.
+    The helpers' futures are attached to the returned one as .helpers.
+    A main search marks its id finished in a shared array, which only its
+    own helpers poll, so searches running side by side (analyse()) do not
+    stop each other.
+    """
+
+    def __init__(self, workers=1, hash_mb=16, threads=1):
+        # Spawned, not forked: the GUI process has Qt threads running
+        context = multiprocessing.get_context('spawn')
+        self.threads = max(1, threads)
+        self.cancel_below = context.RawValue('q', 0)
+        self.finished = context.RawArray('q', FINISHED_SLOTS)
+        self.shared_table = None
+        shared_name = None
+        if self.threads > 1:
+            self.shared_table = shared_memory.SharedMemory(create=True, size=TranspositionTable.bytes_for(hash_mb))
+            shared_name = self.shared_table.name
+        self.executor = ProcessPoolExecutor(max_workers=max(workers, self.threads), mp_context=context,
+                                            initializer=_init_search_worker,
+                                            initargs=(self.cancel_below, hash_mb, shared_name, self.finished))
+        self.last_id = 0
+
+    def submit(self, position, time_limit=1.0, max_depth=MAX_PLY - 1):
+        self.last_id += 1
+        future = self.executor.submit(_search_in_worker, self.last_id, position, time_limit, max_depth)
+        future.search_id = self.last_id
+        future.helpers = [self.executor.submit(_search_in_worker, self.last_id, position, time_limit, max_depth,
+                                               helper_index)
+                          for helper_index in range(1, self.threads)]
+        return future
+
+    def analyse(self, positions, time_limit=1.0, max_depth=MAX_PLY - 1):
+        """Submit a batch of positions; returns one future per position."""
+        return [self.submit(position, time_limit, max_depth) for position in positions]
+
+    def is_cancelled(self, future):
+        return self.cancel_below.value > future.search_id
+
+    def cancel_all(self):
+        self.cancel_below.value = self.last_id + 1
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.shared_table is not None:
+            self.shared_table.close()
+            self.shared_table.unlink()
+            self.shared_table = None
+
+
+def smp_scaling_report(thread_counts=(1, 2, 4, 8, 16), depth=5, hash_mb=64, fens=None):
+    """Time-to-depth and total nodes per second of Lazy SMP for each worker count.
+
+    Yields (threads, average seconds to reach depth, nodes per second summed over workers).
+    """
+    fens = fens or [START_FEN] + [fen for _, fen, _ in PERFT_SUITE[1:3]]
+    for threads in thread_counts:
+        pool = SearchPool(workers=threads, hash_mb=hash_mb, threads=threads)
+        # Start every worker before timing anything
+        warm_up = pool.submit(Position.initial(), time_limit=None, max_depth=1)
+        for future in [warm_up] + warm_up.helpers:
+            future.result()
+
+        elapsed = 0.0
+        nodes = 0
+        for fen in fens:
+            start = time.perf_counter()
+            future = pool.submit(Position.from_fen(fen), time_limit=None, max_depth=depth)
+            nodes += future.result().nodes
+            elapsed += time.perf_counter() - start
+            nodes += sum(helper.result().nodes for helper in future.helpers)
+        pool.shutdown()
+        yield threads, elapsed / len(fens), int(nodes / elapsed) if elapsed else 0
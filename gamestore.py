@@ -0,0 +1,328 @@
+"""SQLite storage for finished games.
+
+One row per game in `games` and one row per ply in `moves`.  A move is
+stored as position's integer encoding (from | to << 6 | promotion << 12)
+together with the Zobrist key of the position it leads to, and that key
+column is indexed so positions can be looked up across every stored game
+without replaying anything.  Keys are unsigned 64-bit values; SQLite
+integers are signed, so they are stored shifted into the signed range
+(see to_db_key / from_db_key).
+
+That index answers "where did this position occur" as (game id, ply)
+pairs, ply 0 being a game's starting position (games.start_hash).
+position_stats keeps per-position game and result counts next to it, so
+the win/draw/loss figures for a position are one primary-key lookup no
+matter how many games reached it.  Both are written by add_game and can
+be rebuilt from the stored moves with rebuild_position_index.
+
+GameStore keeps a single connection open in WAL mode for the life of the
+program.  Writes go through transaction(), which nests, so a bulk import
+can wrap thousands of add_game calls in one commit.  Databases written
+by older versions (a `sessions` table holding the text log) are
+converted the first time they are opened.
+"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from position import Position, PIECE_CODES, QUEEN, parse_square
+
+DEFAULT_DB_PATH = 'Chess_sessions.db'
+UNKNOWN_DATE = ''  # add_game's played_at for a game whose date is not known; stored as NULL
+
+SCHEMA_VERSION = 3
+
+SCHEMA_V1 = (
+    '''CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        played_at TEXT,
+        white TEXT,
+        black TEXT,
+        result TEXT NOT NULL DEFAULT '*',
+        start_fen TEXT,
+        ply_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS moves (
+        game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+        ply INTEGER NOT NULL,
+        move INTEGER NOT NULL,
+        position_hash INTEGER NOT NULL,
+        PRIMARY KEY (game_id, ply)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS moves_position_hash ON moves (position_hash)',
+)
+
+SCHEMA_V2 = (
+    'ALTER TABLE games ADD COLUMN start_hash INTEGER',
+    'CREATE INDEX games_start_hash ON games (start_hash)',
+    '''CREATE TABLE position_stats (
+        position_hash INTEGER PRIMARY KEY,
+        games INTEGER NOT NULL,
+        white_wins INTEGER NOT NULL,
+        draws INTEGER NOT NULL,
+        black_wins INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+)
+
+# Outcome of re-checking a stored game against the rules (see replay.py)
+SCHEMA_V3 = (
+    '''CREATE TABLE replay_results (
+        game_id INTEGER PRIMARY KEY REFERENCES games(id) ON DELETE CASCADE,
+        status TEXT NOT NULL,
+        detail TEXT,
+        final_fen TEXT
+    )''',
+    'CREATE INDEX replay_results_status ON replay_results (status)',
+)
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+INSERT_GAME = ('INSERT INTO games (name, played_at, white, black, result, start_fen, ply_count, start_hash) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+INSERT_MOVE = 'INSERT INTO moves (game_id, ply, move, position_hash) VALUES (?, ?, ?, ?)'
+COUNT_POSITION = ('INSERT INTO position_stats (position_hash, games, white_wins, draws, black_wins) '
+                  'VALUES (?, 1, ?, ?, ?) '
+                  'ON CONFLICT (position_hash) DO UPDATE SET games = games + 1, '
+                  'white_wins = white_wins + excluded.white_wins, draws = draws + excluded.draws, '
+                  'black_wins = black_wins + excluded.black_wins')
+# Every distinct position of every game, counted once per game
+REBUILD_POSITION_STATS = (
+    "INSERT INTO position_stats (position_hash, games, white_wins, draws, black_wins) "
+    "SELECT position_hash, COUNT(*), SUM(result = '1-0'), SUM(result = '1/2-1/2'), SUM(result = '0-1') "
+    "FROM (SELECT game_id, position_hash FROM moves UNION SELECT id, start_hash FROM games) "
+    "JOIN games ON games.id = game_id GROUP BY position_hash")
+
+# The text log format of the old `sessions` table
+LEGACY_MOVE = re.compile(r"Player (?:white|black): Moved \w+ from square ([a-h][1-8]) to square ([a-h][1-8])"
+                         r"(?:, promoted to [wb]_(\w+))?")
+
+
+def to_db_key(key):
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def from_db_key(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class PositionStats:
+    """How many stored games reached a position, and how they ended."""
+    __slots__ = ('games', 'white_wins', 'draws', 'black_wins')
+
+    def __init__(self, games=0, white_wins=0, draws=0, black_wins=0):
+        self.games = games
+        self.white_wins = white_wins
+        self.draws = draws
+        self.black_wins = black_wins
+
+    def __str__(self):
+        if not self.games:
+            return "Position not found in stored games"
+        return (f"Position seen in {self.games} games: white won {self.white_wins}, "
+                f"{self.draws} drawn, black won {self.black_wins}")
+
+
+def parse_legacy_log(log_history):
+    """Moves and result of a text log from the old `sessions` table.
+
+    Reading stops at the first move that does not parse or is not legal,
+    so a damaged log still yields its playable prefix.
+    """
+    position = Position.initial()
+    moves = []
+    result = '*'
+    for line in log_history.splitlines():
+        match = LEGACY_MOVE.match(line)
+        if match:
+            from_name, to_name, promotion = match.groups()
+            move = position.find_move(parse_square(from_name), parse_square(to_name),
+                                      PIECE_CODES['w_' + promotion] if promotion else QUEEN)
+            if move is None:
+                break
+            position.make_move(move)
+            moves.append(move)
+        elif line.startswith('Game Over:'):
+            if 'White Wins' in line:
+                result = '1-0'
+            elif 'Black Wins' in line:
+                result = '0-1'
+            elif 'Draw' in line:
+                result = '1/2-1/2'
+    return moves, result
+
+
+class GameStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.depth = 0  # transaction() nesting
+        self.migrate()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Group writes into one commit; nested calls join the outermost one."""
+        if not self.depth:
+            self.conn.execute('BEGIN')
+        self.depth += 1
+        try:
+            yield self.conn
+        except BaseException:
+            self.depth -= 1
+            if not self.depth:
+                self.conn.rollback()
+            raise
+        self.depth -= 1
+        if not self.depth:
+            self.conn.commit()
+
+    def migrate(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.transaction():
+            if version < 1:
+                for statement in SCHEMA_V1:
+                    self.conn.execute(statement)
+            if version < 2:
+                for statement in SCHEMA_V2:
+                    self.conn.execute(statement)
+                for start_fen, in self.conn.execute('SELECT DISTINCT start_fen FROM games').fetchall():
+                    start = Position.from_fen(start_fen) if start_fen else Position.initial()
+                    self.conn.execute('UPDATE games SET start_hash = ? WHERE start_fen IS ?',
+                                      (to_db_key(start.hash), start_fen))
+                self.conn.execute(REBUILD_POSITION_STATS)
+            if version < 3:
+                for statement in SCHEMA_V3:
+                    self.conn.execute(statement)
+            # Games from the old text logs go in through add_game, so the tables must be complete first
+            has_sessions = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'").fetchone()
+            if has_sessions:
+                sessions = self.conn.execute('SELECT session_name, move_history FROM sessions ORDER BY id').fetchall()
+                for session_name, move_history in sessions:
+                    moves, result = parse_legacy_log(move_history or '')
+                    # Old session names carry the time they were saved
+                    played_at = None
+                    if session_name and session_name.startswith('Session_data_'):
+                        played_at = session_name[len('Session_data_'):].replace('_', ' ')
+                    self.add_game(moves, result, name=session_name, played_at=played_at)
+                # Kept, not dropped, in case a log did not convert completely
+                self.conn.execute('ALTER TABLE sessions RENAME TO legacy_sessions')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def add_game(self, moves, result='*', name=None, white=None, black=None, start_fen=None, played_at=None,
+                 validate=True):
+        """Store one game and return its id.
+
+        moves are encoded moves from start_fen (the standard starting
+        position when None).  They are replayed to compute the position
+        keys; with validate an illegal move raises ValueError and nothing
+        is stored.  Callers that already checked the moves (the PGN
+        importer) pass validate=False.  played_at defaults to now; pass
+        UNKNOWN_DATE for a game whose date is not known.
+        """
+        if result not in RESULTS:
+            raise ValueError(f"Unknown game result: {result}")
+        position = Position.from_fen(start_fen) if start_fen else Position.initial()
+        start_hash = to_db_key(position.hash)
+        rows = []
+        for ply, move in enumerate(moves, 1):
+            if validate and not position.is_legal(move):
+                raise ValueError(f"Illegal move at ply {ply}")
+            position.make_move(move)
+            rows.append((ply, move, to_db_key(position.hash)))
+
+        if played_at is None:
+            played_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        outcome = (result == '1-0', result == '1/2-1/2', result == '0-1')
+        positions = {start_hash} | {key for _, _, key in rows}
+        with self.transaction():
+            cursor = self.conn.execute(INSERT_GAME, (name, played_at or None, white, black, result, start_fen, len(rows),
+                                                     start_hash))
+            game_id = cursor.lastrowid
+            self.conn.executemany(INSERT_MOVE, [(game_id, ply, move, key) for ply, move, key in rows])
+            self.conn.executemany(COUNT_POSITION, [(key,) + outcome for key in positions])
+        return game_id
+
+    def rebuild_position_index(self, batch_size=1000):
+        """Recompute every position key from the stored moves, then the per-position counts.
+
+        Needed after anything that changes the keys (e.g. new Zobrist
+        tables) or after editing the tables by hand.
+        """
+        with self.transaction():
+            self.conn.execute('DROP INDEX IF EXISTS moves_position_hash')
+            last_id = 0
+            while True:
+                games = self.conn.execute('SELECT id, start_fen FROM games WHERE id > ? ORDER BY id LIMIT ?',
+                                          (last_id, batch_size)).fetchall()
+                if not games:
+                    break
+                game_keys = []
+                move_keys = []
+                for game_id, start_fen in games:
+                    position = Position.from_fen(start_fen) if start_fen else Position.initial()
+                    game_keys.append((to_db_key(position.hash), game_id))
+                    for ply, move in enumerate(self.game_moves(game_id), 1):
+                        position.make_move(move)
+                        move_keys.append((to_db_key(position.hash), game_id, ply))
+                self.conn.executemany('UPDATE games SET start_hash = ? WHERE id = ?', game_keys)
+                self.conn.executemany('UPDATE moves SET position_hash = ? WHERE game_id = ? AND ply = ?', move_keys)
+                last_id = games[-1][0]
+            self.conn.execute(SCHEMA_V1[-1])
+            self.conn.execute('DELETE FROM position_stats')
+            self.conn.execute(REBUILD_POSITION_STATS)
+
+    def position_stats(self, key):
+        """PositionStats over every stored game that reached the position with Zobrist key `key`."""
+        row = self.conn.execute('SELECT games, white_wins, draws, black_wins FROM position_stats '
+                                'WHERE position_hash = ?', (to_db_key(key),)).fetchone()
+        return PositionStats(*row) if row else PositionStats()
+
+    def occurrences(self, key, limit=100):
+        """Up to `limit` (game id, ply) pairs where the position with Zobrist key `key` occurred."""
+        db_key = to_db_key(key)
+        return self.conn.execute('SELECT id, 0 FROM games WHERE start_hash = ? '
+                                 'UNION ALL SELECT game_id, ply FROM moves WHERE position_hash = ? '
+                                 'LIMIT ?', (db_key, db_key, limit)).fetchall()
+
+    def game_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+    def game(self, game_id):
+        """(name, played_at, white, black, result, start_fen, ply_count) of one game, or None."""
+        return self.conn.execute('SELECT name, played_at, white, black, result, start_fen, ply_count '
+                                 'FROM games WHERE id = ?', (game_id,)).fetchone()
+
+    def iter_games(self, batch_size=1000):
+        """Yield (id, name, played_at, white, black, result, start_fen, moves) for every game in id order.
+
+        Games and their moves are read batch_size games at a time, so
+        memory use does not grow with the size of the database.
+        """
+        last_id = 0
+        while True:
+            games = self.conn.execute('SELECT id, name, played_at, white, black, result, start_fen FROM games '
+                                      'WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)).fetchall()
+            if not games:
+                return
+            moves = {game[0]: [] for game in games}
+            for game_id, move in self.conn.execute('SELECT game_id, move FROM moves WHERE game_id BETWEEN ? AND ? '
+                                                   'ORDER BY game_id, ply', (games[0][0], games[-1][0])):
+                moves[game_id].append(move)
+            for game in games:
+                yield game + (moves[game[0]],)
+            last_id = games[-1][0]
+
+    def game_moves(self, game_id):
+        return [move for move, in self.conn.execute('SELECT move FROM moves WHERE game_id = ? ORDER BY ply',
+                                                    (game_id,))]
@@ -0,0 +1,962 @@
+"""Qt front end: the board scene, the main window and their helpers.
+
+Kept apart from szachy.py so that the command-line tools and the worker
+processes, which import szachy.py as their main module, never load
+PyQt5.  run() builds the application and the window.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from PyQt5.QtCore import Qt, QObject, pyqtSignal, QMutex, QTimer, QRectF
+from PyQt5.QtGui import QPixmap, QColor, QFont, QKeySequence
+from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView, QGraphicsPixmapItem, QGraphicsTextItem, QGraphicsRectItem, QGraphicsItem, QGraphicsItemGroup, QVBoxLayout, QHBoxLayout, QWidget, QGraphicsProxyWidget, QLabel,QLineEdit, QPlainTextEdit, QRadioButton, QPushButton, QSpinBox
+from datetime import datetime
+import json
+
+from position import (Position, MoveStack, PIECE_NAMES, PLAYER_NAMES, FEN_PIECES, QUEEN, WHITE,
+                      square_index, parse_square, move_from, move_to, move_promotion)
+import tablebase
+from engine import SearchPool
+from gamestore import GameStore
+from netplay import Host, Guest, NetworkThread
+
+
+class LogThread(QObject):
+    """Append-only game log.
+
+    Every entry is a (move, message) record, move being the encoded move
+    for board moves and None for anything else.  Listeners get only the
+    new entry; the full text is built on demand by get_log.
+    """
+    entry_appended = pyqtSignal(str)
+    log_cleared = pyqtSignal()
+
+    DISPLAY_LINES = 1000  # Most recent entries kept for display
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+        self.display = deque(maxlen=self.DISPLAY_LINES)
+        self.log_text = None  # get_log's cached result, dropped on every append
+        self.mutex = QMutex()
+
+    def append_log(self, message, move=None):
+        self.mutex.lock()
+        self.entries.append((move, message))
+        self.display.append(message)
+        self.log_text = None
+        self.mutex.unlock()
+        self.entry_appended.emit(message)
+
+    def clear_log(self):
+        self.mutex.lock()
+        self.entries = []
+        self.display.clear()
+        self.log_text = None
+        self.mutex.unlock()
+        self.log_cleared.emit()
+
+    def get_log(self):
+        self.mutex.lock()
+        if self.log_text is None:
+            self.log_text = "".join(message + "\n" for _, message in self.entries)
+        log_copy = self.log_text
+        self.mutex.unlock()
+        return log_copy
+
+    def get_display_text(self):
+        self.mutex.lock()
+        text = "\n".join(self.display)
+        self.mutex.unlock()
+        return text
+
+    def run(self):
+        pass  # Możesz dodać więcej funkcjonalności wątku, jeśli jest to konieczne
+    
+class EngineClient(QObject):
+    """Qt front of engine.SearchPool: searches run in worker processes and report back through a signal."""
+    search_finished = pyqtSignal(object)  # engine.SearchResult
+
+    def __init__(self, workers=1, hash_mb=16, threads=1):
+        super().__init__()
+        self.threads = threads
+        self.pool = SearchPool(workers, hash_mb, threads)
+
+    def start_search(self, position, time_limit):
+        self.cancel()
+        future = self.pool.submit(position, time_limit)
+        future.add_done_callback(self.on_search_done)
+
+    def on_search_done(self, future):
+        # Runs on the executor's thread; the signal is queued to the GUI thread
+        if future.cancelled() or future.exception() is not None or self.pool.is_cancelled(future):
+            return
+        self.search_finished.emit(future.result())
+
+    def cancel(self):
+        self.pool.cancel_all()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+class NetworkClient(QObject):
+    """Qt front of a netplay Host (no address given) or Guest; the sockets live on its own thread."""
+    move_received = pyqtSignal(int, list)  # Opponent's encoded move, clocks in ms
+    clocks_updated = pyqtSignal(list)
+    game_finished = pyqtSignal(str, str)  # Result, reason
+    status_changed = pyqtSignal(str)
+
+    def __init__(self, address, port):
+        super().__init__()
+        peer_class = Guest if address else Host
+        peer = peer_class(on_move=self.move_received.emit, on_clocks=self.clocks_updated.emit,
+                          on_result=self.game_finished.emit, on_status=self.status_changed.emit)
+        self.player = PLAYER_NAMES[peer.color]
+        self.opponent = PLAYER_NAMES[peer.color ^ 1]
+        self.thread = NetworkThread(peer, address, port)
+
+    def start(self):
+        self.thread.start()
+
+    def play(self, move):
+        self.thread.play(move)
+
+    def resign(self):
+        self.thread.resign()
+
+    def close(self):
+        self.thread.close()
+
+class SpriteCache:
+    """Process-wide piece sprites.
+
+    Each of the 12 images is decoded once; scaled copies are kept per
+    (piece_type, size, device pixel ratio) and shared by every piece on
+    every board.  A sprite for ratio r is size * r pixels wide and
+    tagged with that ratio, so it always covers `size` scene units.
+    """
+    IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+
+    sources = {}
+    scaled = {}
+
+    @classmethod
+    def pixmap(cls, piece_type, size, ratio=1.0):
+        key = (piece_type, size, ratio)
+        pixmap = cls.scaled.get(key)
+        if pixmap is None:
+            source = cls.sources.get(piece_type)
+            if source is None:
+                source = cls.sources[piece_type] = QPixmap(os.path.join(cls.IMAGE_DIR, f'{piece_type}.png'))
+            pixels = round(size * ratio)
+            pixmap = source.scaled(pixels, pixels, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            pixmap.setDevicePixelRatio(ratio)
+            cls.scaled[key] = pixmap
+        return pixmap
+
+
+class ChessPiece(QGraphicsPixmapItem):
+    def __init__(self, piece_type, size, player, log_thread):
+        super().__init__()
+        self.player = player
+        self.size = size
+        self.log_thread = log_thread
+        self.initial_pos = None  
+        self.piece_type = piece_type  # Dodajemy atrybut przechowujący typ pionka
+        self.sprite_ratio = 1.0  # Device pixels per scene unit, set by the view
+
+        self.setPixmap(SpriteCache.pixmap(piece_type, size, self.sprite_ratio))
+        self.setZValue(ChessboardScene.PIECE_Z)
+
+        self.targets = {}  # Destination square -> legal move, filled when the piece is picked up
+        self.hover_square = None
+
+    def set_piece_type(self, piece_type):
+        # Used when a pawn is promoted
+        self.piece_type = piece_type
+        self.setPixmap(SpriteCache.pixmap(piece_type, self.size, self.sprite_ratio))
+
+    def set_sprite_ratio(self, ratio):
+        if ratio != self.sprite_ratio:
+            self.sprite_ratio = ratio
+            self.setPixmap(SpriteCache.pixmap(self.piece_type, self.size, ratio))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.scene().can_move(self.player):
+            self.initial_pos = self.pos()  
+            self.setOpacity(0.7)  
+            self.setZValue(ChessboardScene.PIECE_Z + 1)  # Drag above the other pieces
+
+            # Every legal destination is known from here on, so dragging and dropping need no move generation
+            scene = self.scene()
+            from_square = self.square_at(self.initial_pos)
+            self.targets = {}
+            for move in scene.position.legal_moves():
+                if move_from(move) == from_square and move_promotion(move) in (0, QUEEN):
+                    self.targets[move_to(move)] = move
+            self.hover_square = from_square
+            scene.show_move_targets(from_square, self.targets)
+            event.accept()
+        else:
+            event.ignore()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() == Qt.LeftButton and self.scene().can_move(self.player):
+            newPos = self.mapToScene(event.pos())
+            self.setPos(newPos)
+
+            self.update_highlighted_square()
+            event.accept()
+        else:
+            event.ignore()
+
+    def square_at(self, pos):
+        """Board square under a piece placed at pos, or None off the board."""
+        square_size = self.scene().square_size
+        col = round(pos.x() / square_size)
+        row = round(pos.y() / square_size)
+        return square_index(col, row) if 0 <= col < 8 and 0 <= row < 8 else None
+
+    def mouseReleaseEvent(self, event):
+        if self.scene().can_move(self.player):
+            square_size = self.scene().square_size
+            col = round(self.x() / square_size)
+            row = round(self.y() / square_size)
+
+            if self.initial_pos != self.pos():
+                current_col = round(self.initial_pos.x() / square_size)
+                current_row = round(self.initial_pos.y() / square_size)
+                move = self.targets.get(self.square_at(self.pos()))
+
+                if move is not None:
+                    self.scene().apply_move(move)
+                else:
+                    self.setPos(self.initial_pos)  # Revert to the original position
+                    self.log_thread.append_log(
+                        f"Player {self.player}: Illegal move attempted by {self.piece_type} from square {chr(ord('a') + current_col)}{8 - current_row} "
+                        f"to square {chr(ord('a') + col)}{8 - row}. Move denied.")
+
+            self.targets = {}
+            self.hover_square = None
+            if self.scene():
+                self.scene().clear_highlight()
+
+            self.setOpacity(1.0)
+            self.setZValue(ChessboardScene.PIECE_Z)
+
+        super().mouseReleaseEvent(event)
+
+    def update_highlighted_square(self):
+        # Only touch the overlay when the piece crosses into another square
+        square = self.square_at(self.pos())
+        if self.scene() and square != self.hover_square:
+            self.hover_square = square
+            self.scene().highlight_drop_square(square)
+
+
+
+
+class HighlightedSquare(QGraphicsRectItem):
+    def __init__(self, x, y, size):
+        super().__init__(x, y, size, size)
+        self.setBrush(QColor(0, 255, 0, 100))  # Kolor z przezroczystością
+
+    def highlight(self):
+        self.setBrush(QColor(0, 255, 0, 100))
+
+    def unhighlight(self):
+        self.setBrush(Qt.NoBrush)
+
+
+class MoveTargetsOverlay(QGraphicsItem):
+    """One item that paints every legal destination of the piece being dragged."""
+
+    def __init__(self, square_size):
+        super().__init__()
+        self.square_size = square_size
+        self.squares = ()
+        self.captures = frozenset()
+
+    def set_targets(self, squares, captures):
+        self.squares = tuple(squares)
+        self.captures = frozenset(captures)
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.square_size * 8, self.square_size * 8)
+
+    def paint(self, painter, option, widget=None):
+        size = self.square_size
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 255, 70))
+        for square in self.squares:
+            x, y = (square & 7) * size, (square >> 3) * size
+            if square in self.captures:
+                painter.drawRect(QRectF(x, y, size, size))
+            else:
+                painter.drawEllipse(QRectF(x + size * 0.35, y + size * 0.35, size * 0.3, size * 0.3))
+
+class PlayerLabel(QLabel):
+    def __init__(self, initial_player):
+        super().__init__()
+        self.setText(f"Current player: {initial_player}")
+
+    def update_player(self, player):
+        self.setText(f"Current player: {player}")
+
+
+
+class ChessboardScene(QGraphicsScene):
+    current_player_updated = pyqtSignal(str)  # Aktualizacja sygnału
+
+    # Stacking: board squares, then the highlight layer, then the pieces
+    OVERLAY_Z = 1
+    PIECE_Z = 2
+
+    def __init__(self, log_thread):
+        super().__init__()
+
+        self.chessboard_size = 8
+        self.square_size = 60
+        self.position = Position.initial()  # Headless model the scene mirrors
+        self.history = MoveStack(self.position)  # Every move goes through here so it can be taken back
+        self.game_over = False
+        self.tablebase_result = None  # Last endgame-table verdict logged, from White's side
+        self.remote_player = None  # Side played from the other end of a network game
+        self.init_chessboard()
+        self.init_overlays()
+        self.log_thread = log_thread
+        self.board = [[None] * self.chessboard_size for _ in range(self.chessboard_size)]  # Inicjalizacja planszy
+
+    @property
+    def current_player(self):
+        return PLAYER_NAMES[self.position.side]
+
+    def can_move(self, player):
+        """Whether player's pieces may be moved from this window now."""
+        return player == self.current_player and player != self.remote_player
+
+    def init_chessboard(self):
+        colors = [Qt.lightGray, Qt.darkGray]
+
+        for row in range(self.chessboard_size):
+            for col in range(self.chessboard_size):
+                square_color = colors[(row + col) % 2]
+                square = self.addRect(col * self.square_size, row * self.square_size,
+                                      self.square_size, self.square_size)
+                square.setBrush(square_color)
+
+                # Dodajemy etykiety kolumn i rzędów
+                if col == 0:
+                    label = QGraphicsTextItem(str(8 - row))
+                    label.setFont(QFont("Arial", 12))
+                    label.setPos(col * self.square_size - 20, row * self.square_size)
+                    self.addItem(label)
+
+                if row == self.chessboard_size - 1:
+                    label = QGraphicsTextItem(chr(ord('a') + col))
+                    label.setFont(QFont("Arial", 12))
+                    label.setPos(col * self.square_size + 10, row * self.square_size + 60)
+                    self.addItem(label)
+
+    def init_overlays(self):
+        # Highlights live in their own group and are reused, never searched for among the scene's items
+        self.overlay_group = QGraphicsItemGroup()
+        self.overlay_group.setZValue(self.OVERLAY_Z)
+        self.addItem(self.overlay_group)
+        self.origin_highlight = HighlightedSquare(0, 0, self.square_size)
+        self.move_targets = MoveTargetsOverlay(self.square_size)
+        self.drop_highlight = HighlightedSquare(0, 0, self.square_size)
+        for item in (self.origin_highlight, self.move_targets, self.drop_highlight):
+            self.overlay_group.addToGroup(item)
+        self.overlay_group.hide()
+
+    def change_turn(self):
+        # The side to move is switched by the position itself, the scene only announces it
+        self.current_player_updated.emit(self.current_player)  # Emitowanie sygnału
+
+    def square_rect(self, square):
+        return QRectF((square & 7) * self.square_size, (square >> 3) * self.square_size,
+                      self.square_size, self.square_size)
+
+    def show_move_targets(self, from_square, targets):
+        """Highlight a picked-up piece's square and its legal destinations (a dict keyed by square)."""
+        self.origin_highlight.setRect(self.square_rect(from_square))
+        self.move_targets.set_targets(targets, [square for square in targets if self.position.board[square]])
+        self.drop_highlight.hide()
+        self.overlay_group.show()
+
+    def highlight_drop_square(self, square):
+        if square is None:
+            self.drop_highlight.hide()
+            return
+        self.drop_highlight.setRect(self.square_rect(square))
+        self.drop_highlight.show()
+
+    def clear_highlight(self):
+        self.overlay_group.hide()
+        self.move_targets.set_targets((), ())
+    def add_chess_piece(self, piece, col, row):
+        self.addItem(piece)
+        self.place_chess_piece(piece, col, row)
+
+    def place_chess_piece(self, piece, col, row):
+        bounds = piece.boundingRect()
+        piece.setPos(col * self.square_size + (self.square_size - bounds.width()) / 2,
+                     row * self.square_size + (self.square_size - bounds.height()) / 2)
+        self.board[row][col] = piece  # Aktualizacja planszy
+
+    def remove_chess_piece(self, col, row):
+        piece = self.board[row][col]
+        if piece:
+            self.removeItem(piece)
+            self.board[row][col] = None  # Usunięcie pionka z planszy
+    def apply_move(self, move):
+        """Play a legal move on the position and bring the scene in line with it."""
+        position = self.position
+        from_square, to_square = move_from(move), move_to(move)
+        from_col, from_row = from_square & 7, from_square >> 3
+        to_col, to_row = to_square & 7, to_square >> 3
+        piece = self.board[from_row][from_col]
+        player = self.current_player
+
+        # Work out the side effects before the model forgets the en passant square
+        captured_col, captured_row = to_col, to_row
+        if piece.piece_type.endswith('_pawn') and to_square == position.ep_square:
+            captured_row = from_row
+        rook_move = None
+        if piece.piece_type.endswith('_king') and abs(to_col - from_col) == 2:
+            rook_move = (7, 5) if to_col > from_col else (0, 3)
+
+        self.history.push(move)
+
+        self.remove_chess_piece(captured_col, captured_row)
+        self.board[from_row][from_col] = None
+        self.place_chess_piece(piece, to_col, to_row)
+        if rook_move:
+            rook = self.board[from_row][rook_move[0]]
+            self.board[from_row][rook_move[0]] = None
+            self.place_chess_piece(rook, rook_move[1], from_row)
+
+        message = (f"Player {player}: Moved {piece.piece_type} from square {chr(ord('a') + from_col)}{8 - from_row} "
+                   f"to square {chr(ord('a') + to_col)}{8 - to_row}")
+        if move_promotion(move):
+            piece.set_piece_type(PIECE_NAMES[position.board[to_square]])
+            message += f", promoted to {piece.piece_type}"
+        self.log_thread.append_log(message, move)
+
+        self.check_game_over()
+        self.change_turn()
+
+    def undo_move(self):
+        """Take back the last move on the position and in the scene; returns it, or None at the start."""
+        player = PLAYER_NAMES[self.position.side ^ 1]
+        move = self.history.undo()
+        if move is None:
+            return None
+        position = self.position
+        from_square, to_square = move_from(move), move_to(move)
+        from_col, from_row = from_square & 7, from_square >> 3
+        to_col, to_row = to_square & 7, to_square >> 3
+
+        piece = self.board[to_row][to_col]
+        self.board[to_row][to_col] = None
+        self.place_chess_piece(piece, from_col, from_row)
+        if move_promotion(move):
+            piece.set_piece_type(PIECE_NAMES[position.board[from_square]])
+        if piece.piece_type.endswith('_king') and abs(to_col - from_col) == 2:
+            rook_from, rook_to = (7, 5) if to_col > from_col else (0, 3)
+            rook = self.board[from_row][rook_to]
+            self.board[from_row][rook_to] = None
+            self.place_chess_piece(rook, rook_from, from_row)
+
+        # A captured piece is back on the position's board (beside the pawn after en passant)
+        for col, row in ((to_col, to_row), (to_col, from_row)):
+            code = position.board[square_index(col, row)]
+            if code and self.board[row][col] is None:
+                captured = ChessPiece(PIECE_NAMES[code], self.square_size, PLAYER_NAMES[code >> 3], self.log_thread)
+                captured.set_sprite_ratio(piece.sprite_ratio)
+                self.add_chess_piece(captured, col, row)
+
+        self.clear_highlight()
+        self.log_thread.append_log(
+            f"Player {player}: Took back {piece.piece_type} from square {chr(ord('a') + to_col)}{8 - to_row} "
+            f"to square {chr(ord('a') + from_col)}{8 - from_row}")
+        return move
+
+    def redo_move(self):
+        """Play the last move taken back again; returns it, or None if there is nothing to redo."""
+        move = self.history.next_redo()
+        if move is not None:
+            self.apply_move(move)
+        return move
+
+    def check_game_over(self):
+        outcome = self.position.outcome()
+        if outcome is None:
+            self.report_tablebase()
+            return
+        result, reason = outcome
+        self.game_over = True
+        if reason == 'checkmate':
+            winner = 'White' if result == '1-0' else 'Black'
+            self.log_thread.append_log(f"Game Over: {winner} Wins!")
+        else:
+            self.log_thread.append_log(f"Game Over: Draw by {reason}!")
+        mainWindow.save_session_to_database(result)
+
+    def report_tablebase(self):
+        # The tables settle the result long before the game ends; say so once, and again if a blunder changes it
+        tablebases = tablebase.default_tablebases()
+        found = tablebases.probe(self.position) if tablebases else None
+        result = None
+        if found is not None:
+            wdl, plies = found
+            result = wdl if self.position.side == WHITE else -wdl
+        if result is not None and result != self.tablebase_result:
+            if result:
+                winner = 'White' if result > 0 else 'Black'
+                self.log_thread.append_log(f"Tablebase: {winner} wins, mate in {(plies + 1) // 2} moves")
+            else:
+                self.log_thread.append_log("Tablebase: the position is a draw")
+        self.tablebase_result = result
+
+    def process_chess_notation(self, notation):
+        # Takebacks go through the window, which knows whether the computer's reply goes too
+        if notation == 'undo':
+            mainWindow.undo_move()
+            return
+        if notation == 'redo':
+            mainWindow.redo_move()
+            return
+        try:
+            # Parse the chess notation (e.g., "a3-a2", or "e7-e8n" to under-promote)
+            from_square = parse_square(notation[0:2])
+            to_square = parse_square(notation[3:5])
+            promotion = FEN_PIECES[notation[5].upper()] if len(notation) > 5 else QUEEN
+
+            # Get the piece from the board
+            piece = self.board[from_square >> 3][from_square & 7]
+
+            if piece and self.can_move(piece.player):
+                move = self.position.find_move(from_square, to_square, promotion)
+                if move is not None:
+                    self.apply_move(move)
+                else:
+                    self.log_thread.append_log(
+                        f"Player {piece.player}: Illegal move attempted by {piece.piece_type} from square {notation[0:2]} "
+                        f"to square {notation[3:5]}. Move denied.")
+
+                # Clear any highlights after the move
+                self.clear_highlight()
+
+        except Exception as e:
+            print(f"Invalid move: {e}")
+
+
+
+
+    
+
+class ChessboardView(QGraphicsView):
+    def __init__(self, scene, square_size, log_thread):
+        super().__init__(scene)
+        self.setWindowTitle("Szachy")
+        self.square_size = square_size
+        self.init_chess_pieces(square_size, log_thread)
+
+        # Sprites are rescaled once the window has stopped resizing, not on every step
+        self.sprite_timer = QTimer(self)
+        self.sprite_timer.setSingleShot(True)
+        self.sprite_timer.setInterval(100)
+        self.sprite_timer.timeout.connect(self.update_sprites)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
+        self.sprite_timer.start()
+
+    def update_sprites(self):
+        # Pixels per scene unit, in steps of 1/8 so the cache stays small
+        ratio = round(self.transform().m11() * self.devicePixelRatioF() * 8) / 8 or 1.0
+        for item in self.scene().items():
+            if isinstance(item, ChessPiece):
+                item.set_sprite_ratio(ratio)
+
+    def init_chess_pieces(self, square_size, log_thread):
+        position = self.scene().position
+        for square, code in enumerate(position.board):
+            if code:
+                chess_piece = ChessPiece(PIECE_NAMES[code], square_size, PLAYER_NAMES[code >> 3], log_thread)
+                self.scene().add_chess_piece(chess_piece, square & 7, square >> 3)
+
+
+
+class MainWindow(QWidget):
+    COMPUTER_MOVE_TIME = 2.0  # Seconds the engine may think per move
+    ENGINE_HASH_MB = 16  # Transposition table size
+    MAX_ENGINE_THREADS = 16  # Lazy SMP workers sharing one transposition table
+
+    def __init__(self):
+        super().__init__()
+        self.computer_player = None  # 'black' in Human vs Computer mode
+        self.engine = EngineClient(hash_mb=self.ENGINE_HASH_MB)
+        self.engine.search_finished.connect(self.on_engine_result)
+        self.search_key = None  # Hash of the position the engine is thinking about
+        self._store = None  # Opened on first use, then kept for the whole session
+        self.network = None  # NetworkClient while a network game is on
+        self.initUI()
+        self.session_names = set()  # To store unique session names
+
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        # Chessboard View
+        self.scene = ChessboardScene(log_thread)
+        view = ChessboardView(self.scene, self.scene.square_size, log_thread)
+        layout.addWidget(view)
+
+        # Current Player Label
+        self.current_player_label = PlayerLabel(self.scene.current_player)
+        layout.addWidget(self.current_player_label)
+
+        # How often the position on the board occurred in stored games
+        self.position_stats_label = QLabel()
+        layout.addWidget(self.position_stats_label)
+        # After the first frame, so opening the database does not delay the window
+        QTimer.singleShot(0, self.update_position_stats)
+
+        # IP Address Input
+        ip_label = QLabel("IP Address:")
+        self.ip_input = QLineEdit()
+        layout.addWidget(ip_label)
+        layout.addWidget(self.ip_input)
+
+        # Port Input
+        port_label = QLabel("Port:")
+        self.port_input = QLineEdit()
+        layout.addWidget(port_label)
+        layout.addWidget(self.port_input)
+
+        # Network game clocks, shown once Start Game connects
+        self.clock_label = QLabel()
+        layout.addWidget(self.clock_label)
+
+        # Log TextEdit, appended to one entry at a time
+        self.log_textedit = QPlainTextEdit()
+        self.log_textedit.setMaximumBlockCount(LogThread.DISPLAY_LINES)
+        layout.addWidget(self.log_textedit)
+
+        # Chess Notation Input
+        self.chess_notation_input = QLineEdit()
+        self.chess_notation_input.setPlaceholderText("Enter chess move (e.g., e2-e4), undo or redo")
+        layout.addWidget(self.chess_notation_input)
+
+        # Connect chess notation input signal
+        self.chess_notation_input.returnPressed.connect(self.process_chess_notation)
+
+        # Connect log update signal
+        self.log_textedit.setPlainText(log_thread.get_display_text())
+        log_thread.entry_appended.connect(self.append_log_entry)
+        log_thread.log_cleared.connect(self.log_textedit.clear)
+
+        # Connect player change signal
+        self.scene.current_player_updated.connect(self.current_player_label.update_player)
+        self.scene.current_player_updated.connect(self.on_player_changed)
+        self.scene.current_player_updated.connect(self.update_position_stats)
+
+        # Start Game Button
+        start_game_button = QPushButton("Start Game")
+        start_game_button.clicked.connect(self.start_game)
+        layout.addWidget(start_game_button)
+
+        # Takeback Buttons
+        takeback_layout = QHBoxLayout()
+        undo_button = QPushButton("Undo")
+        undo_button.setShortcut(QKeySequence.Undo)
+        undo_button.clicked.connect(self.undo_move)
+        takeback_layout.addWidget(undo_button)
+        redo_button = QPushButton("Redo")
+        redo_button.setShortcut(QKeySequence.Redo)
+        redo_button.clicked.connect(self.redo_move)
+        takeback_layout.addWidget(redo_button)
+        layout.addLayout(takeback_layout)
+
+        # Resign Button
+        resign_button = QPushButton("Resign")
+        resign_button.clicked.connect(self.resign)
+        layout.addWidget(resign_button)
+        
+        # Radio Buttons for Game Mode Selection
+        self.human_vs_human_radio = QRadioButton("Human vs Human")
+        self.human_vs_computer_radio = QRadioButton("Human vs Computer")
+
+        # Set default mode (Human vs Human)
+        self.human_vs_human_radio.setChecked(True)
+        self.human_vs_human_radio.toggled.connect(lambda checked: checked and self.set_human_vs_human_mode())
+        self.human_vs_computer_radio.toggled.connect(lambda checked: checked and self.set_human_vs_computer_mode())
+
+        # Create layout for radio buttons
+        radio_layout = QHBoxLayout()
+        radio_layout.addWidget(self.human_vs_human_radio)
+        radio_layout.addWidget(self.human_vs_computer_radio)
+
+        # Engine threads, applied by Start Game
+        radio_layout.addWidget(QLabel("Engine threads:"))
+        self.threads_input = QSpinBox()
+        self.threads_input.setRange(1, self.MAX_ENGINE_THREADS)
+        self.threads_input.setValue(self.engine.threads)
+        radio_layout.addWidget(self.threads_input)
+        layout.addLayout(radio_layout)
+
+        self.setLayout(layout)
+        self.setWindowTitle("Chess")
+    
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = GameStore()
+        return self._store
+
+    def save_session_to_database(self, result):
+        # Generate a unique session name based on current date and time
+        session_name = self.generate_unique_session_name()
+        
+        # Store session name in set to keep track of saved sessions
+        self.session_names.add(session_name)
+
+        # One games row plus one moves row per ply, written in a single transaction
+        white = 'Computer' if self.computer_player == 'white' else 'Human'
+        black = 'Computer' if self.computer_player == 'black' else 'Human'
+        self.store.add_game(self.scene.history.moves, result, name=session_name, white=white, black=black)
+        self.update_position_stats()
+    
+    def update_position_stats(self, player=None):
+        self.position_stats_label.setText(str(self.store.position_stats(self.scene.position.hash)))
+
+    def generate_unique_session_name(self):
+        # Format the session name using current date and time
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+        session_name = f"Session_data_{timestamp}"
+        return session_name
+
+
+    def start_game(self):
+        ip_address = self.ip_input.text()
+        port = self.port_input.text()
+        game_mode = "Human vs Human" if self.human_vs_human_radio.isChecked() else "Human vs Computer"
+        threads = self.threads_input.value()
+        self.set_engine_threads(threads)
+
+        # Create a dictionary with configuration data
+        config_data = {
+            "game_mode": game_mode,
+            "ip_address": ip_address,
+            "port": port,
+            "threads": threads
+        }
+
+        # Save configuration data to JSON file
+        with open("config.json", "w") as json_file:
+            json.dump(config_data, json_file)
+
+        print("Configuration saved to config.json")
+
+        if port:
+            self.start_network_game(ip_address, port)
+
+    def start_network_game(self, address, port):
+        # With an IP address this window joins that host, without one it hosts the game
+        if self.network is not None:
+            log_thread.append_log("A network game is already running.")
+            return
+        if len(self.scene.history) or self.scene.game_over:
+            log_thread.append_log("Network games start from the initial position.")
+            return
+        try:
+            port = int(port)
+        except ValueError:
+            log_thread.append_log(f"Invalid port: {port}")
+            return
+        self.human_vs_human_radio.setChecked(True)
+        self.network = NetworkClient(address, port)
+        self.network.move_received.connect(self.on_network_move)
+        self.network.clocks_updated.connect(self.show_clocks)
+        self.network.game_finished.connect(self.on_network_result)
+        self.network.status_changed.connect(log_thread.append_log)
+        self.scene.remote_player = self.network.opponent
+        log_thread.append_log(f"Network game: you play {self.network.player}.")
+        self.network.start()
+
+    def on_network_move(self, move, clocks):
+        if self.scene.current_player == self.scene.remote_player and not self.scene.game_over:
+            self.scene.apply_move(move)
+        self.show_clocks(clocks)
+
+    def show_clocks(self, clocks):
+        self.clock_label.setText("   ".join(
+            f"{player.capitalize()} {max(ms, 0) // 60000}:{max(ms, 0) // 1000 % 60:02d}"
+            for player, ms in zip(PLAYER_NAMES, clocks)))
+
+    def on_network_result(self, result, reason):
+        if self.scene.game_over:
+            return
+        self.scene.game_over = True
+        loser = 'white' if result == '0-1' else 'black'
+        winner = 'Black' if loser == 'white' else 'White'
+        if reason == 'time':
+            log_thread.append_log(f"Game Over: {loser.capitalize()} ran out of time, {winner} Wins!")
+        else:
+            log_thread.append_log(f"Game Over: {loser.capitalize()} resigns, {winner} Wins!")
+        self.save_session_to_database(result)
+
+    def set_engine_threads(self, threads):
+        if threads == self.engine.threads:
+            return
+        # A new pool with its own shared table; a search in progress is restarted on it
+        self.engine.shutdown()
+        self.engine = EngineClient(threads, self.ENGINE_HASH_MB, threads)
+        self.engine.search_finished.connect(self.on_engine_result)
+        self.on_player_changed(self.scene.current_player)
+
+    def set_human_vs_human_mode(self):
+        self.computer_player = None
+        self.engine.cancel()
+
+    def set_human_vs_computer_mode(self):
+        if self.network is not None:
+            self.human_vs_human_radio.setChecked(True)  # The opponent is on the other end
+            return
+        # The human plays white, the engine answers as black
+        self.computer_player = 'black'
+        self.on_player_changed(self.scene.current_player)
+
+    def on_player_changed(self, player):
+        if self.network is not None and player == self.scene.remote_player and len(self.scene.history):
+            # The move just made here goes to the other end, even if it ended the game
+            self.network.play(self.scene.history.undo_records[-1][0])
+        if player == self.computer_player and not self.scene.game_over:
+            # Let the human's move paint before the engine starts thinking
+            QTimer.singleShot(0, self.make_computer_move)
+
+    def make_computer_move(self):
+        if self.scene.current_player != self.computer_player or self.scene.game_over:
+            return
+        # The search runs in a worker process; on_engine_result picks up the answer
+        self.search_key = self.scene.position.hash
+        self.engine.start_search(self.scene.position.copy(), self.COMPUTER_MOVE_TIME)
+
+    def on_engine_result(self, result):
+        # Ignore answers to positions that are no longer on the board
+        if self.scene.current_player != self.computer_player or self.scene.game_over or \
+                self.scene.position.hash != self.search_key or result.best_move is None:
+            return
+        self.search_key = None
+        log_thread.append_log(f"Computer ({self.computer_player}): depth {result.depth}, "
+                              f"{result.nodes} nodes, {result.nps} nodes/s")
+        self.scene.apply_move(result.best_move)
+
+    def undo_move(self):
+        # A finished game is already saved, so it stays as it ended; network games have no takebacks
+        if self.scene.game_over or self.network is not None:
+            return
+        self.engine.cancel()
+        self.search_key = None
+        if self.scene.undo_move() is None:
+            return
+        # Against the computer, take back its reply and the human's move together
+        if self.scene.current_player == self.computer_player:
+            self.scene.undo_move()
+        self.scene.change_turn()
+
+    def redo_move(self):
+        if self.scene.game_over or self.network is not None or self.scene.history.next_redo() is None:
+            return
+        self.engine.cancel()
+        self.search_key = None
+        self.scene.redo_move()
+        if self.scene.current_player == self.computer_player and not self.scene.game_over:
+            self.scene.redo_move()
+
+    def resign(self):
+        if self.scene.game_over:
+            return
+        self.engine.cancel()
+        # Against the computer it is always the human who gives up, over the network the local player
+        if self.network is not None:
+            loser = self.network.player
+            self.network.resign()
+        else:
+            loser = 'white' if self.computer_player else self.scene.current_player
+        winner = 'Black' if loser == 'white' else 'White'
+        self.scene.game_over = True
+        log_thread.append_log(f"Game Over: {loser.capitalize()} resigns, {winner} Wins!")
+        self.save_session_to_database('1-0' if winner == 'White' else '0-1')
+
+    def closeEvent(self, event):
+        self.engine.shutdown()
+        if self.network is not None:
+            self.network.close()
+        if self._store is not None:
+            self._store.close()
+        super().closeEvent(event)
+    
+    def process_chess_notation(self):
+        notation = self.chess_notation_input.text().strip()
+        self.scene.process_chess_notation(notation)
+        self.chess_notation_input.clear()
+
+
+
+    def append_log_entry(self, entry):
+        self.log_textedit.appendPlainText(entry)
+        
+class Piece:
+    def __init__(self, piece_type, player):
+        self.piece_type = piece_type
+        self.player = player
+
+
+def run(qt_args, timings=None):
+    """Create the application and the main window and run the event loop.
+
+    timings, if given, is a list of (step, seconds) that the startup
+    steps are appended to; it is printed once the first frame is up.
+    """
+    global log_thread, mainWindow
+
+    def timed(step, action):
+        start = time.perf_counter()
+        result = action()
+        if timings is not None:
+            timings.append((step, time.perf_counter() - start))
+        return result
+
+    app = timed("QApplication", lambda: QApplication(sys.argv[:1] + qt_args))
+
+    # Utwórz wątek logowania
+    log_thread = LogThread()
+
+    # Uruchom wątek logowania
+    log_thread_thread = threading.Thread(target=log_thread.run)
+    log_thread_thread.start()
+
+    # Utwórz i wyświetl główne okno
+    mainWindow = timed("main window", MainWindow)
+    shown = time.perf_counter()
+    mainWindow.show()
+
+    if timings is not None:
+        def first_frame():
+            timings.append(("first frame", time.perf_counter() - shown))
+            for step, seconds in timings:
+                print(f"{step:<24} {seconds * 1000:8.1f} ms")
+            print(f"{'total':<24} {sum(seconds for _, seconds in timings) * 1000:8.1f} ms", flush=True)
+        # Runs after the show and paint events queued above have been handled
+        QTimer.singleShot(0, first_frame)
+
+    return app.exec_()
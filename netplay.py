@@ -0,0 +1,487 @@
+"""Two-player games over TCP, on asyncio.
+
+The host listens and plays white, the guest connects and plays black.
+Every message is one ASCII line of space-separated fields, with moves
+in UCI notation and clocks in milliseconds:
+
+    hello <ply>                  guest, on every (re)connect: moves the host has confirmed
+    moves <ply> <w> <b> <uci>... host: the game's moves from <ply> on, and both clocks
+    move <ply> <uci>             guest: its move, the game's move number <ply> (from 0)
+    move <ply> <uci> <w> <b>     host: a move and both clocks after it; the guest's own
+                                 moves come back this way as their acknowledgement
+    resign                       guest gives up
+    result <result> <reason>     host: the game is over (resignation or time)
+    ping <id> / pong <id>        round-trip probe, answered by either side
+
+The host owns the game: it checks every move against the rules in
+position.py and runs the clocks, which start when the guest first
+connects.  A timer ends the game as soon as the side to move runs out
+of time, whether or not it ever moves again.  When the guest drops, the host keeps
+the game and the guest reconnects, sends how many moves it had
+confirmed and gets the rest, then resends any move of its own that the
+host never saw.  Nothing here touches Qt; NetworkThread runs a Host or
+Guest on its own event loop so a GUI never waits on a socket.
+"""
+
+import asyncio
+import random
+import statistics
+import threading
+import time
+
+from position import Position, MoveStack, WHITE, BLACK, move_to_uci, parse_uci_move
+
+DEFAULT_CLOCK_MS = 10 * 60 * 1000  # Per side, for the whole game
+RECONNECT_DELAYS = (0.5, 1, 2, 4, 8, 15, 30)  # Seconds between a guest's attempts before it gives up
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+class NetGame:
+    """Moves and clocks of one network game, as both ends see it."""
+
+    def __init__(self, clock_ms=DEFAULT_CLOCK_MS):
+        self.position = Position.initial()
+        self.history = MoveStack(self.position)
+        self.clocks = [clock_ms, clock_ms]
+        self.turn_start = None  # time.monotonic() when the side to move started thinking; kept by the host
+        self.result = None
+
+    @property
+    def ply(self):
+        return len(self.history)
+
+    def play(self, uci):
+        """Check and play a move in UCI notation; returns it encoded or raises ProtocolError."""
+        try:
+            move = parse_uci_move(uci)
+        except (ValueError, KeyError, IndexError):
+            raise ProtocolError(f"Not a move: {uci!r}") from None
+        if not self.position.is_legal(move):
+            raise ProtocolError(f"Illegal move {uci} at ply {self.ply}")
+        self.history.push(move)
+        return move
+
+    def press_clock(self):
+        """Charge the side that has just moved with its thinking time."""
+        now = time.monotonic()
+        if self.turn_start is not None:
+            self.clocks[self.position.side ^ 1] -= int((now - self.turn_start) * 1000)
+        self.turn_start = now
+
+    def time_left(self):
+        """Seconds the side to move has left right now, or None while the clocks are stopped."""
+        if self.turn_start is None or self.result:
+            return None
+        return self.clocks[self.position.side] / 1000 - (time.monotonic() - self.turn_start)
+
+    def flag(self):
+        """Charge the side to move up to now; returns the result if it has run out of time, else None."""
+        side = self.position.side
+        now = time.monotonic()
+        self.clocks[side] -= int((now - self.turn_start) * 1000)
+        self.turn_start = now
+        if self.clocks[side] > 0:
+            return None
+        return '0-1' if side == WHITE else '1-0'
+
+
+def encode_message(*fields):
+    return (' '.join(map(str, fields)) + '\n').encode('ascii')
+
+
+class Connection:
+    """Line-based messages over an asyncio stream."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def receive(self):
+        """The next message as a list of fields, or None once the other end has gone."""
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return None
+            fields = line.decode('ascii', 'replace').split()
+            if fields:
+                return fields
+
+    def write(self, *fields):
+        """Queue a message without waiting for the socket to take it."""
+        self.writer.write(encode_message(*fields))
+
+    async def send(self, *fields):
+        self.write(*fields)
+        await self.writer.drain()
+
+    def close(self):
+        self.writer.close()
+
+
+class NetPeer:
+    """One end of a network game.
+
+    The local player's moves come in through play() and resign(), which
+    must run on the peer's event loop.  What the other end does comes
+    out through the callbacks, also called on that loop:
+
+        on_move(move, clocks)      the opponent played an (encoded, legal) move
+        on_clocks(clocks)          the clocks after one of our moves, as the host counts them
+        on_result(result, reason)  the game ended by resignation or on time
+        on_status(text)            connection news for the user
+    """
+    color = WHITE
+
+    def __init__(self, clock_ms=DEFAULT_CLOCK_MS, on_move=None, on_clocks=None, on_result=None, on_status=None):
+        self.game = NetGame(clock_ms)
+        self.connection = None
+        self.finished = None  # asyncio.Event, created on the loop by run()
+        ignore = lambda *args: None
+        self.on_move = on_move or ignore
+        self.on_clocks = on_clocks or ignore
+        self.on_result = on_result or ignore
+        self.on_status = on_status or ignore
+        self.round_trips = []  # Seconds from sending a move to hearing it confirmed
+
+    async def send(self, *fields):
+        """Send if connected; the other end catches up on what it missed when it reconnects."""
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            await connection.send(*fields)
+        except ConnectionError:
+            pass  # The reader notices the drop and reports it
+
+    async def serve(self, connection):
+        """Handle messages until the connection drops or the game is over."""
+        while not self.finished.is_set():
+            fields = await connection.receive()
+            if fields is None:
+                return
+            try:
+                await self.handle(connection, fields)
+            except (ProtocolError, ValueError, IndexError) as e:
+                self.on_status(f"Bad message {' '.join(fields)!r} from the other side: {e}")
+
+    async def handle(self, connection, fields):
+        if fields[0] == 'ping':
+            await connection.send('pong', fields[1])
+        elif fields[0] == 'pong':
+            pass
+        else:
+            raise ProtocolError(f"Unknown message {fields[0]!r}")
+
+    def close(self):
+        if self.finished is not None:  # None until run() has started
+            self.finished.set()
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Host(NetPeer):
+    """Listens for the guest and keeps the authoritative game; plays white."""
+    color = WHITE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.port = None
+        self.listening = None  # asyncio.Event, set once the port is bound
+        self.flag_timer = None  # asyncio.TimerHandle for the side to move's clock running out
+
+    async def run(self, address, port):
+        self.finished = asyncio.Event()
+        self.listening = asyncio.Event()
+        # One IPv4 socket, so that with port 0 there is exactly one port to report
+        server = await asyncio.start_server(self.accept, address or '0.0.0.0', port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.listening.set()
+        self.on_status(f"Waiting for an opponent on port {self.port}")
+        async with server:
+            await self.finished.wait()
+
+    async def accept(self, reader, writer):
+        connection = Connection(reader, writer)
+        if self.connection is not None:
+            self.connection.close()  # A reconnecting guest replaces its dead connection
+        self.connection = connection
+        self.on_status(f"Opponent connected from {writer.get_extra_info('peername')[0]}")
+        try:
+            await self.serve(connection)
+        except ConnectionError:
+            pass
+        finally:
+            connection.close()
+            if self.connection is connection:
+                self.connection = None
+                if not self.finished.is_set() and not self.game.result:
+                    self.on_status("Opponent disconnected; waiting for them to reconnect")
+
+    async def handle(self, connection, fields):
+        game = self.game
+        command = fields[0]
+        if command == 'hello':
+            if game.turn_start is None and not game.result:
+                # The clocks start once both players are there
+                game.turn_start = time.monotonic()
+                self.arm_flag()
+            ply = min(int(fields[1]), game.ply)
+            await connection.send('moves', ply, *game.clocks, *map(move_to_uci, game.history.moves[ply:]))
+            if game.result:
+                await connection.send('result', *game.result)
+        elif command == 'move':
+            ply = int(fields[1])
+            if ply < game.ply:
+                return  # Resent after a reconnect, and already played
+            if ply > game.ply or game.position.side != BLACK or game.result:
+                raise ProtocolError(f"Move {ply} is out of turn")
+            move = game.play(fields[2])
+            game.press_clock()
+            await connection.send('move', ply, fields[2], *game.clocks)
+            self.on_move(move, list(game.clocks))
+            if game.clocks[BLACK] < 0:
+                await self.finish('1-0', 'time')
+            else:
+                self.arm_flag()
+        elif command == 'resign':
+            await self.finish('1-0', 'resignation')
+        else:
+            await super().handle(connection, fields)
+
+    async def play(self, move):
+        game = self.game
+        if game.result:
+            self.on_status(f"The game is over ({game.result[0]}); move not played")
+            return
+        ply = game.ply
+        game.history.push(move)
+        game.press_clock()
+        self.on_clocks(list(game.clocks))
+        await self.send('move', ply, move_to_uci(move), *game.clocks)
+        if game.clocks[WHITE] < 0:
+            await self.finish('0-1', 'time')
+        else:
+            self.arm_flag()
+
+    async def resign(self):
+        await self.finish('0-1', 'resignation')
+
+    def arm_flag(self):
+        """(Re)start the timer that ends the game when the side to move runs out of time."""
+        if self.flag_timer is not None:
+            self.flag_timer.cancel()
+            self.flag_timer = None
+        left = self.game.time_left()
+        if left is not None:
+            loop = asyncio.get_running_loop()
+            self.flag_timer = loop.call_later(max(left, 0), lambda: loop.create_task(self.check_flag()))
+
+    async def check_flag(self):
+        self.flag_timer = None
+        if self.game.result:
+            return
+        result = self.game.flag()
+        if result is None:
+            self.arm_flag()  # Woke a little early
+        else:
+            self.on_clocks(list(self.game.clocks))
+            await self.finish(result, 'time')
+
+    def close(self):
+        if self.flag_timer is not None:
+            self.flag_timer.cancel()
+        super().close()
+
+    async def finish(self, result, reason):
+        if self.game.result:
+            return
+        if self.flag_timer is not None:
+            self.flag_timer.cancel()
+            self.flag_timer = None
+        self.game.result = (result, reason)
+        await self.send('result', result, reason)
+        self.on_result(result, reason)
+
+
+class Guest(NetPeer):
+    """Connects to the host, and reconnects whenever the connection drops; plays black."""
+    color = BLACK
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.confirmed = 0  # Moves the host is known to have
+        self.sent_at = {}  # Ply of an unconfirmed move of ours -> time.perf_counter() it was sent
+
+    async def run(self, address, port):
+        self.finished = asyncio.Event()
+        attempt = 0
+        while not self.finished.is_set():
+            try:
+                reader, writer = await asyncio.open_connection(address, port)
+            except OSError as e:
+                if attempt == len(RECONNECT_DELAYS):
+                    self.on_status(f"Could not reach {address}:{port}: {e}")
+                    return
+                await asyncio.sleep(RECONNECT_DELAYS[attempt])
+                attempt += 1
+                continue
+            attempt = 0
+            connection = Connection(reader, writer)
+            self.connection = connection
+            self.on_status(f"Connected to {address}:{port}")
+            try:
+                await connection.send('hello', self.confirmed)
+                await self.serve(connection)
+            except ConnectionError:
+                pass
+            finally:
+                self.connection = None
+                connection.close()
+            if not self.finished.is_set():
+                self.on_status("Connection lost; reconnecting")
+
+    async def handle(self, connection, fields):
+        game = self.game
+        command = fields[0]
+        if command == 'moves':
+            ply, game.clocks = int(fields[1]), [int(fields[2]), int(fields[3])]
+            for index, uci in enumerate(fields[4:], ply):
+                if index < game.ply:
+                    continue  # Ours, played before the connection dropped
+                self.on_move(game.play(uci), list(game.clocks))
+            self.confirmed = ply + len(fields) - 4
+            # Our own moves the host never got go out again
+            for index, move in enumerate(game.history.moves[self.confirmed:], self.confirmed):
+                await connection.send('move', index, move_to_uci(move))
+            self.on_clocks(list(game.clocks))
+        elif command == 'move':
+            ply, uci = int(fields[1]), fields[2]
+            game.clocks = [int(fields[3]), int(fields[4])]
+            if ply < game.ply:
+                # The host's acknowledgement of our move
+                sent_at = self.sent_at.pop(ply, None)
+                if sent_at is not None:
+                    self.round_trips.append(time.perf_counter() - sent_at)
+                self.on_clocks(list(game.clocks))
+            elif ply == game.ply:
+                self.on_move(game.play(uci), list(game.clocks))
+            else:
+                raise ProtocolError(f"Move {ply} skips ahead of move {game.ply}")
+            self.confirmed = ply + 1
+        elif command == 'result':
+            game.result = (fields[1], fields[2])
+            self.on_result(*game.result)
+            self.finished.set()
+        else:
+            await super().handle(connection, fields)
+
+    async def play(self, move):
+        game = self.game
+        if game.result:
+            self.on_status(f"The game is over ({game.result[0]}); move not played")
+            return
+        ply = game.ply
+        game.history.push(move)
+        self.sent_at[ply] = time.perf_counter()
+        await self.send('move', ply, move_to_uci(move))
+
+    async def resign(self):
+        await self.send('resign')
+
+
+class NetworkThread:
+    """Runs a Host or Guest on an asyncio loop in a daemon thread.
+
+    play(), resign() and close() may be called from any thread; they are
+    handed to the loop with call_soon_threadsafe, so the caller never
+    blocks on the network.  The peer's callbacks run on the network
+    thread.
+    """
+
+    def __init__(self, peer, address, port):
+        self.peer = peer
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, args=(address, port), daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self, address, port):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.peer.run(address, port))
+        except OSError as e:
+            self.peer.on_status(f"Network error: {e}")
+        finally:
+            self.loop.close()
+
+    def submit(self, coroutine_function, *args):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(lambda: self.loop.create_task(coroutine_function(*args)))
+
+    def play(self, move):
+        self.submit(self.peer.play, move)
+
+    def resign(self):
+        self.submit(self.peer.resign)
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.peer.close)
+        self.thread.join(timeout=1)
+
+
+def measure_latency(plies=200, seed=1):
+    """Play random moves between a host and a guest over localhost.
+
+    Returns (one-way delivery times of host moves, round trips of guest
+    moves to their acknowledgement), both lists of seconds.
+    """
+    async def session():
+        received = asyncio.Queue()
+        host = Host(on_move=lambda move, clocks: received.put_nowait(move))
+        guest = Guest(on_move=lambda move, clocks: received.put_nowait(move),
+                      on_clocks=lambda clocks: received.put_nowait(None))
+        host_task = asyncio.create_task(host.run('127.0.0.1', 0))
+        while host.listening is None or not host.listening.is_set():
+            await asyncio.sleep(0.01)
+        guest_task = asyncio.create_task(guest.run('127.0.0.1', host.port))
+        while host.connection is None:
+            await asyncio.sleep(0.01)
+        await received.get()  # The guest's clocks from the resume handshake
+
+        chooser = random.Random(seed)
+        position = Position.initial()
+        deliveries = []
+        for _ in range(plies):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            move = chooser.choice(moves)
+            position.make_move(move)
+            if position.side == BLACK:
+                start = time.perf_counter()
+                await host.play(move)
+                await received.get()  # Played on the guest's board
+                deliveries.append(time.perf_counter() - start)
+            else:
+                await guest.play(move)
+                await received.get()  # Host's move on the host's board
+                await received.get()  # Acknowledgement back at the guest
+
+        guest.close()
+        host.close()
+        await asyncio.gather(host_task, guest_task)
+        return deliveries, guest.round_trips
+
+    return asyncio.run(session())
+
+
+def latency_summary(seconds):
+    """'median ..., 95th percentile ..., max ...' in milliseconds."""
+    ordered = sorted(seconds)
+    return (f"median {statistics.median(ordered) * 1000:.2f} ms, "
+            f"95th percentile {ordered[int(len(ordered) * 0.95)] * 1000:.2f} ms, max {ordered[-1] * 1000:.2f} ms")
@@ -0,0 +1,342 @@
+"""Streaming PGN reader and writer.
+
+read_games walks a PGN file line by line and yields one PgnGame at a
+time, so memory stays flat however large the file is.  parse_game turns
+a PgnGame into encoded moves by resolving every SAN token against the
+legal moves of the position, which validates the game as a side effect.
+import_pgn feeds the result into a GameStore in large transactions and
+skips (and reports) games that do not parse; export_pgn streams the
+store back out in id order.
+"""
+
+import re
+import time
+
+from gamestore import UNKNOWN_DATE
+from position import (Position, WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, OCCUPANCY, START_FEN,
+                      KNIGHT_ATTACKS, KING_ATTACKS, rook_attacks, bishop_attacks,
+                      square_name, parse_square, move_from, move_to, move_promotion)
+
+RESULT_TOKENS = ('1-0', '0-1', '1/2-1/2', '*')
+
+SAN_PIECES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+SAN_LETTERS = {kind: letter for letter, kind in SAN_PIECES.items()}
+
+SAN_MOVE = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$")
+CASTLING_SAN = re.compile(r"([O0]-[O0](?:-[O0])?)[+#]?[!?]*$")
+TAG_LINE = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+MOVETEXT_TOKEN = re.compile(r"\{[^}]*\}?|;[^\n]*|\$\d+|[()]|[^\s(){};]+")
+MOVE_NUMBER = re.compile(r"\d+\.+")
+
+SEVEN_TAGS = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+class PgnError(ValueError):
+    pass
+
+
+class PgnGame:
+    """Tags and raw movetext of one game, plus where it started in the file."""
+    __slots__ = ('tags', 'movetext', 'line_number')
+
+    def __init__(self, tags, movetext, line_number):
+        self.tags = tags
+        self.movetext = movetext
+        self.line_number = line_number
+
+
+def read_games(lines):
+    """Yield a PgnGame for every game in an iterable of lines (e.g. an open file)."""
+    tags = {}
+    movetext = []
+    line_number = 0
+    start_line = 1
+    open_comment = False  # Inside a {...} comment that spans lines
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not open_comment and line.startswith('['):
+            if movetext:
+                yield PgnGame(tags, ' '.join(movetext), start_line)
+                tags = {}
+                movetext = []
+            if not tags:
+                start_line = line_number
+            match = TAG_LINE.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            continue
+        if not line or line.startswith('%'):
+            continue
+        if not tags and not movetext:
+            start_line = line_number
+        movetext.append(line)
+        if '{' in line or '}' in line:
+            open_comment = line.rfind('{') > line.rfind('}') or (open_comment and '}' not in line)
+    if tags or movetext:
+        yield PgnGame(tags, ' '.join(movetext), start_line)
+
+
+def parse_san(position, san):
+    """The legal move written as `san` in position; raises PgnError if there is not exactly one.
+
+    Rather than generating every legal move, the possible origins are
+    looked up backwards from the target square and only those are
+    tried, which is what keeps bulk imports fast.
+    """
+    match = CASTLING_SAN.match(san)
+    if match:
+        king = position.king_square(position.side)
+        target = king + (-2 if len(match.group(1)) == 5 else 2)
+        for move in position.legal_moves():
+            if move & 0xFFF == king | target << 6:
+                return move
+        raise PgnError(f"Illegal castling {san!r}")
+
+    match = SAN_MOVE.match(san)
+    if not match:
+        raise PgnError(f"Not a SAN move: {san!r}")
+    piece, from_file, from_rank, target, promotion = match.groups()
+    kind = SAN_PIECES[piece] if piece else PAWN
+    to_square = parse_square(target)
+    promotion = SAN_PIECES[promotion] if promotion else 0
+
+    side = position.side
+    flag = side << 3
+    bitboards = position.bitboards
+    board = position.board
+    if board[to_square] and board[to_square] >> 3 == side or promotion and kind != PAWN:
+        raise PgnError(f"Illegal move {san!r}")
+    if kind == PAWN:
+        back = 8 if side == WHITE else -8  # Row 0 is rank 8, so white pawns move to lower squares
+        last_row = 0 if side == WHITE else 7
+        if (to_square >> 3 == last_row) != bool(promotion) or to_square >> 3 == 7 - last_row:
+            raise PgnError(f"Illegal move {san!r}")
+        origins = 0
+        if from_file and ord(from_file) - ord('a') != to_square & 7:
+            from_square = to_square + back - (to_square & 7) + ord(from_file) - ord('a')
+            if abs((from_square & 7) - (to_square & 7)) == 1 and \
+                    (board[to_square] or to_square == position.ep_square):
+                origins = 1 << from_square
+        elif not board[to_square]:
+            from_square = to_square + back
+            if board[from_square] == PAWN | flag:
+                origins = 1 << from_square
+            elif not board[from_square] and to_square >> 3 == (4 if side == WHITE else 3):
+                origins = 1 << (from_square + back)
+        origins &= bitboards[flag | kind]
+    else:
+        origins = _piece_origins(position, kind, to_square)
+
+    found = None
+    for from_square in _legal_origins(position, origins, to_square, promotion):
+        if from_file and from_square & 7 != ord(from_file) - ord('a'):
+            continue
+        if from_rank and 8 - (from_square >> 3) != int(from_rank):
+            continue
+        if found is not None:
+            raise PgnError(f"Ambiguous move {san!r}")
+        found = from_square | to_square << 6 | promotion << 12
+    if found is None:
+        raise PgnError(f"Illegal move {san!r}")
+    return found
+
+
+def _piece_origins(position, kind, to_square):
+    """Bitboard of the side to move's pieces of a (non-pawn) kind that attack to_square."""
+    bitboards = position.bitboards
+    occupied = bitboards[OCCUPANCY] | bitboards[OCCUPANCY | 8]
+    if kind == KNIGHT:
+        origins = KNIGHT_ATTACKS[to_square]
+    elif kind == KING:
+        origins = KING_ATTACKS[to_square]
+    elif kind == BISHOP:
+        origins = bishop_attacks(to_square, occupied)
+    elif kind == ROOK:
+        origins = rook_attacks(to_square, occupied)
+    else:
+        origins = bishop_attacks(to_square, occupied) | rook_attacks(to_square, occupied)
+    return origins & bitboards[position.side << 3 | kind]
+
+
+def _legal_origins(position, origins, to_square, promotion=0):
+    """The squares in the origins bitboard whose move to to_square does not leave the king in check."""
+    side = position.side
+    king = KING | side << 3
+    bitboards = position.bitboards
+    legal = []
+    while origins:
+        low = origins & -origins
+        origins ^= low
+        from_square = low.bit_length() - 1
+        undo = position.make_move(from_square | to_square << 6 | promotion << 12)
+        if not position.is_square_attacked(bitboards[king].bit_length() - 1, side ^ 1):
+            legal.append(from_square)
+        position.unmake_move(undo)
+    return legal
+
+
+def move_to_san(position, move):
+    """SAN for a legal move, with the check and mate suffixes."""
+    from_square, to_square, promotion = move_from(move), move_to(move), move_promotion(move)
+    kind = position.board[from_square] & 7
+    if kind == KING and abs((to_square & 7) - (from_square & 7)) == 2:
+        san = 'O-O' if to_square & 7 == 6 else 'O-O-O'
+    elif kind == PAWN:
+        san = square_name(to_square)
+        if from_square & 7 != to_square & 7:
+            san = square_name(from_square)[0] + 'x' + san
+        if promotion:
+            san += '=' + SAN_LETTERS[promotion]
+    else:
+        # Disambiguate by file, then rank, then both, like PGN requires
+        rivals = _legal_origins(position, _piece_origins(position, kind, to_square) & ~(1 << from_square), to_square)
+        prefix = ''
+        if rivals:
+            if all(rival & 7 != from_square & 7 for rival in rivals):
+                prefix = square_name(from_square)[0]
+            elif all(rival >> 3 != from_square >> 3 for rival in rivals):
+                prefix = square_name(from_square)[1]
+            else:
+                prefix = square_name(from_square)
+        capture = 'x' if position.board[to_square] else ''
+        san = SAN_LETTERS[kind] + prefix + capture + square_name(to_square)
+
+    undo = position.make_move(move)
+    if position.in_check():
+        san += '+' if position.has_legal_move() else '#'
+    position.unmake_move(undo)
+    return san
+
+
+def parse_game(game):
+    """(start FEN or None, encoded moves, result) of a PgnGame; raises PgnError if it is malformed."""
+    start_fen = game.tags.get('FEN') if game.tags.get('SetUp', '1') == '1' else None
+    try:
+        position = Position.from_fen(start_fen) if start_fen else Position.initial()
+    except (ValueError, IndexError, KeyError) as e:
+        raise PgnError(f"Bad FEN tag: {e}") from None
+    if start_fen == START_FEN:
+        start_fen = None
+
+    moves = []
+    result = None
+    variation_depth = 0
+    for token in MOVETEXT_TOKEN.findall(game.movetext):
+        if token[0] in '{;$':
+            continue
+        if token == '(':
+            variation_depth += 1
+            continue
+        if token == ')':
+            variation_depth -= 1
+            continue
+        if variation_depth or token == 'e.p.':
+            continue
+        if token in RESULT_TOKENS:
+            result = token
+            break
+        token = MOVE_NUMBER.sub('', token, count=1) if token[0].isdigit() else token
+        if not token:
+            continue
+        try:
+            move = parse_san(position, token)
+        except PgnError as e:
+            raise PgnError(f"{e} at ply {len(moves) + 1}") from None
+        position.make_move(move)
+        moves.append(move)
+
+    tag_result = game.tags.get('Result', '*')
+    if result is None:
+        result = tag_result if tag_result in RESULT_TOKENS else '*'
+    elif result != '*' and tag_result in RESULT_TOKENS and tag_result not in ('*', result):
+        raise PgnError(f"Result tag {tag_result} does not match movetext result {result}")
+    outcome = position.result_conflict(result)
+    if outcome is not None:
+        # The final position decides a finished game
+        raise PgnError(f"Result {result} but the game ends in {outcome[0]} by {outcome[1]}")
+    return start_fen, moves, result
+
+
+def _pgn_date(played_at):
+    return played_at[:10].replace('-', '.') if played_at else '????.??.??'
+
+
+def _store_date(date):
+    return date.replace('.', '-') if date and '?' not in date else None
+
+
+def format_game(tags, moves, result, start_fen=None, width=80):
+    """PGN text of one game; tags is a dict, the Seven Tag Roster is filled in with '?'."""
+    position = Position.from_fen(start_fen) if start_fen else Position.initial()
+    tags = dict(tags, Result=result)
+    if start_fen:
+        tags['SetUp'] = '1'
+        tags['FEN'] = start_fen
+    ordered = [name for name in SEVEN_TAGS] + [name for name in tags if name not in SEVEN_TAGS]
+    header = ''.join('[%s "%s"]\n' % (name, str(tags.get(name) or '?').replace('\\', '\\\\').replace('"', '\\"'))
+                     for name in ordered)
+
+    tokens = []
+    for ply, move in enumerate(moves):
+        if position.side == WHITE:
+            tokens.append(f"{position.fullmove_number}.")
+        elif ply == 0:
+            tokens.append(f"{position.fullmove_number}...")
+        tokens.append(move_to_san(position, move))
+        position.make_move(move)
+    tokens.append(result)
+
+    lines = []
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return header + '\n' + '\n'.join(lines) + '\n\n'
+
+
+def import_pgn(store, path, batch_size=1000, report=print):
+    """Stream a PGN file into a GameStore; returns (imported, skipped, seconds).
+
+    Games that fail to parse are reported and skipped, the rest go in
+    batch_size games per transaction.
+    """
+    imported = skipped = 0
+    start = time.perf_counter()
+    with open(path, encoding='utf-8', errors='replace') as pgn_file:
+        games = read_games(pgn_file)
+        while True:
+            with store.transaction():
+                batch = 0
+                for game in games:
+                    try:
+                        start_fen, moves, result = parse_game(game)
+                    except PgnError as e:
+                        skipped += 1
+                        report(f"Skipped game at line {game.line_number}: {e}")
+                        continue
+                    store.add_game(moves, result, name=game.tags.get('Event'), white=game.tags.get('White'),
+                                   black=game.tags.get('Black'), start_fen=start_fen,
+                                   played_at=_store_date(game.tags.get('Date')) or UNKNOWN_DATE, validate=False)
+                    imported += 1
+                    batch += 1
+                    if batch == batch_size:
+                        break
+            if batch < batch_size:
+                break
+    return imported, skipped, time.perf_counter() - start
+
+
+def export_pgn(store, path):
+    """Write every stored game to a PGN file in id order; returns (exported, seconds)."""
+    exported = 0
+    start = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as pgn_file:
+        for game_id, name, played_at, white, black, result, start_fen, moves in store.iter_games():
+            tags = {'Event': name, 'Date': _pgn_date(played_at), 'White': white, 'Black': black}
+            pgn_file.write(format_game(tags, moves, result, start_fen))
+            exported += 1
+    return exported, time.perf_counter() - start
@@ -0,0 +1,840 @@
+"""Headless chess position model.
+
+The board is a flat 64-entry bytearray indexed the same way as the GUI
+(square = row * 8 + col, row 0 is rank 8, col 0 is the a-file), so the
+Qt scene can mirror it without any coordinate juggling.  Alongside it the
+position keeps one bitboard per piece code (bit n is square n), which the
+attack tables below work on, and a Zobrist key that make_move and
+unmake_move keep up to date.  Nothing in this module imports Qt; it is
+shared by the GUI, the engine and the CLI tools.
+"""
+
+import random
+
+WHITE = 0
+BLACK = 1
+
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+
+# Black pieces carry this bit, white pieces don't: piece & 7 is the kind,
+# piece >> 3 is the colour.
+BLACK_FLAG = 8
+
+# Piece codes 7 and 15 are unused, so their bitboard slots hold the
+# occupancy of each colour (OCCUPANCY | colour << 3).
+OCCUPANCY = 7
+
+# Castling rights bit mask
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+NO_SQUARE = -1
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+PIECE_NAMES = {
+    PAWN: 'w_pawn', KNIGHT: 'w_knight', BISHOP: 'w_bishop',
+    ROOK: 'w_rook', QUEEN: 'w_queen', KING: 'w_king',
+    BLACK_FLAG | PAWN: 'b_pawn', BLACK_FLAG | KNIGHT: 'b_knight', BLACK_FLAG | BISHOP: 'b_bishop',
+    BLACK_FLAG | ROOK: 'b_rook', BLACK_FLAG | QUEEN: 'b_queen', BLACK_FLAG | KING: 'b_king',
+}
+PIECE_CODES = {name: code for code, name in PIECE_NAMES.items()}
+
+FEN_LETTERS = {
+    PAWN: 'P', KNIGHT: 'N', BISHOP: 'B', ROOK: 'R', QUEEN: 'Q', KING: 'K',
+    BLACK_FLAG | PAWN: 'p', BLACK_FLAG | KNIGHT: 'n', BLACK_FLAG | BISHOP: 'b',
+    BLACK_FLAG | ROOK: 'r', BLACK_FLAG | QUEEN: 'q', BLACK_FLAG | KING: 'k',
+}
+FEN_PIECES = {letter: code for code, letter in FEN_LETTERS.items()}
+
+PLAYER_NAMES = ('white', 'black')
+
+# Material in pawns per piece kind; the king is not counted
+MATERIAL_VALUES = (0, 1, 3, 3, 5, 9, 0)
+
+# (d_col, d_row) steps
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+
+PROMOTION_PIECES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# Castling rights that survive a move touching the given square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 & ~BLACK_QUEENSIDE
+CASTLING_MASK[7] = 15 & ~BLACK_KINGSIDE
+CASTLING_MASK[4] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[56] = 15 & ~WHITE_QUEENSIDE
+CASTLING_MASK[63] = 15 & ~WHITE_KINGSIDE
+CASTLING_MASK[60] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+
+
+
+# Attack tables, built once at import.  Leapers get one bitboard per
+# square; sliders get, per square and per line (rank, file, diagonal,
+# anti-diagonal), the mask of squares whose occupancy matters and a dict
+# from the masked occupancy to the attacked squares on that line.
+
+def _step_attacks(steps):
+    table = []
+    for square in range(64):
+        col, row = square & 7, square >> 3
+        attacks = 0
+        for d_col, d_row in steps:
+            c, r = col + d_col, row + d_row
+            if 0 <= c < 8 and 0 <= r < 8:
+                attacks |= 1 << (r * 8 + c)
+        table.append(attacks)
+    return table
+
+
+def _ray(square, d_col, d_row):
+    squares = []
+    c, r = (square & 7) + d_col, (square >> 3) + d_row
+    while 0 <= c < 8 and 0 <= r < 8:
+        squares.append(r * 8 + c)
+        c += d_col
+        r += d_row
+    return squares
+
+
+def _line_attacks(d_col, d_row):
+    masks = []
+    tables = []
+    for square in range(64):
+        rays = (_ray(square, d_col, d_row), _ray(square, -d_col, -d_row))
+        # The last square of a ray is attacked whether or not it is occupied
+        mask = 0
+        for ray in rays:
+            for target in ray[:-1]:
+                mask |= 1 << target
+        table = {}
+        subset = 0
+        while True:
+            attacks = 0
+            for ray in rays:
+                for target in ray:
+                    attacks |= 1 << target
+                    if subset >> target & 1:
+                        break
+            table[subset] = attacks
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS = _step_attacks(KNIGHT_STEPS)
+KING_ATTACKS = _step_attacks(KING_STEPS)
+# PAWN_ATTACKS[colour][square]: squares a pawn of that colour on square attacks
+PAWN_ATTACKS = (_step_attacks(((-1, -1), (1, -1))), _step_attacks(((-1, 1), (1, 1))))
+RANK_MASK, RANK_ATTACKS = _line_attacks(1, 0)
+FILE_MASK, FILE_ATTACKS = _line_attacks(0, 1)
+DIAGONAL_MASK, DIAGONAL_ATTACKS = _line_attacks(1, 1)
+ANTI_DIAGONAL_MASK, ANTI_DIAGONAL_ATTACKS = _line_attacks(1, -1)
+
+
+
+def _between():
+    table = [0] * 4096
+    for square in range(64):
+        for d_col, d_row in KING_STEPS:
+            between = 0
+            for target in _ray(square, d_col, d_row):
+                table[square * 64 + target] = between
+                between |= 1 << target
+    return table
+
+
+# BETWEEN[a * 64 + b]: squares strictly between two aligned squares, 0 otherwise
+BETWEEN = _between()
+
+# a8 (square 0) is a light square
+LIGHT_SQUARES = sum(1 << square for square in range(64) if ((square >> 3) + (square & 7)) % 2 == 0)
+DARK_SQUARES = ~LIGHT_SQUARES & (1 << 64) - 1
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+ROW_MASKS = tuple(0xFF << (row * 8) for row in range(8))
+
+
+def rook_attacks(square, occupied):
+    return RANK_ATTACKS[square][occupied & RANK_MASK[square]] | FILE_ATTACKS[square][occupied & FILE_MASK[square]]
+
+
+def bishop_attacks(square, occupied):
+    return DIAGONAL_ATTACKS[square][occupied & DIAGONAL_MASK[square]] | \
+        ANTI_DIAGONAL_ATTACKS[square][occupied & ANTI_DIAGONAL_MASK[square]]
+
+
+ROOK_RAYS = [rook_attacks(square, 0) for square in range(64)]
+BISHOP_RAYS = [bishop_attacks(square, 0) for square in range(64)]
+
+
+# Zobrist keys.  A fixed seed keeps them identical across runs and processes,
+# so keys can be stored in databases and shared between search workers.
+_zobrist_random = random.Random(0x5A0B21)
+# ZOBRIST_PIECES[piece << 6 | square]
+ZOBRIST_PIECES = [_zobrist_random.getrandbits(64) if piece & 7 not in (EMPTY, OCCUPANCY) else 0
+                  for piece in range(16) for square in range(64)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [0] + [_zobrist_random.getrandbits(64) for _ in range(15)]
+ZOBRIST_EP_FILE = [_zobrist_random.getrandbits(64) for _ in range(8)]
+
+
+# Reference positions with known perft node counts, indexed by depth - 1
+PERFT_SUITE = (
+    ('startpos', START_FEN, (20, 400, 8902, 197281, 4865609)),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     (48, 2039, 97862, 4085603)),
+    ('position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', (14, 191, 2812, 43238, 674624)),
+    ('position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     (6, 264, 9467, 422333)),
+    ('position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', (44, 1486, 62379, 2103487)),
+)
+
+
+def square_index(col, row):
+    return row * 8 + col
+
+
+def square_name(square):
+    return f"{chr(ord('a') + (square & 7))}{8 - (square >> 3)}"
+
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f"Invalid square: {name!r}")
+    return (8 - int(name[1])) * 8 + ord(name[0]) - ord('a')
+
+
+def piece_color(piece):
+    return piece >> 3
+
+
+# Moves are plain ints: from | to << 6 | promotion piece kind << 12
+def encode_move(from_square, to_square, promotion=EMPTY):
+    return from_square | to_square << 6 | promotion << 12
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return move >> 12
+
+
+def move_to_uci(move):
+    text = square_name(move & 63) + square_name((move >> 6) & 63)
+    if move >> 12:
+        text += FEN_LETTERS[BLACK_FLAG | move >> 12]
+    return text
+
+
+def parse_uci_move(text):
+    promotion = FEN_PIECES[text[4].lower()] & 7 if len(text) == 5 else EMPTY
+    return encode_move(parse_square(text[0:2]), parse_square(text[2:4]), promotion)
+
+
+class Position:
+    """Compact, Qt-free chess position."""
+
+    __slots__ = ('board', 'bitboards', 'side', 'castling', 'ep_square', 'halfmove_clock', 'fullmove_number',
+                 'hash', 'key_history', 'material')
+
+    def __init__(self):
+        self.board = bytearray(64)
+        self.bitboards = [0] * 16
+        self.side = WHITE
+        self.castling = 0
+        self.ep_square = NO_SQUARE
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.hash = 0
+        # Keys of the positions before each move played on this object
+        self.key_history = []
+        self.material = [0, 0]  # Per colour, in pawns (MATERIAL_VALUES)
+
+    @classmethod
+    def initial(cls):
+        return cls.from_fen(START_FEN)
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        if len(fields) < 2:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        position = cls()
+
+        rows = fields[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN board: {fields[0]!r}")
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                elif char in FEN_PIECES and col < 8:
+                    piece = FEN_PIECES[char]
+                    position.board[row * 8 + col] = piece
+                    position.bitboards[piece] |= 1 << (row * 8 + col)
+                    position.bitboards[OCCUPANCY | piece & BLACK_FLAG] |= 1 << (row * 8 + col)
+                    position.material[piece >> 3] += MATERIAL_VALUES[piece & 7]
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN board: {fields[0]!r}")
+            if col != 8:
+                raise ValueError(f"Invalid FEN board: {fields[0]!r}")
+        for color in (WHITE, BLACK):
+            if position.bitboards[KING | color << 3].bit_count() != 1:
+                raise ValueError(f"Invalid FEN board, {PLAYER_NAMES[color]} needs exactly one king: {fields[0]!r}")
+
+        if fields[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid side to move: {fields[1]!r}")
+        position.side = WHITE if fields[1] == 'w' else BLACK
+
+        castling = fields[2] if len(fields) > 2 else '-'
+        for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                            ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE)):
+            if char in castling:
+                position.castling |= right
+
+        ep = fields[3] if len(fields) > 3 else '-'
+        position.ep_square = NO_SQUARE if ep == '-' else parse_square(ep)
+        # Normalise like make_move does: keep the square only if a pawn can take there
+        if position.ep_square != NO_SQUARE and not \
+                PAWN_ATTACKS[position.side ^ 1][position.ep_square] & position.bitboards[PAWN | position.side << 3]:
+            position.ep_square = NO_SQUARE
+        position.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        position.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        position.hash = position.compute_hash()
+        return position
+
+    def compute_hash(self):
+        """Zobrist key from scratch; make_move keeps self.hash equal to this incrementally."""
+        key = ZOBRIST_CASTLING[self.castling]
+        for square, piece in enumerate(self.board):
+            if piece:
+                key ^= ZOBRIST_PIECES[piece << 6 | square]
+        if self.side == BLACK:
+            key ^= ZOBRIST_SIDE
+        if self.ep_square != NO_SQUARE:
+            key ^= ZOBRIST_EP_FILE[self.ep_square & 7]
+        return key
+
+    def repetition_count(self):
+        """How many times the current position has occurred, counting this one."""
+        count = 1
+        history = self.key_history
+        key = self.hash
+        # Only positions since the last capture or pawn move, with the same side to move, can match
+        for index in range(len(history) - 2, max(len(history) - self.halfmove_clock, 0) - 1, -2):
+            if history[index] == key:
+                count += 1
+        return count
+
+    def fen(self):
+        rows = []
+        for row in range(8):
+            text = ''
+            empty = 0
+            for piece in self.board[row * 8:row * 8 + 8]:
+                if piece:
+                    if empty:
+                        text += str(empty)
+                        empty = 0
+                    text += FEN_LETTERS[piece]
+                else:
+                    empty += 1
+            if empty:
+                text += str(empty)
+            rows.append(text)
+
+        castling = ''.join(char for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                                                    ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+                           if self.castling & right) or '-'
+        ep = square_name(self.ep_square) if self.ep_square != NO_SQUARE else '-'
+        side = 'w' if self.side == WHITE else 'b'
+        return f"{'/'.join(rows)} {side} {castling} {ep} {self.halfmove_clock} {self.fullmove_number}"
+
+    def copy(self):
+        position = Position()
+        position.board[:] = self.board
+        position.bitboards[:] = self.bitboards
+        position.side = self.side
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.hash = self.hash
+        position.key_history = self.key_history[:]
+        position.material[:] = self.material
+        return position
+
+    def piece_at(self, col, row):
+        return self.board[row * 8 + col]
+
+    def king_square(self, color):
+        return self.bitboards[KING | color << 3].bit_length() - 1
+
+    def is_square_attacked(self, square, by_color):
+        bitboards = self.bitboards
+        flag = by_color << 3
+        # A pawn of by_color attacks square from where an enemy pawn on square would attack
+        if PAWN_ATTACKS[by_color ^ 1][square] & bitboards[flag | PAWN] or \
+                KNIGHT_ATTACKS[square] & bitboards[flag | KNIGHT] or \
+                KING_ATTACKS[square] & bitboards[flag | KING]:
+            return True
+
+        occupied = bitboards[OCCUPANCY] | bitboards[OCCUPANCY | BLACK_FLAG]
+        queens = bitboards[flag | QUEEN]
+        rooks = bitboards[flag | ROOK] | queens
+        if rooks and (RANK_ATTACKS[square][occupied & RANK_MASK[square]] |
+                      FILE_ATTACKS[square][occupied & FILE_MASK[square]]) & rooks:
+            return True
+        bishops = bitboards[flag | BISHOP] | queens
+        return bool(bishops and (DIAGONAL_ATTACKS[square][occupied & DIAGONAL_MASK[square]] |
+                                 ANTI_DIAGONAL_ATTACKS[square][occupied & ANTI_DIAGONAL_MASK[square]]) & bishops)
+
+    def pinned_pieces(self, color):
+        """Bitboard of color's pieces that may not leave the line between their king and an enemy slider."""
+        bitboards = self.bitboards
+        flag = color << 3
+        enemy = flag ^ BLACK_FLAG
+        king = bitboards[KING | flag].bit_length() - 1
+        queens = bitboards[enemy | QUEEN]
+        snipers = ROOK_RAYS[king] & (bitboards[enemy | ROOK] | queens) | \
+            BISHOP_RAYS[king] & (bitboards[enemy | BISHOP] | queens)
+        pinned = 0
+        if snipers:
+            own = bitboards[OCCUPANCY | flag]
+            occupied = own | bitboards[OCCUPANCY | enemy]
+            while snipers:
+                low = snipers & -snipers
+                snipers ^= low
+                between = BETWEEN[king * 64 + low.bit_length() - 1] & occupied
+                # Exactly one piece in between, and it is ours
+                if between & own and not between & (between - 1):
+                    pinned |= between
+        return pinned
+
+    def in_check(self, color=None):
+        if color is None:
+            color = self.side
+        return self.is_square_attacked(self.king_square(color), color ^ 1)
+
+    def pseudo_legal_moves(self):
+        """All moves for the side to move, ignoring whether they leave the king in check."""
+        bitboards = self.bitboards
+        side = self.side
+        flag = side << 3
+        own = bitboards[OCCUPANCY | flag]
+        enemy = bitboards[OCCUPANCY | flag ^ BLACK_FLAG]
+        occupied = own | enemy
+        moves = []
+        append = moves.append
+
+        for kind in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            pieces = bitboards[flag | kind]
+            while pieces:
+                low = pieces & -pieces
+                pieces ^= low
+                square = low.bit_length() - 1
+                if kind == KNIGHT:
+                    targets = KNIGHT_ATTACKS[square]
+                elif kind == KING:
+                    targets = KING_ATTACKS[square]
+                else:
+                    targets = 0
+                    if kind != BISHOP:
+                        targets = RANK_ATTACKS[square][occupied & RANK_MASK[square]] | \
+                            FILE_ATTACKS[square][occupied & FILE_MASK[square]]
+                    if kind != ROOK:
+                        targets |= DIAGONAL_ATTACKS[square][occupied & DIAGONAL_MASK[square]] | \
+                            ANTI_DIAGONAL_ATTACKS[square][occupied & ANTI_DIAGONAL_MASK[square]]
+                targets &= ~own
+                while targets:
+                    low = targets & -targets
+                    targets ^= low
+                    append(square | (low.bit_length() - 1) << 6)
+
+        self.add_pawn_moves(moves, occupied, enemy)
+        self.add_castling_moves(moves)
+        return moves
+
+    def add_pawn_moves(self, moves, occupied, enemy):
+        pawns = self.bitboards[PAWN | self.side << 3]
+        if not pawns:
+            return
+        empty = ~occupied
+        if self.ep_square != NO_SQUARE:
+            enemy |= 1 << self.ep_square
+
+        # Whole-set shifts: each target set pairs with the offset back to its pawn
+        if self.side == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            targets = ((single, 8), (double, 16), (((pawns & ~FILE_A) >> 9) & enemy, 9),
+                       (((pawns & ~FILE_H) >> 7) & enemy, 7))
+            promotion_row = ROW_MASKS[0]
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            targets = ((single, -8), (double, -16), (((pawns & ~FILE_A) << 7) & enemy, -7),
+                       (((pawns & ~FILE_H) << 9) & enemy, -9))
+            promotion_row = ROW_MASKS[7]
+
+        append = moves.append
+        for target_set, offset in targets:
+            promotions = target_set & promotion_row
+            target_set ^= promotions
+            while target_set:
+                low = target_set & -target_set
+                target_set ^= low
+                to_square = low.bit_length() - 1
+                append(to_square + offset | to_square << 6)
+            while promotions:
+                low = promotions & -promotions
+                promotions ^= low
+                to_square = low.bit_length() - 1
+                for promotion in PROMOTION_PIECES:
+                    append(to_square + offset | to_square << 6 | promotion << 12)
+
+    def add_castling_moves(self, moves):
+        board = self.board
+        enemy = self.side ^ 1
+        if self.side == WHITE:
+            king, kingside, queenside = 60, WHITE_KINGSIDE, WHITE_QUEENSIDE
+        else:
+            king, kingside, queenside = 4, BLACK_KINGSIDE, BLACK_QUEENSIDE
+
+        if self.castling & kingside and not board[king + 1] and not board[king + 2] and \
+                not self.is_square_attacked(king, enemy) and \
+                not self.is_square_attacked(king + 1, enemy) and not self.is_square_attacked(king + 2, enemy):
+            moves.append(king | (king + 2) << 6)
+        if self.castling & queenside and not board[king - 1] and not board[king - 2] and not board[king - 3] and \
+                not self.is_square_attacked(king, enemy) and \
+                not self.is_square_attacked(king - 1, enemy) and not self.is_square_attacked(king - 2, enemy):
+            moves.append(king | (king - 2) << 6)
+
+    def legal_moves(self):
+        moves = []
+        side = self.side
+        bitboards = self.bitboards
+        king = KING | side << 3
+        king_square = bitboards[king].bit_length() - 1
+
+        # Unless the king is in check, only king moves, pinned pieces and en passant
+        # (which can uncover a rank) need the make / test / unmake round trip
+        if self.is_square_attacked(king_square, side ^ 1):
+            unsafe = ~0
+        else:
+            unsafe = self.pinned_pieces(side) | 1 << king_square
+        ep_square = self.ep_square
+        board = self.board
+
+        for move in self.pseudo_legal_moves():
+            from_square = move & 63
+            if not unsafe >> from_square & 1 and \
+                    ((move >> 6) & 63 != ep_square or board[from_square] & 7 != PAWN):
+                moves.append(move)
+                continue
+            undo = self.make_move(move)
+            if not self.is_square_attacked(bitboards[king].bit_length() - 1, side ^ 1):
+                moves.append(move)
+            self.unmake_move(undo)
+        return moves
+
+    def has_legal_move(self):
+        """Like bool(self.legal_moves()), but stops at the first legal move."""
+        side = self.side
+        bitboards = self.bitboards
+        king = KING | side << 3
+        for move in self.pseudo_legal_moves():
+            undo = self.make_move(move)
+            legal = not self.is_square_attacked(bitboards[king].bit_length() - 1, side ^ 1)
+            self.unmake_move(undo)
+            if legal:
+                return True
+        return False
+
+    def piece_count(self, piece):
+        return self.bitboards[piece].bit_count()
+
+    def is_insufficient_material(self):
+        """Neither side can ever mate: bare kings, a single minor piece, or only bishops on one square colour."""
+        bitboards = self.bitboards
+        for kind in (PAWN, ROOK, QUEEN):
+            if bitboards[kind] | bitboards[BLACK_FLAG | kind]:
+                return False
+        knights = bitboards[KNIGHT] | bitboards[BLACK_FLAG | KNIGHT]
+        bishops = bitboards[BISHOP] | bitboards[BLACK_FLAG | BISHOP]
+        if (knights | bishops).bit_count() <= 1:
+            return True
+        if knights:
+            return False
+        return not bishops & LIGHT_SQUARES or not bishops & DARK_SQUARES
+
+    def outcome(self, claim_draws=True):
+        """(result, reason) if the game is over in this position, else None.
+
+        result is a PGN result string.  Mate, stalemate and insufficient
+        material end the game by rule; with claim_draws the fifty-move
+        rule and threefold repetition end it too, as the GUI does.
+        """
+        if not self.has_legal_move():
+            if self.in_check():
+                return ('0-1' if self.side == WHITE else '1-0'), 'checkmate'
+            return '1/2-1/2', 'stalemate'
+        if self.is_insufficient_material():
+            return '1/2-1/2', 'insufficient material'
+        if claim_draws:
+            if self.halfmove_clock >= 100:
+                return '1/2-1/2', 'fifty-move rule'
+            if self.repetition_count() >= 3:
+                return '1/2-1/2', 'threefold repetition'
+        return None
+
+    def result_conflict(self, result):
+        """The (result, reason) this final position forces if a recorded result contradicts it, else None.
+
+        Only rules that end the game by themselves count (no draw claims).
+        '*' records no result, so an unfinished game never conflicts.
+        The PGN importer and the replay job both judge games by this.
+        """
+        if result == '*':
+            return None
+        outcome = self.outcome(claim_draws=False)
+        return outcome if outcome is not None and outcome[0] != result else None
+
+    def is_legal(self, move):
+        return move in self.legal_moves()
+
+    def find_move(self, from_square, to_square, promotion=QUEEN):
+        """Return the legal move from_square -> to_square, or None if there is none."""
+        for move in self.legal_moves():
+            if move & 0xFFF == from_square | to_square << 6 and move >> 12 in (EMPTY, promotion):
+                return move
+        return None
+
+    def make_move(self, move):
+        """Play a move in place and return the record unmake_move needs to take it back."""
+        board = self.board
+        bitboards = self.bitboards
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        piece = board[from_square]
+        captured = board[to_square]
+        side = self.side
+        flag = side << 3
+        key = self.hash
+        undo = (move, captured, self.castling, self.ep_square, self.halfmove_clock, key)
+        self.key_history.append(key)
+
+        board[to_square] = piece
+        board[from_square] = EMPTY
+        move_bits = 1 << from_square | 1 << to_square
+        bitboards[piece] ^= move_bits
+        bitboards[OCCUPANCY | flag] ^= move_bits
+        key ^= ZOBRIST_SIDE ^ ZOBRIST_PIECES[piece << 6 | from_square] ^ ZOBRIST_PIECES[piece << 6 | to_square]
+        if captured:
+            bitboards[captured] ^= 1 << to_square
+            bitboards[OCCUPANCY | flag ^ BLACK_FLAG] ^= 1 << to_square
+            key ^= ZOBRIST_PIECES[captured << 6 | to_square]
+            self.material[side ^ 1] -= MATERIAL_VALUES[captured & 7]
+
+        kind = piece & 7
+        ep_square = self.ep_square
+        if ep_square != NO_SQUARE:
+            key ^= ZOBRIST_EP_FILE[ep_square & 7]
+            self.ep_square = NO_SQUARE
+
+        if kind == PAWN:
+            self.halfmove_clock = 0
+            if to_square == ep_square:
+                captured_square = to_square + (8 if side == WHITE else -8)
+                board[captured_square] = EMPTY
+                bitboards[PAWN | flag ^ BLACK_FLAG] ^= 1 << captured_square
+                bitboards[OCCUPANCY | flag ^ BLACK_FLAG] ^= 1 << captured_square
+                key ^= ZOBRIST_PIECES[(PAWN | flag ^ BLACK_FLAG) << 6 | captured_square]
+                self.material[side ^ 1] -= 1
+            elif to_square - from_square in (16, -16):
+                # Only record the en passant square when a pawn can actually take there,
+                # so that otherwise identical positions share one key
+                passed = (from_square + to_square) >> 1
+                if PAWN_ATTACKS[side][passed] & bitboards[PAWN | flag ^ BLACK_FLAG]:
+                    self.ep_square = passed
+                    key ^= ZOBRIST_EP_FILE[passed & 7]
+            elif move >> 12:
+                promoted = move >> 12 | flag
+                board[to_square] = promoted
+                bitboards[piece] ^= 1 << to_square
+                bitboards[promoted] ^= 1 << to_square
+                key ^= ZOBRIST_PIECES[piece << 6 | to_square] ^ ZOBRIST_PIECES[promoted << 6 | to_square]
+                self.material[side] += MATERIAL_VALUES[move >> 12] - 1
+        else:
+            self.halfmove_clock = 0 if captured else self.halfmove_clock + 1
+            if kind == KING and to_square - from_square in (2, -2):
+                if to_square > from_square:
+                    rook_from, rook_to = from_square + 3, from_square + 1
+                else:
+                    rook_from, rook_to = from_square - 4, from_square - 1
+                board[rook_to] = board[rook_from]
+                board[rook_from] = EMPTY
+                rook_bits = 1 << rook_from | 1 << rook_to
+                bitboards[ROOK | flag] ^= rook_bits
+                bitboards[OCCUPANCY | flag] ^= rook_bits
+                key ^= ZOBRIST_PIECES[(ROOK | flag) << 6 | rook_from] ^ ZOBRIST_PIECES[(ROOK | flag) << 6 | rook_to]
+
+        castling = self.castling & CASTLING_MASK[from_square] & CASTLING_MASK[to_square]
+        if castling != self.castling:
+            key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+            self.castling = castling
+        if side == BLACK:
+            self.fullmove_number += 1
+        self.side = side ^ 1
+        self.hash = key
+        return undo
+
+    def unmake_move(self, undo):
+        move, captured, castling, ep_square, halfmove_clock, key = undo
+        board = self.board
+        bitboards = self.bitboards
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+
+        side = self.side ^ 1
+        flag = side << 3
+        self.side = side
+        if side == BLACK:
+            self.fullmove_number -= 1
+        piece = board[to_square]
+        if move >> 12:
+            bitboards[piece] ^= 1 << to_square
+            piece = PAWN | flag
+            bitboards[piece] ^= 1 << to_square
+            self.material[side] -= MATERIAL_VALUES[move >> 12] - 1
+        board[from_square] = piece
+        board[to_square] = captured
+        move_bits = 1 << from_square | 1 << to_square
+        bitboards[piece] ^= move_bits
+        bitboards[OCCUPANCY | flag] ^= move_bits
+        if captured:
+            bitboards[captured] ^= 1 << to_square
+            bitboards[OCCUPANCY | flag ^ BLACK_FLAG] ^= 1 << to_square
+            self.material[side ^ 1] += MATERIAL_VALUES[captured & 7]
+
+        kind = piece & 7
+        if kind == PAWN and to_square == ep_square:
+            captured_square = to_square + (8 if side == WHITE else -8)
+            board[captured_square] = PAWN | flag ^ BLACK_FLAG
+            self.material[side ^ 1] += 1
+            bitboards[PAWN | flag ^ BLACK_FLAG] ^= 1 << captured_square
+            bitboards[OCCUPANCY | flag ^ BLACK_FLAG] ^= 1 << captured_square
+        elif kind == KING and to_square - from_square in (2, -2):
+            if to_square > from_square:
+                rook_from, rook_to = from_square + 3, from_square + 1
+            else:
+                rook_from, rook_to = from_square - 4, from_square - 1
+            board[rook_from] = board[rook_to]
+            board[rook_to] = EMPTY
+            rook_bits = 1 << rook_from | 1 << rook_to
+            bitboards[ROOK | flag] ^= rook_bits
+            bitboards[OCCUPANCY | flag] ^= rook_bits
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.hash = key
+        self.key_history.pop()
+
+    def __repr__(self):
+        return f"Position({self.fen()!r})"
+
+
+class MoveStack:
+    """The moves played on a Position, with undo and redo.
+
+    Each push keeps the small record make_move returns, so undo is one
+    unmake_move and redo one make_move; the board is never copied.
+    Undone moves can be redone until a different move is pushed.
+    """
+    __slots__ = ('position', 'undo_records', 'redo_moves')
+
+    def __init__(self, position):
+        self.position = position
+        self.undo_records = []
+        self.redo_moves = []  # Most recently undone move last
+
+    def __len__(self):
+        return len(self.undo_records)
+
+    @property
+    def moves(self):
+        """The encoded moves from the start position to the current one."""
+        return [undo[0] for undo in self.undo_records]
+
+    def push(self, move):
+        redo_moves = self.redo_moves
+        if redo_moves and redo_moves[-1] == move:
+            redo_moves.pop()  # Replaying the undone line keeps the rest of it
+        else:
+            redo_moves.clear()
+        self.undo_records.append(self.position.make_move(move))
+
+    def undo(self):
+        """Take back the last move and return it, or None at the start of the game."""
+        if not self.undo_records:
+            return None
+        undo = self.undo_records.pop()
+        self.position.unmake_move(undo)
+        self.redo_moves.append(undo[0])
+        return undo[0]
+
+    def next_redo(self):
+        """The move redo would play, or None."""
+        return self.redo_moves[-1] if self.redo_moves else None
+
+    def redo(self):
+        """Play the last undone move again and return it, or None if there is none."""
+        move = self.next_redo()
+        if move is not None:
+            self.push(move)
+        return move
+
+
+def perft(position, depth):
+    """Count the leaf nodes of the legal move tree to the given depth."""
+    moves = position.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        undo = position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move(undo)
+    return nodes
+
+
+def perft_divide(position, depth):
+    """Per-root-move node counts, handy for finding generator bugs."""
+    counts = {}
+    for move in position.legal_moves():
+        undo = position.make_move(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.unmake_move(undo)
+    return counts
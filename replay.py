@@ -0,0 +1,111 @@
+"""Headless re-verification of every stored game.
+
+replay_games splits the games table into id ranges and hands them to a
+process pool.  Each worker opens the database read-only, replays its
+games on position.Position (no Qt involved) and sends back one row per
+game: its status, a detail message and the final FEN.  The parent is
+the only writer; it stores each range's rows in replay_results as soon
+as the range is done, so an interrupted run picks up where it stopped
+and only games without a replay_results row are looked at again.
+
+Statuses:
+    ok            the game replays and its result fits the final position
+    illegal_move  a stored move is not legal (detail says which ply)
+    wrong_result  the game ends by rule (mate, stalemate, dead position) but records another result
+                  ('*', no result, is never wrong)
+    bad_record    ply_count or a stored position key disagrees with the moves
+"""
+
+import multiprocessing
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from position import Position, move_to_uci
+from gamestore import from_db_key
+
+STATUSES = ('ok', 'illegal_move', 'wrong_result', 'bad_record')
+
+PENDING_GAMES = ('SELECT id, result, start_fen, ply_count FROM games '
+                 'WHERE id BETWEEN ? AND ? AND id NOT IN (SELECT game_id FROM replay_results WHERE game_id BETWEEN ? AND ?) '
+                 'ORDER BY id')
+SAVE_RESULT = 'INSERT OR REPLACE INTO replay_results (game_id, status, detail, final_fen) VALUES (?, ?, ?, ?)'
+
+
+def replay_game(result, start_fen, ply_count, moves):
+    """(status, detail, final FEN) for one stored game; moves are (move, position_hash) pairs."""
+    position = Position.from_fen(start_fen) if start_fen else Position.initial()
+    for ply, (move, position_hash) in enumerate(moves, 1):
+        if not position.is_legal(move):
+            return 'illegal_move', f"ply {ply}: {move_to_uci(move)} is not legal in {position.fen()}", position.fen()
+        position.make_move(move)
+        if position.hash != from_db_key(position_hash):
+            return 'bad_record', f"ply {ply}: stored position key does not match", position.fen()
+    if ply_count != len(moves):
+        return 'bad_record', f"ply_count is {ply_count} but {len(moves)} moves are stored", position.fen()
+
+    outcome = position.result_conflict(result)
+    if outcome is not None:
+        return 'wrong_result', f"recorded {result}, final position means {outcome[0]} by {outcome[1]}", position.fen()
+    return 'ok', None, position.fen()
+
+
+def replay_range(db_path, first_id, last_id):
+    """Replay the unverified games with ids in [first_id, last_id]; runs in a worker process."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        games = conn.execute(PENDING_GAMES, (first_id, last_id, first_id, last_id)).fetchall()
+        if not games:
+            return []
+        moves = {game[0]: [] for game in games}
+        for game_id, move, position_hash in conn.execute(
+                'SELECT game_id, move, position_hash FROM moves WHERE game_id BETWEEN ? AND ? ORDER BY game_id, ply',
+                (games[0][0], games[-1][0])):
+            if game_id in moves:
+                moves[game_id].append((move, position_hash))
+        return [(game_id,) + replay_game(result, start_fen, ply_count, moves[game_id])
+                for game_id, result, start_fen, ply_count in games]
+    finally:
+        conn.close()
+
+
+def replay_games(store, workers=1, shard_size=1000, restart=False, report=print):
+    """Verify every game in a GameStore that has not been verified yet.
+
+    Returns a dict mapping status to the number of games checked in this
+    run.  restart first forgets the results of earlier runs.
+    """
+    if restart:
+        with store.transaction():
+            store.conn.execute('DELETE FROM replay_results')
+    first_id, last_id = store.conn.execute('SELECT MIN(id), MAX(id) FROM games').fetchone()
+    counts = dict.fromkeys(STATUSES, 0)
+    if first_id is None:
+        return counts
+    shards = [(start, min(start + shard_size - 1, last_id)) for start in range(first_id, last_id + 1, shard_size)]
+
+    start_time = time.perf_counter()
+    done = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(replay_range, store.path, first, last) for first, last in shards]
+        try:
+            for future in as_completed(futures):
+                rows = future.result()
+                with store.transaction():
+                    store.conn.executemany(SAVE_RESULT, rows)
+                for game_id, status, detail, _ in rows:
+                    counts[status] += 1
+                    if status != 'ok':
+                        report(f"Game {game_id}: {status}: {detail}")
+                done += 1
+                if done % 10 == 0 or done == len(shards):
+                    checked = sum(counts.values())
+                    report(f"{done}/{len(shards)} ranges, {checked} games, "
+                           f"{checked / (time.perf_counter() - start_time):.0f} games/s")
+        except BaseException:
+            # Ranges already stored stay stored; the rest is picked up by the next run
+            for future in futures:
+                future.cancel()
+            raise
+    return counts
@@ -0,0 +1,615 @@
+"""Headless game server: many network games in one process.
+
+Everything runs on one asyncio event loop and every message is handled
+to the end before the next one is read, so games need no locks.  Games
+are netplay.NetGame objects (position.Position plus its move stack and
+clocks), and every move is checked against the rules before it is
+played.  A game nobody has moved in for a while is suspended to a small
+JSON file and dropped from memory; the next message about it loads it
+back.  Finished games go to a GameWriter thread, which stores them in
+the game database many to a transaction.  The clocks start when the
+second player joins, and a timer per game ends it as soon as the side to
+move runs out of time, even while the game is suspended.
+
+The protocol is netplay's line format, with the game id in every game
+message:
+
+    new                        -> game <id> white <token>
+    join <id>                  -> game <id> black <token>
+    resume <id> <token>        -> game <id> <color> <token>, then moves <id> 0 <w> <b> <uci>...
+    move <id> <ply> <uci>      -> move <id> <ply> <uci> <w> <b> to both players
+    resign <id>                -> result <id> <result> <reason> to both players
+    watch <id> [<ply>]         -> snapshot <id> <w> <b> <fen> moves <uci>..., or with <ply>
+                                  moves <id> <ply> <w> <b> <uci>... for the moves from <ply> on;
+                                  then every move and the result
+    unwatch <id>
+    ping <n>                   -> pong <n>
+
+Anything the server cannot accept is answered with error <text>.  The
+token is the only way back into a seat after a reconnect or a restart.
+
+Spectators get the snapshot once and then the same one-line move
+messages as the players.  Each message is encoded once; the players get
+it at once, the spectators from a per-game fan-out task that writes
+FANOUT_BATCH of them at a time and lets the loop run in between, so a
+large audience delays neither the players nor other games.  Nothing
+waits for a spectator's socket: one whose unsent data passes
+SPECTATOR_BUFFER_LIMIT is sent dropped <id> and unsubscribed, and
+catches up by watching again from the last ply it has (it may see a
+move it already has, and should skip it).
+"""
+
+import asyncio
+import json
+import multiprocessing
+from collections import deque
+import os
+import queue
+import random
+import secrets
+import statistics
+import tempfile
+import threading
+import time
+
+from position import Position, WHITE, BLACK, PLAYER_NAMES, move_to_uci, parse_uci_move
+from netplay import NetGame, Connection, ProtocolError, DEFAULT_CLOCK_MS, encode_message
+from gamestore import GameStore, DEFAULT_DB_PATH
+
+DEFAULT_PORT = 5555
+DEFAULT_SUSPEND_DIR = 'suspended_games'
+IDLE_SECONDS = 300  # Games without a move for this long are suspended to disk
+SPECTATOR_BUFFER_LIMIT = 64 * 1024  # Bytes waiting to go to one spectator before it is dropped
+FANOUT_BATCH = 64  # Spectators written to between two turns of the event loop
+
+
+class GameWriter:
+    """Stores finished games from its own thread, up to BATCH_SIZE per transaction.
+
+    The thread opens its own GameStore, so the event loop never waits
+    on SQLite.  close() writes what is still queued.
+    """
+    BATCH_SIZE = 500
+    FLUSH_SECONDS = 1.0  # Longest a finished game waits for its batch to fill
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self.written = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, moves, result, white='Network', black='Network'):
+        self.queue.put((moves, result, white, black))
+
+    def run(self):
+        store = GameStore(self.path)
+        try:
+            closing = False
+            while not closing:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + self.FLUSH_SECONDS
+                while len(batch) < self.BATCH_SIZE and batch[-1] is not None:
+                    try:
+                        batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    closing = True
+                    batch.pop()
+                with store.transaction():
+                    for moves, result, white, black in batch:
+                        # The server checked every move as it was played
+                        store.add_game(moves, result, white=white, black=black, validate=False)
+                self.written += len(batch)
+        finally:
+            store.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class Client:
+    """One connection, the seats it holds as {game id: [colors]} and the games it watches."""
+    __slots__ = ('connection', 'seats', 'watching')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.seats = {}
+        self.watching = set()
+
+
+class ServerGame:
+    """A hosted game: its seats and, unless it is suspended, the game itself."""
+    __slots__ = ('id', 'tokens', 'players', 'spectators', 'game', 'last_active', 'outbox', 'fanout')
+
+    def __init__(self, game_id, game, tokens):
+        self.id = game_id
+        self.tokens = tokens  # Per color, handed out with the seat
+        self.players = [None, None]  # Client per color while connected
+        self.spectators = set()
+        self.game = game  # netplay.NetGame, None while suspended
+        self.last_active = time.monotonic()
+        self.outbox = None  # (message, spectators at the time) waiting for the fan-out task
+        self.fanout = None
+
+    def in_use(self):
+        return self.players != [None, None] or bool(self.spectators)
+
+    def broadcast(self, *fields):
+        """Send a message to the players now and queue it for the spectators."""
+        data = encode_message(*fields)
+        for client in {client for client in self.players if client is not None}:
+            client.connection.writer.write(data)
+        if not self.spectators:
+            return
+        if self.outbox is None:
+            self.outbox = deque()
+        # Later subscribers start from a snapshot that already has this message
+        self.outbox.append((data, list(self.spectators)))
+        if self.fanout is None:
+            self.fanout = asyncio.get_running_loop().create_task(self.fan_out())
+
+    async def fan_out(self):
+        try:
+            while self.outbox:
+                data, spectators = self.outbox.popleft()
+                for start in range(0, len(spectators), FANOUT_BATCH):
+                    for client in spectators[start:start + FANOUT_BATCH]:
+                        if client not in self.spectators:
+                            continue  # Left or dropped since
+                        writer = client.connection.writer
+                        if writer.transport.get_write_buffer_size() > SPECTATOR_BUFFER_LIMIT:
+                            self.spectators.discard(client)
+                            client.watching.discard(self.id)
+                            client.connection.write('dropped', self.id)
+                        else:
+                            writer.write(data)
+                    await asyncio.sleep(0)
+        finally:
+            self.fanout = None
+
+
+class GameServer:
+    """Hosts any number of games for any number of clients on one event loop."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, suspend_dir=DEFAULT_SUSPEND_DIR, clock_ms=DEFAULT_CLOCK_MS,
+                 idle_seconds=IDLE_SECONDS, report=print):
+        self.suspend_dir = suspend_dir
+        self.clock_ms = clock_ms
+        self.idle_seconds = idle_seconds
+        self.report = report
+        self.games = {}  # id -> ServerGame; suspended games without players are only on disk
+        self.flag_timers = {}  # id -> asyncio.TimerHandle for the side to move's clock running out
+        self.clients = set()
+        os.makedirs(suspend_dir, exist_ok=True)
+        suspended = [int(name.split('.')[0]) for name in os.listdir(suspend_dir) if name.endswith('.json')]
+        self.next_id = max(suspended, default=0) + 1
+        self.writer = GameWriter(db_path)
+        self.port = None
+        self.stats = dict.fromkeys(('moves', 'finished', 'suspended', 'resumed'), 0)
+
+    async def run(self, address, port):
+        server = await asyncio.start_server(self.accept, address or '0.0.0.0', port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.report(f"Serving on port {self.port}")
+        evictor = asyncio.create_task(self.evict_idle())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+            self.close()
+
+    def close(self):
+        """Suspend every game still in memory, write out the finished ones and hang up on the clients."""
+        for server_game in list(self.games.values()):
+            if server_game.game is not None:
+                self.suspend(server_game)
+        self.games.clear()
+        for timer in self.flag_timers.values():
+            timer.cancel()
+        self.flag_timers.clear()
+        self.writer.close()
+        for client in self.clients:
+            client.connection.close()
+
+    async def accept(self, reader, writer):
+        client = Client(Connection(reader, writer))
+        self.clients.add(client)
+        try:
+            while True:
+                fields = await client.connection.receive()
+                if fields is None:
+                    break
+                try:
+                    self.handle(client, fields)
+                except (ProtocolError, ValueError, IndexError) as e:
+                    client.connection.write('error', str(e).replace('\n', ' '))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            for game_id in client.seats.keys() | client.watching:
+                server_game = self.games.get(game_id)
+                if server_game is not None:
+                    server_game.players = [None if player is client else player for player in server_game.players]
+                    server_game.spectators.discard(client)
+                    if server_game.game is None and not server_game.in_use():
+                        del self.games[game_id]  # Suspended and unwatched: the file on disk is all there is
+            writer.close()
+
+    def handle(self, client, fields):
+        command = fields[0]
+        if command == 'ping':
+            client.connection.write('pong', fields[1])
+            return
+        if command == 'new':
+            server_game = ServerGame(self.next_id, NetGame(self.clock_ms), [secrets.token_hex(8), None])
+            self.next_id += 1
+            self.games[server_game.id] = server_game
+            self.take_seat(client, server_game, WHITE)
+            return
+
+        server_game = self.lookup(int(fields[1]))
+        game = self.load(server_game)
+        server_game.last_active = time.monotonic()
+        if command == 'join':
+            if server_game.tokens[BLACK] is not None:
+                raise ProtocolError(f"Game {server_game.id} already has two players")
+            server_game.tokens[BLACK] = secrets.token_hex(8)
+            self.take_seat(client, server_game, BLACK)
+            game.turn_start = time.monotonic()  # Both seats are taken: white's clock starts
+            self.arm_flag(server_game)
+        elif command == 'resume':
+            color = server_game.tokens.index(fields[2]) if fields[2] in server_game.tokens else None
+            if color is None:
+                raise ProtocolError(f"Wrong token for game {server_game.id}")
+            self.take_seat(client, server_game, color)
+            client.connection.write('moves', server_game.id, 0, *game.clocks, *map(move_to_uci, game.history.moves))
+            if game.result:
+                client.connection.write('result', server_game.id, *game.result)
+        elif command == 'move':
+            side = game.position.side
+            if server_game.players[side] is not client:
+                raise ProtocolError(f"Not your move in game {server_game.id}")
+            ply = int(fields[2])
+            if game.result or ply != game.ply:
+                raise ProtocolError(f"Move {ply} is out of turn in game {server_game.id}")
+            game.play(fields[3])
+            game.press_clock()
+            self.stats['moves'] += 1
+            server_game.broadcast('move', server_game.id, ply, fields[3], *game.clocks)
+            outcome = game.position.outcome()
+            if game.clocks[side] < 0:
+                self.finish(server_game, '0-1' if side == WHITE else '1-0', 'time')
+            elif outcome is not None:
+                self.finish(server_game, outcome[0], outcome[1].replace(' ', '-'))
+            else:
+                self.arm_flag(server_game)
+        elif command == 'watch':
+            self.subscribe(client, server_game, int(fields[2]) if len(fields) > 2 else None)
+        elif command == 'unwatch':
+            server_game.spectators.discard(client)
+            client.watching.discard(server_game.id)
+        elif command == 'resign':
+            if client not in server_game.players:
+                raise ProtocolError(f"You do not play in game {server_game.id}")
+            # Whoever holds both seats resigns for the side to move
+            color = game.position.side if server_game.players[game.position.side] is client \
+                else server_game.players.index(client)
+            self.finish(server_game, '0-1' if color == WHITE else '1-0', 'resignation')
+        else:
+            raise ProtocolError(f"Unknown message {command!r}")
+
+    def take_seat(self, client, server_game, color):
+        server_game.players[color] = client
+        colors = client.seats.setdefault(server_game.id, [])
+        if color not in colors:
+            colors.append(color)
+        client.connection.write('game', server_game.id, PLAYER_NAMES[color], server_game.tokens[color])
+
+    def subscribe(self, client, server_game, ply=None):
+        """Add a spectator; it gets a snapshot, or only the moves from ply on if it has the ones before.
+
+        Either way the clocks are the current ones: the server keeps no
+        clock history to send with each earlier move.
+        """
+        game = server_game.game
+        server_game.spectators.add(client)
+        client.watching.add(server_game.id)
+        moves = game.history.moves
+        if ply is None or not 0 <= ply <= len(moves):
+            client.connection.write('snapshot', server_game.id, *game.clocks, game.position.fen(), 'moves',
+                                    *map(move_to_uci, moves))
+        else:
+            client.connection.write('moves', server_game.id, ply, *game.clocks, *map(move_to_uci, moves[ply:]))
+
+    def lookup(self, game_id):
+        server_game = self.games.get(game_id)
+        if server_game is None:
+            if not os.path.exists(self.suspend_path(game_id)):
+                raise ProtocolError(f"No game {game_id}")
+            server_game = self.games[game_id] = ServerGame(game_id, None, [None, None])
+        return server_game
+
+    def load(self, server_game):
+        """The game's NetGame, read back from disk if it was suspended."""
+        if server_game.game is None:
+            path = self.suspend_path(server_game.id)
+            with open(path) as f:
+                state = json.load(f)
+            game = NetGame(self.clock_ms)
+            for uci in state['moves']:
+                game.history.push(parse_uci_move(uci))
+            game.clocks = state['clocks']
+            if state['turn_started'] is not None:
+                game.turn_start = time.monotonic() - (time.time() - state['turn_started'])
+            game.result = tuple(state['result']) if state['result'] else None
+            server_game.tokens = state['tokens']
+            server_game.game = game
+            os.remove(path)
+            self.stats['resumed'] += 1
+            if server_game.id not in self.flag_timers:
+                self.arm_flag(server_game)  # Suspended by an earlier run of the server
+        return server_game.game
+
+    def suspend(self, server_game):
+        game = server_game.game
+        state = {
+            'tokens': server_game.tokens,
+            'clocks': game.clocks,
+            # Wall time, so the clock of the side to move keeps running while the game is on disk
+            'turn_started': None if game.turn_start is None else time.time() - (time.monotonic() - game.turn_start),
+            'moves': [move_to_uci(move) for move in game.history.moves],
+            'result': game.result,
+        }
+        with open(self.suspend_path(server_game.id), 'w') as f:
+            json.dump(state, f)
+        server_game.game = None
+        if not server_game.in_use():
+            del self.games[server_game.id]
+        self.stats['suspended'] += 1
+
+    def suspend_path(self, game_id):
+        return os.path.join(self.suspend_dir, f'{game_id}.json')
+
+    def arm_flag(self, server_game):
+        """(Re)start the timer that ends the game when the side to move runs out of time."""
+        timer = self.flag_timers.pop(server_game.id, None)
+        if timer is not None:
+            timer.cancel()
+        left = server_game.game.time_left()
+        if left is not None:
+            self.flag_timers[server_game.id] = asyncio.get_running_loop().call_later(
+                max(left, 0), self.check_flag, server_game.id)
+
+    def check_flag(self, game_id):
+        # The game may have been suspended since the timer was set; its clock kept running on disk
+        if game_id not in self.games and not os.path.exists(self.suspend_path(game_id)):
+            return
+        server_game = self.lookup(game_id)
+        game = self.load(server_game)
+        self.flag_timers.pop(game_id, None)
+        if game.result:
+            return
+        result = game.flag()
+        if result is None:
+            self.arm_flag(server_game)  # Woke a little early
+            return
+        self.finish(server_game, result, 'time')
+
+    def finish(self, server_game, result, reason):
+        timer = self.flag_timers.pop(server_game.id, None)
+        if timer is not None:
+            timer.cancel()
+        game = server_game.game
+        game.result = (result, reason)
+        server_game.broadcast('result', server_game.id, result, reason)
+        self.writer.put(game.history.moves, result)
+        self.stats['finished'] += 1
+        # Players that reconnect later find nothing; the game is in the database now
+        for client in server_game.players:
+            if client is not None:
+                client.seats.pop(server_game.id, None)
+        for client in server_game.spectators:
+            client.watching.discard(server_game.id)  # The fan-out task still delivers the result
+        del self.games[server_game.id]
+
+    async def evict_idle(self):
+        while True:
+            await asyncio.sleep(self.idle_seconds / 4)
+            cutoff = time.monotonic() - self.idle_seconds
+            for server_game in list(self.games.values()):
+                if server_game.game is not None and server_game.last_active < cutoff:
+                    self.suspend(server_game)
+
+
+class LoadTestClient:
+    """One connection playing many games against itself, for load_test."""
+
+    def __init__(self, reader, writer):
+        self.connection = Connection(reader, writer)
+        self.waiting = {}  # Game id (or None before it has one) -> future for the next reply
+        self.created = asyncio.Queue()
+        self.latencies = []
+
+    async def read(self):
+        while (fields := await self.connection.receive()) is not None:
+            if fields[0] == 'error':
+                error = ProtocolError(' '.join(fields[1:]))
+                for future in self.waiting.values():
+                    future.set_exception(error)
+                self.waiting.clear()
+                continue
+            if fields[0] == 'game' and fields[2] == 'white':
+                self.created.put_nowait(int(fields[1]))
+                continue
+            future = self.waiting.pop(int(fields[1]), None)
+            if future is not None:
+                future.set_result(fields)
+
+    async def request(self, game_id, *fields):
+        future = self.waiting[game_id] = asyncio.get_running_loop().create_future()
+        await self.connection.send(*fields)
+        return await future
+
+    async def play(self, plies, chooser):
+        await self.connection.send('new')
+        game_id = await self.created.get()
+        await self.request(game_id, 'join', game_id)
+        position = Position.initial()
+        for ply in range(plies):
+            moves = position.legal_moves()
+            if not moves:
+                return
+            move = chooser.choice(moves)
+            start = time.perf_counter()
+            await self.request(game_id, 'move', game_id, ply, move_to_uci(move))
+            self.latencies.append(time.perf_counter() - start)
+            position.make_move(move)
+            if position.outcome() is not None:
+                return  # The server has ended the game too
+        await self.request(game_id, 'resign', game_id)
+
+
+def load_test(games=1000, connections=20, plies=40, seed=1, report=print):
+    """Run a server and play `games` simultaneous random games against it over localhost.
+
+    Each connection plays its share of the games, all at once, taking
+    both seats.  Uses a throwaway database and suspend directory.
+    Returns (moves played, seconds, per-move round trips in seconds).
+    """
+    async def session(db_path, suspend_dir):
+        server = GameServer(db_path, suspend_dir, report=lambda text: None)
+        server_task = asyncio.create_task(server.run('127.0.0.1', 0))
+        while server.port is None:
+            await asyncio.sleep(0.01)
+        chooser = random.Random(seed)
+        clients = []
+        for _ in range(connections):
+            clients.append(LoadTestClient(*await asyncio.open_connection('127.0.0.1', server.port)))
+        readers = [asyncio.create_task(client.read()) for client in clients]
+
+        start = time.perf_counter()
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, len(server.games))
+                await asyncio.sleep(0.05)
+        watcher = asyncio.create_task(watch())
+        await asyncio.gather(*(clients[index % connections].play(plies, chooser) for index in range(games)))
+        elapsed = time.perf_counter() - start
+        watcher.cancel()
+
+        for client in clients:
+            client.connection.close()
+        for reader in readers:
+            reader.cancel()
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+        latencies = [latency for client in clients for latency in client.latencies]
+        report(f"{games} games on {connections} connections, at most {peak} in memory at once, "
+               f"{server.writer.written} games stored")
+        return server.stats['moves'], elapsed, latencies
+
+    with tempfile.TemporaryDirectory() as directory:
+        return asyncio.run(session(os.path.join(directory, 'load_test.db'), os.path.join(directory, 'suspended')))
+
+
+
+def _watch_game(port, game_id, audience, results):
+    """Spectator side of spectator_test, in its own process: watch with `audience` connections."""
+    async def spectate(connection):
+        await connection.send('watch', game_id)
+        moves = 0
+        while (fields := await connection.receive()) is not None:
+            if fields[0] == 'move':
+                moves += 1
+            elif fields[0] in ('result', 'dropped'):
+                break
+        return moves
+
+    async def watch():
+        connections = [Connection(*await asyncio.open_connection('127.0.0.1', port)) for _ in range(audience)]
+        watchers = [asyncio.create_task(spectate(connection)) for connection in connections]
+        results.put(None)  # Connected
+        results.put(await asyncio.gather(*watchers))
+        for connection in connections:
+            connection.close()
+
+    asyncio.run(watch())
+
+
+def spectator_test(audiences=(0, 10, 100, 500), plies=80, move_interval=0.01, seed=1, report=print):
+    """Time one game's moves, as its player sees them, with more and more spectators.
+
+    For each audience size a fresh server hosts one game, played with
+    random moves move_interval seconds apart, while that many
+    connections from another process watch it.  Returns (audience,
+    per-move round trips in seconds, whether every spectator saw every
+    move) per size.
+    """
+    context = multiprocessing.get_context('spawn')
+
+    async def session(audience, db_path, suspend_dir):
+        server = GameServer(db_path, suspend_dir, report=lambda text: None)
+        server_task = asyncio.create_task(server.run('127.0.0.1', 0))
+        while server.port is None:
+            await asyncio.sleep(0.01)
+        player = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        await player.send('new')
+        game_id = (await player.receive())[1]
+        await player.send('join', game_id)
+        await player.receive()
+        loop = asyncio.get_running_loop()
+        results = context.Queue()
+        watcher = context.Process(target=_watch_game, args=(server.port, game_id, audience, results))
+        watcher.start()
+        await loop.run_in_executor(None, results.get)
+        while sum(len(server_game.spectators) for server_game in server.games.values()) < audience:
+            await asyncio.sleep(0.01)
+
+        chooser = random.Random(seed)
+        position = Position.initial()
+        round_trips = []
+        for ply in range(plies):
+            moves = position.legal_moves()
+            if not moves or position.outcome() is not None:
+                break
+            move = chooser.choice(moves)
+            start = time.perf_counter()
+            await player.send('move', game_id, ply, move_to_uci(move))
+            await player.receive()
+            round_trips.append(time.perf_counter() - start)
+            position.make_move(move)
+            await asyncio.sleep(move_interval)
+        if position.outcome() is None:
+            await player.send('resign', game_id)
+        seen = await loop.run_in_executor(None, results.get)
+        watcher.join()
+
+        player.close()
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+        return round_trips, all(count == len(round_trips) for count in seen)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for audience in audiences:
+            round_trips, delivered = asyncio.run(session(
+                audience, os.path.join(directory, f'spectators_{audience}.db'), os.path.join(directory, 'suspended')))
+            results.append((audience, round_trips, delivered))
+            report(f"{audience:>4} spectators: median move round trip {statistics.median(round_trips) * 1000:.2f} ms, "
+                   f"every move delivered: {'yes' if delivered else 'no'}")
+    return results
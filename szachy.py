@@ -1,691 +1,360 @@
- import sys
-import threading
-from PyQt5.QtCore import Qt, QObject, pyqtSignal, QMutex, QEvent, QPointF
-from PyQt5.QtGui import QPixmap, QColor, QFont, QMouseEvent
-from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView, QGraphicsPixmapItem, QGraphicsTextItem, QGraphicsRectItem, QTextEdit, QVBoxLayout, QHBoxLayout, QWidget, QGraphicsProxyWidget, QLabel,QLineEdit, QRadioButton, QPushButton
-import sqlite3
-from datetime import datetime
-import json
-
-
-
-# Connect to SQLite database (create if not exists)
-conn = sqlite3.connect('Chess_sessions.db')
-cursor = conn.cursor()
-
-# Use try-except block to handle table creation
-try:
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY,
-            session_name TEXT,
-            move_history TEXT
-        )
-    ''')
-    print("Table 'sessions' created successfully.")
-except sqlite3.Error as e:
-    print(f"Error creating table: {e}")
-
-# Commit changes and close connection
-conn.commit()
-conn.close()
-
-
-class LogThread(QObject):
-    log_updated = pyqtSignal(str)
-
-    def __init__(self):
-        super().__init__()
-        self.log = ""
-        self.mutex = QMutex()
-
-    def append_log(self, message):
-        self.mutex.lock()
-        self.log += message + "\n"
-        self.log_updated.emit(self.log)
-        self.mutex.unlock()
-
-    def clear_log(self):
-        self.mutex.lock()
-        self.log = ""
-        self.log_updated.emit(self.log)
-        self.mutex.unlock()
-
-    def get_log(self):
-        self.mutex.lock()
-        log_copy = self.log
-        self.mutex.unlock()
-        return log_copy
-
-    def run(self):
-        pass  # Możesz dodać więcej funkcjonalności wątku, jeśli jest to konieczne
-    
-class ChessPiece(QGraphicsPixmapItem):
-    def __init__(self, piece_type, size, player, log_thread):
-        super().__init__()
-        self.player = player
-        self.log_thread = log_thread
-        self.last_move = None  
-        self.initial_pos = None  
-        self.piece_type = piece_type  # Dodajemy atrybut przechowujący typ pionka
-        
-
-        pixmap = QPixmap(f'images/{piece_type}.png')
-        pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.setPixmap(pixmap)
-
-        self.highlighted_square = None  
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton and self.scene().current_player == self.player:
-            self.initial_pos = self.pos()  
-            self.setOpacity(0.7)  
-            event.accept()
-        else:
-            event.ignore()
-
-    def mouseMoveEvent(self, event):
-        if event.buttons() == Qt.LeftButton and self.scene().current_player == self.player:
-            newPos = self.mapToScene(event.pos())
-            self.setPos(newPos)
-
-            self.update_highlighted_square()
-            event.accept()
-        else:
-            event.ignore()
-
-    def mouseReleaseEvent(self, event):
-        if self.scene().current_player == self.player:
-            square_size = self.scene().square_size
-            col = round(self.x() / square_size)
-            row = round(self.y() / square_size)
-
-            new_x = col * square_size + (square_size - self.pixmap().width()) / 2
-            new_y = row * square_size + (square_size - self.pixmap().height()) / 2
-
-            if self.initial_pos != self.pos():
-                if self.is_valid_move(col, row):
-                    target_piece = self.scene().board[row][col]
-
-                    if target_piece and target_piece.player != self.player:
-                        # Capture opponent's piece
-                        self.scene().remove_chess_piece(col, row)
-
-                    self.log_thread.append_log(
-                        f"Player {self.player}: Moved {self.piece_type} from square {chr(ord('a') + round(self.initial_pos.x() / square_size))}{8 - round(self.initial_pos.y() / square_size)} "
-                        f"to square {chr(ord('a') + col)}{8 - row}")
-                    self.last_move = ((self.initial_pos.x(), self.initial_pos.y()), (col, row))
-
-                    self.setPos(new_x, new_y)
-
-                    # Update the board
-                    current_col = round(self.initial_pos.x() / square_size)
-                    current_row = round(self.initial_pos.y() / square_size)
-                    self.scene().board[current_row][current_col] = None
-                    self.scene().board[row][col] = self
-
-                    # Check for endgame condition: Verify if any king is still on the board
-                    white_king_exists = False
-                    black_king_exists = False
-
-                    for row in range(8):
-                        for col in range(8):
-                            piece = self.scene().board[row][col]
-                            if isinstance(piece, ChessPiece):
-                                if piece.piece_type == 'w_king':
-                                    white_king_exists = True
-                                elif piece.piece_type == 'b_king':
-                                    black_king_exists = True
-
-                    if not white_king_exists:
-                        self.log_thread.append_log("Game Over: Black Wins!")
-                        log_history = self.log_thread.get_log()
-                        mainWindow.save_session_to_database(log_history)
-
-                    elif not black_king_exists:
-                        self.log_thread.append_log("Game Over: White Wins!")
-                        log_history = self.log_thread.get_log()
-                        mainWindow.save_session_to_database(log_history)
-
-
-                else:
-                    self.setPos(self.initial_pos)  # Revert to the original position
-                    self.log_thread.append_log(
-                        f"Player {self.player}: Illegal move attempted by {self.piece_type} from square {chr(ord('a') + round(self.initial_pos.x() / square_size))}{8 - round(self.initial_pos.y() / square_size)} "
-                        f"to square {chr(ord('a') + col)}{8 - row}. Move denied.")
-
-            if self.highlighted_square:
-                self.scene().removeItem(self.highlighted_square)
-                self.highlighted_square = None
-
-            self.setOpacity(1.0)
-
-            self.scene().change_turn()
-
-        super().mouseReleaseEvent(event)
-
-        
-    def is_empty_or_opponent(self, piece):
-        if piece is None:
-            return True  # Square is empty
-        elif isinstance(piece, ChessPiece) and piece.player != self.player:
-            return True  # Square is occupied by an opponent's piece
-        else:
-            return False  # Square is occupied by own piece
-
-
-    def is_valid_move(self, col, row):
-        square_size = self.scene().square_size
-        current_col = round(self.initial_pos.x() / square_size)
-        current_row = round(self.initial_pos.y() / square_size)
-        board = self.scene().board
-
-        # Check if the target position is the same as the current position
-        if (current_col, current_row) == (col, row):
-            return False
-
-        # Check if the target position is within the board bounds
-        if not (0 <= col < 8 and 0 <= row < 8):
-            return False
-
-        # Get the piece at the target position
-        target_piece = board[row][col]
-
-        # Determine if the target position is empty or occupied by an opponent's piece
-        if self.is_empty_or_opponent(target_piece):
-            if self.piece_type == 'b_pawn':
-                # Black pawn moves
-                if col == current_col and row == current_row + 1 and target_piece is None:
-                    return True
-                elif current_row == 1 and col == current_col and row == current_row + 2 and board[current_row + 1][col] is None and target_piece is None:
-                    return True
-                elif abs(col - current_col) == 1 and row == current_row + 1 and target_piece is not None:
-                    return True
-            elif self.piece_type == 'w_pawn':
-                # White pawn moves
-                if col == current_col and row == current_row - 1 and target_piece is None:
-                    return True
-                elif current_row == 6 and col == current_col and row == current_row - 2 and board[current_row - 1][col] is None and target_piece is None:
-                    return True
-                elif abs(col - current_col) == 1 and row == current_row - 1 and target_piece is not None:
-                    return True
-            elif self.piece_type == 'b_rook' or self.piece_type == 'w_rook':
-                # Rook moves
-                if col == current_col:  # Vertical movement
-                    step = 1 if row > current_row else -1
-                    for i in range(current_row + step, row, step):
-                        if board[i][col] is not None:
-                            return False
-                    return True
-                elif row == current_row:  # Horizontal movement
-                    step = 1 if col > current_col else -1
-                    for j in range(current_col + step, col, step):
-                        if board[row][j] is not None:
-                            return False
-                    return True
-
-            elif self.piece_type == 'b_bishop' or self.piece_type == 'w_bishop':
-                # Bishop moves
-                if abs(col - current_col) == abs(row - current_row):
-                    step_x = 1 if col > current_col else -1
-                    step_y = 1 if row > current_row else -1
-                    check_col = current_col + step_x
-                    check_row = current_row + step_y
-                    while check_col != col and check_row != row:
-                        if self.scene().board[check_row][check_col] is not None:
-                            return False
-                        check_col += step_x
-                        check_row += step_y
-                    return True
-            elif self.piece_type == 'b_knight' or self.piece_type == 'w_knight':
-                # Knight moves
-                if (abs(col - current_col) == 2 and abs(row - current_row) == 1) or \
-                (abs(col - current_col) == 1 and abs(row - current_row) == 2):
-                    return True
-            elif self.piece_type == 'b_queen' or self.piece_type == 'w_queen':
-                # Queen moves (combination of rook and bishop)
-                if (col == current_col or row == current_row) or (abs(col - current_col) == abs(row - current_row)):
-                    # Check rook-like movement
-                    if col == current_col or row == current_row:
-                        step = 1 if col == current_col else -1
-                        axis = row if col == current_col else col
-                        for i in range(min(current_row, row) + 1, max(current_row, row)):
-                            if self.scene().board[i][axis] is not None:
-                                return False
-                    else:  # Check bishop-like movement
-                        step_x = 1 if col > current_col else -1
-                        step_y = 1 if row > current_row else -1
-                        check_col = current_col + step_x
-                        check_row = current_row + step_y
-                        while check_col != col and check_row != row:
-                            if self.scene().board[check_row][check_col] is not None:
-                                return False
-                            check_col += step_x
-                            check_row += step_y
-                    return True
-            elif self.piece_type == 'b_king' or self.piece_type == 'w_king':
-                # King moves
-                if abs(col - current_col) <= 1 and abs(row - current_row) <= 1:
-                    return True
-                # Check for castling
-                
-
-        return False
-
-
-
-    
-
-    def is_square_attacked(self, col, row):
-        # Sprawdzenie czy pole jest atakowane przez pionka przeciwnika
-        if self.is_square_attacked_by_enemy_pawn(col, row):
-            return True
-
-        # Sprawdzenie czy pole jest atakowane przez gońca, wieżę, hetmana lub króla przeciwnika
-        if self.is_square_attacked_by_enemy_bishop(col, row) or \
-        self.is_square_attacked_by_enemy_rook(col, row) or \
-        self.is_square_attacked_by_enemy_queen(col, row) or \
-        self.is_square_attacked_by_enemy_knight(col, row) or \
-        self.is_square_attacked_by_enemy_king(col, row):
-            return True
-
-        return False
-
-    def is_square_attacked_by_enemy_pawn(self, col, row):
-        # Sprawdzenie czy pole jest atakowane przez pionka przeciwnika
-        if self.player == 'white':
-            # Sprawdzamy ruchy pionka czarnego w kierunku pola (col, row)
-            if col > 0 and row > 0 and isinstance(self.scene().board[row - 1][col - 1], ChessPiece) and \
-            self.scene().board[row - 1][col - 1].player == 'black' and \
-            self.scene().board[row - 1][col - 1].piece_type == 'b_pawn':
-                return True
-            if col < 7 and row > 0 and isinstance(self.scene().board[row - 1][col + 1], ChessPiece) and \
-            self.scene().board[row - 1][col + 1].player == 'black' and \
-            self.scene().board[row - 1][col + 1].piece_type == 'b_pawn':
-                return True
-        else:
-            # Sprawdzamy ruchy pionka białego w kierunku pola (col, row)
-            if col > 0 and row < 7 and isinstance(self.scene().board[row + 1][col - 1], ChessPiece) and \
-            self.scene().board[row + 1][col - 1].player == 'white' and \
-            self.scene().board[row + 1][col - 1].piece_type == 'w_pawn':
-                return True
-            if col < 7 and row < 7 and isinstance(self.scene().board[row + 1][col + 1], ChessPiece) and \
-            self.scene().board[row + 1][col + 1].player == 'white' and \
-            self.scene().board[row + 1][col + 1].piece_type == 'w_pawn':
-                return True
-        return False
-
-
-    def update_highlighted_square(self):
-        if self.scene():
-            square_size = self.scene().square_size
-            col = round(self.x() / square_size)
-            row = round(self.y() / square_size)
-
-            new_x = col * square_size
-            new_y = row * square_size
-
-            if self.highlighted_square:
-                self.highlighted_square.setRect(new_x, new_y, square_size, square_size)
-            else:
-                self.highlighted_square = HighlightedSquare(new_x, new_y, square_size)
-                self.scene().addItem(self.highlighted_square)
-                self.highlighted_square.highlight()
-
-
-
-
-class HighlightedSquare(QGraphicsRectItem):
-    def __init__(self, x, y, size):
-        super().__init__(x, y, size, size)
-        self.setBrush(QColor(0, 255, 0, 100))  # Kolor z przezroczystością
-
-    def highlight(self):
-        self.setBrush(QColor(0, 255, 0, 100))
-
-    def unhighlight(self):
-        self.setBrush(Qt.NoBrush)
-
-class PlayerLabel(QLabel):
-    def __init__(self, initial_player):
-        super().__init__()
-        self.setText(f"Current player: {initial_player}")
-
-    def update_player(self, player):
-        self.setText(f"Current player: {player}")
-
-
-
-class ChessboardScene(QGraphicsScene):
-    current_player_updated = pyqtSignal(str)  # Aktualizacja sygnału
-
-    def __init__(self, log_thread):
-        super().__init__()
-
-        self.chessboard_size = 8
-        self.square_size = 60
-        self.current_player = 'white'  # Dodanie zmiennej dla aktualnego gracza
-        self.init_chessboard()
-        self.log_thread = log_thread
-        self.board = [[None] * self.chessboard_size for _ in range(self.chessboard_size)]  # Inicjalizacja planszy
-
-    def init_chessboard(self):
-        colors = [Qt.lightGray, Qt.darkGray]
-
-        for row in range(self.chessboard_size):
-            for col in range(self.chessboard_size):
-                square_color = colors[(row + col) % 2]
-                square = self.addRect(col * self.square_size, row * self.square_size,
-                                      self.square_size, self.square_size)
-                square.setBrush(square_color)
-
-                # Dodajemy etykiety kolumn i rzędów
-                if col == 0:
-                    label = QGraphicsTextItem(str(8 - row))
-                    label.setFont(QFont("Arial", 12))
-                    label.setPos(col * self.square_size - 20, row * self.square_size)
-                    self.addItem(label)
-
-                if row == self.chessboard_size - 1:
-                    label = QGraphicsTextItem(chr(ord('a') + col))
-                    label.setFont(QFont("Arial", 12))
-                    label.setPos(col * self.square_size + 10, row * self.square_size + 60)
-                    self.addItem(label)
-
-    def remove_chess_piece(self, col, row):
-        piece = self.board[row][col]
-        if piece:
-            self.removeItem(piece)
-            self.board[row][col] = None  # Clear the board position
-    
-    def change_turn(self):
-        if self.current_player == 'white':
-            self.current_player = 'black'
-        else:
-            self.current_player = 'white'
-
-        self.current_player_updated.emit(self.current_player)  # Emitowanie sygnału
-
-    def mousePressEvent(self, event):
-        item = self.itemAt(event.scenePos(), self.views()[0].transform())
-        if isinstance(item, ChessPiece):
-            self.clear_highlight()
-            self.highlight_square(item)
-
-        super().mousePressEvent(event)
-
-    def highlight_square(self, chess_piece):
-        square_size = self.square_size
-        col = round(chess_piece.x() / square_size)
-        row = round(chess_piece.y() / square_size)
-
-        chess_piece.highlighted_square = HighlightedSquare(col * square_size, row * square_size, square_size)
-        self.addItem(chess_piece.highlighted_square)
-        chess_piece.highlighted_square.highlight()
-
-    def clear_highlight(self):
-        for item in self.items():
-            if isinstance(item, HighlightedSquare):
-                self.removeItem(item)
-    def add_chess_piece(self, piece, col, row):
-        self.addItem(piece)
-        piece.setPos(col * self.square_size + (self.square_size - piece.pixmap().width()) / 2,
-                     row * self.square_size + (self.square_size - piece.pixmap().height()) / 2)
-        self.board[row][col] = piece  # Aktualizacja planszy
-
-    def remove_chess_piece(self, col, row):
-        piece = self.board[row][col]
-        if piece:
-            self.removeItem(piece)
-            self.board[row][col] = None  # Usunięcie pionka z planszy
-    def process_chess_notation(self, notation):
-        try:
-            # Parse the chess notation (e.g., "a3-a2")
-            from_col = ord(notation[0]) - ord('a')
-            from_row = 8 - int(notation[1])  # Convert 1-based row to 0-based index
-            to_col = ord(notation[3]) - ord('a')
-            to_row = 8 - int(notation[4])  # Convert 1-based row to 0-based index
-
-            # Get the piece from the board
-            piece = self.board[from_row][from_col]
-
-            if piece and piece.player == self.current_player:
-                # Simulate mouse press, move, and release events programmatically
-                mouse_event = QMouseEvent(QEvent.MouseButtonPress, QPointF(0, 0), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
-                piece.mousePressEvent(mouse_event)
-
-                # Move the piece to the new position
-                piece.setPos(to_col * self.square_size, to_row * self.square_size)
-
-                mouse_event = QMouseEvent(QEvent.MouseButtonRelease, QPointF(0, 0), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
-                piece.mouseReleaseEvent(mouse_event)
-
-                # Clear any highlights after the move
-                self.clear_highlight()
-
-                # Change turn after successful move
-                self.change_turn()
-
-        except Exception as e:
-            print(f"Invalid move: {e}")
-
-
-
-
-    
-
-class ChessboardView(QGraphicsView):
-    def __init__(self, scene, square_size, log_thread):
-        super().__init__(scene)
-        self.setWindowTitle("Szachy")
-        self.square_size = square_size
-        self.init_chess_pieces(square_size, log_thread)
-
-    def init_chess_pieces(self, square_size, log_thread):
-        pieces = [
-            ('b_rook', 0, 0, 'black'),
-            ('b_knight', 1, 0, 'black'),
-            ('b_bishop', 2, 0, 'black'),
-            ('b_queen', 3, 0, 'black'),
-            ('b_king', 4, 0, 'black'),
-            ('b_bishop', 5, 0, 'black'),
-            ('b_knight', 6, 0, 'black'),
-            ('b_rook', 7, 0, 'black'),
-            ('b_pawn', 0, 1, 'black'),
-            ('b_pawn', 1, 1, 'black'),
-            ('b_pawn', 2, 1, 'black'),
-            ('b_pawn', 3, 1, 'black'),
-            ('b_pawn', 4, 1, 'black'),
-            ('b_pawn', 5, 1, 'black'),
-            ('b_pawn', 6, 1, 'black'),
-            ('b_pawn', 7, 1, 'black'),
-            ('w_rook', 0, 7, 'white'),
-            ('w_knight', 1, 7, 'white'),
-            ('w_bishop', 2, 7, 'white'),
-            ('w_queen', 3, 7, 'white'),
-            ('w_king', 4, 7, 'white'),
-            ('w_bishop', 5, 7, 'white'),
-            ('w_knight', 6, 7, 'white'),
-            ('w_rook', 7, 7, 'white'),
-            ('w_pawn', 0, 6, 'white'),
-            ('w_pawn', 1, 6, 'white'),
-            ('w_pawn', 2, 6, 'white'),
-            ('w_pawn', 3, 6, 'white'),
-            ('w_pawn', 4, 6, 'white'),
-            ('w_pawn', 5, 6, 'white'),
-            ('w_pawn', 6, 6, 'white'),
-            ('w_pawn', 7, 6, 'white'),
-        ]
-
-        for piece_type, col, row, player in pieces:
-            chess_piece = ChessPiece(piece_type, square_size, player, log_thread)
-            self.scene().add_chess_piece(chess_piece, col, row)
-
-
-
-class MainWindow(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.initUI()
-        self.session_names = set()  # To store unique session names
-
-
-    def initUI(self):
-        layout = QVBoxLayout()
-
-        # Chessboard View
-        self.scene = ChessboardScene(log_thread)
-        view = ChessboardView(self.scene, self.scene.square_size, log_thread)
-        layout.addWidget(view)
-
-        # Current Player Label
-        self.current_player_label = PlayerLabel(self.scene.current_player)
-        layout.addWidget(self.current_player_label)
-
-        # IP Address Input
-        ip_label = QLabel("IP Address:")
-        self.ip_input = QLineEdit()
-        layout.addWidget(ip_label)
-        layout.addWidget(self.ip_input)
-
-        # Port Input
-        port_label = QLabel("Port:")
-        self.port_input = QLineEdit()
-        layout.addWidget(port_label)
-        layout.addWidget(self.port_input)
-
-        # Log TextEdit
-        self.log_textedit = QTextEdit()
-        layout.addWidget(self.log_textedit)
-
-        # Chess Notation Input
-        self.chess_notation_input = QLineEdit()
-        self.chess_notation_input.setPlaceholderText("Enter chess move (e.g., e2-e4)")
-        layout.addWidget(self.chess_notation_input)
-
-        # Connect chess notation input signal
-        self.chess_notation_input.returnPressed.connect(self.process_chess_notation)
-
-        # Connect log update signal
-        log_thread.log_updated.connect(self.update_log_textedit)
-
-        # Connect player change signal
-        self.scene.current_player_updated.connect(self.current_player_label.update_player)
-
-        # Start Game Button
-        start_game_button = QPushButton("Start Game")
-        start_game_button.clicked.connect(self.start_game)
-        layout.addWidget(start_game_button)
-        
-        # Radio Buttons for Game Mode Selection
-        self.human_vs_human_radio = QRadioButton("Human vs Human")
-        self.human_vs_computer_radio = QRadioButton("Human vs Computer")
-
-        # Set default mode (Human vs Human)
-        self.human_vs_human_radio.setChecked(True)
-
-        # Create layout for radio buttons
-        radio_layout = QHBoxLayout()
-        radio_layout.addWidget(self.human_vs_human_radio)
-        radio_layout.addWidget(self.human_vs_computer_radio)
-        layout.addLayout(radio_layout)
-
-        self.setLayout(layout)
-        self.setWindowTitle("Chess")
-    
-    def save_session_to_database(self, log_history):
-        conn = sqlite3.connect('Chess_sessions.db')
-        cursor = conn.cursor()
-
-        # Generate a unique session name based on current date and time
-        session_name = self.generate_unique_session_name()
-        
-        # Store session name in set to keep track of saved sessions
-        self.session_names.add(session_name)
-
-        # Insert session details into the database
-        cursor.execute('''
-            INSERT INTO sessions (session_name, move_history) 
-            VALUES (?, ?)
-        ''', (session_name, log_history))
-
-        conn.commit()
-        conn.close()
-    
-    def set_human_vs_human_mode(self):
-        self.human_vs_computer_radio.setChecked(False)
-        # Handle setting the game mode to Human vs Human
-        # Implement your logic here (e.g., disable AI)
-
-    def set_human_vs_computer_mode(self):
-        self.human_vs_human_radio.setChecked(False)
-        # Handle setting the game mode to Human vs Computer
-        # Implement your logic here (e.g., enable AI)
-
-
-    def generate_unique_session_name(self):
-        # Format the session name using current date and time
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-        session_name = f"Session_data_{timestamp}"
-        return session_name
-
-
-    def start_game(self):
-        ip_address = self.ip_input.text()
-        port = self.port_input.text()
-        game_mode = "Human vs Human" if self.human_vs_human_radio.isChecked() else "Human vs Computer"
-
-        # Create a dictionary with configuration data
-        config_data = {
-            "game_mode": game_mode,
-            "ip_address": ip_address,
-            "port": port
-        }
-
-        # Save configuration data to JSON file
-        with open("config.json", "w") as json_file:
-            json.dump(config_data, json_file)
-
-        print("Configuration saved to config.json")
-
-    def set_human_vs_human_mode(self):
-        # Handle setting the game mode to Human vs Human
-        pass  # Implement your logic here
-
-    def set_human_vs_computer_mode(self):
-        # Handle setting the game mode to Human vs Computer
-        pass  # Implement your logic here
-    
-    def process_chess_notation(self):
-        notation = self.chess_notation_input.text().strip()
-        self.scene.process_chess_notation(notation)
-        self.chess_notation_input.clear()
-
-
-
-    def update_log_textedit(self, log):
-        self.log_textedit.setPlainText(log)
-        
-class Piece:
-    def __init__(self, piece_type, player):
-        self.piece_type = piece_type
-        self.player = player
-
-
+import sys
+import os
+import time
+
+# Only what the command line needs is imported up front: the GUI, the
+# engine and the database load inside the run_* functions that use them,
+# so that worker processes (which import this file as their main module)
+# and the CLI tools start quickly.  Same as gamestore.DEFAULT_DB_PATH.
+DEFAULT_DB_PATH = 'Chess_sessions.db'
+# Same as tablebase.DEFAULT_DIRECTORY
+DEFAULT_TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+
+def run_search(seconds, fen=None, hash_mb=16):
+    """Let the engine think on one position and print its per-depth progress."""
+    from engine import Engine
+    from position import Position, move_to_uci
+    position = Position.from_fen(fen) if fen else Position.initial()
+    result = Engine(hash_mb=hash_mb).search(position, time_limit=seconds, info_callback=lambda info: print(f"info {info}"))
+    print(f"bestmove {move_to_uci(result.best_move) if result.best_move is not None else '(none)'} "
+          f"(depth {result.depth}, {result.nodes} nodes, {result.nps} nodes/s)")
+    return 0
+
+
+def run_smp_report(depth, hash_mb=64):
+    """Print how Lazy SMP time-to-depth and speed scale with the number of workers."""
+    from engine import smp_scaling_report
+    print(f"Lazy SMP, depth {depth}, {hash_mb} MB shared hash")
+    base_time = None
+    for threads, time_to_depth, nps in smp_scaling_report(depth=depth, hash_mb=hash_mb):
+        base_time = base_time or time_to_depth
+        print(f"{threads:>2} workers: {time_to_depth:7.2f} s to depth {depth} "
+              f"(speedup {base_time / time_to_depth:4.2f}), {nps:>8} nodes/s")
+    return 0
+
+
+def run_eval_benchmark(count):
+    """Time the NumPy batch evaluator against scoring positions one at a time."""
+    import batcheval
+    report = batcheval.benchmark(count)
+    print(f"{count} positions, microseconds per position:")
+    print(f"  encode to int8 boards: {report['encode'] * 1e6:6.2f}")
+    for term in ('material', 'full'):
+        scalar, batch = report[f'scalar {term}'], report[f'batch {term}']
+        print(f"  {term:>8}: one at a time {scalar * 1e6:6.2f}, batch {batch * 1e6:6.2f} "
+              f"({scalar / batch:.0f}x), results {'match' if report[f'{term} matches'] else 'DIFFER'}")
+    return 0 if report['material matches'] and report['full matches'] else 1
+
+
+def run_import_pgn(path, db_path):
+    """Bulk-load a PGN file into the game database."""
+    import pgn
+    from gamestore import GameStore
+    store = GameStore(db_path)
+    try:
+        imported, skipped, elapsed = pgn.import_pgn(store, path)
+    except (OSError, ValueError) as e:
+        print(e)
+        return 1
+    finally:
+        store.close()
+    print(f"Imported {imported} games, skipped {skipped}, in {elapsed:.1f} s "
+          f"({imported / elapsed if elapsed > 0 else 0:.0f} games/s)")
+    return 0
+
+
+def run_export_pgn(path, db_path):
+    """Write every game in the database to a PGN file."""
+    import pgn
+    from gamestore import GameStore
+    store = GameStore(db_path)
+    try:
+        exported, elapsed = pgn.export_pgn(store, path)
+    except (OSError, ValueError) as e:
+        print(e)
+        return 1
+    finally:
+        store.close()
+    print(f"Exported {exported} games in {elapsed:.1f} s ({exported / elapsed if elapsed > 0 else 0:.0f} games/s)")
+    return 0
+
+
+def run_export_archive(path, db_path):
+    """Write the game database to a binary archive and compare the sizes."""
+    import archive
+    from gamestore import GameStore
+    store = GameStore(db_path)
+    exported, elapsed = archive.export_archive(store, path)
+    store.close()
+    db_size, archive_size = archive.file_size(db_path), archive.file_size(path)
+    print(f"Archived {exported} games in {elapsed:.1f} s: {archive_size} bytes against {db_size} in the database "
+          f"({db_size / archive_size if archive_size else 0:.0f}x smaller)")
+    return 0
+
+
+def run_import_archive(path, db_path):
+    """Add the games in a binary archive to the game database."""
+    import archive
+    from gamestore import GameStore
+    store = GameStore(db_path)
+    try:
+        imported, elapsed = archive.import_archive(store, path)
+    except (OSError, archive.ArchiveError) as e:
+        print(e)
+        return 1
+    finally:
+        store.close()
+    print(f"Imported {imported} games in {elapsed:.1f} s")
+    return 0
+
+
+def run_scan_archive(path):
+    """Time reading every move of a binary archive."""
+    import archive
+    try:
+        plies, size, elapsed = archive.scan(path)
+    except (OSError, archive.ArchiveError) as e:
+        print(e)
+        return 1
+    print(f"Read {plies} moves ({size} bytes) in {elapsed * 1000:.1f} ms "
+          f"({size / elapsed / 1e9 if elapsed > 0 else 0:.2f} GB/s)")
+    return 0
+
+
+def run_replay(db_path, workers, shard_size, restart):
+    """Re-check every stored game against the rules in a pool of worker processes."""
+    import replay
+    from gamestore import GameStore
+    store = GameStore(db_path)
+    start = time.perf_counter()
+    try:
+        counts = replay.replay_games(store, workers, shard_size, restart)
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume")
+        return 1
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - start
+    print(", ".join(f"{count} {status}" for status, count in counts.items()) + f" in {elapsed:.1f} s")
+    return 0 if counts['ok'] == sum(counts.values()) else 1
+
+
+def run_tournament(args):
+    """Play an engine-vs-engine match and print the score, speeds and faults."""
+    import tournament
+    from gamestore import GameStore
+    try:
+        spec_a = tournament.parse_engine_spec(args.engine_a)
+        spec_b = tournament.parse_engine_spec(args.engine_b)
+        openings = tournament.load_openings(args.openings) if args.openings else tournament.OPENINGS
+    except (OSError, ValueError) as e:
+        print(e)
+        return 2
+    store = GameStore(args.db)
+    try:
+        stats = tournament.run_match(spec_a, spec_b, args.games, args.concurrency, store, openings, args.max_plies)
+    except KeyboardInterrupt:
+        print("Interrupted; finished games are saved")
+        return 1
+    finally:
+        store.close()
+    return 0 if stats.games else 1
+
+
+def run_tablebase(args):
+    """Generate the endgame tables, check them (--verify) or look a position up in them (--probe)."""
+    import tablebase
+    import tbgen
+    from position import Position, WHITE
+    try:
+        if args.probe:
+            position = Position.from_fen(args.probe)
+            found = tablebase.Tablebases(args.dir).probe(position)
+            if found is None:
+                print("Not in the tables")
+                return 1
+            wdl, plies = found
+            side = 'White' if position.side == WHITE else 'Black'
+            print(f"{side} to move: " + ("draw" if not wdl else f"{'wins' if wdl > 0 else 'loses'}, mate in {plies} plies"))
+            return 0
+        if args.verify:
+            return 0 if tbgen.verify_tables(args.tables, args.dir) == 0 else 1
+        start = time.perf_counter()
+        summaries = tbgen.generate_tables(args.tables, args.dir, args.workers, args.overwrite)
+    except (OSError, ValueError) as e:
+        print(e)
+        return 2
+    except KeyboardInterrupt:
+        print("Interrupted; finished tables are kept, run again to go on")
+        return 1
+    print(f"{len(summaries)} tables generated in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def run_net_latency(plies):
+    """Play random moves between a network host and guest over localhost and print the latencies."""
+    import netplay
+    deliveries, round_trips = netplay.measure_latency(plies)
+    print(f"Host move to guest board ({len(deliveries)} moves): {netplay.latency_summary(deliveries)}")
+    print(f"Guest move to host acknowledgement ({len(round_trips)} moves): {netplay.latency_summary(round_trips)}")
+    return 0
+
+
+def run_server(port, db_path):
+    """Host network games without a window until interrupted."""
+    import asyncio
+    import server
+    game_server = server.GameServer(db_path)
+    try:
+        asyncio.run(game_server.run(None, port))
+    except KeyboardInterrupt:
+        print(f"Stopped; games in progress are suspended in {game_server.suspend_dir}")
+    return 0
+
+
+def run_server_load_test(games):
+    """Play many simultaneous random games against an in-process server and print the throughput."""
+    import netplay
+    import server
+    moves, elapsed, latencies = server.load_test(games)
+    print(f"{moves} moves in {elapsed:.1f} s ({moves / elapsed if elapsed > 0 else 0:.0f} moves/s)")
+    print(f"Move round trip: {netplay.latency_summary(latencies)}")
+    return 0
+
+
+def run_spectator_test():
+    """Time a game's moves with 0 to 500 spectators watching it."""
+    import server
+    results = server.spectator_test()
+    return 0 if all(delivered for _, _, delivered in results) else 1
+
+
+def run_uci(hash_mb=16):
+    """Speak UCI on stdin/stdout until quit."""
+    import uci
+    return uci.main(hash_mb)
+
+
+def run_perft(depth, fen=None):
+    """Print perft node counts and speed for one FEN or for the reference suite."""
+    from position import Position, PERFT_SUITE, perft
+    suite = [('custom', fen, ())] if fen else PERFT_SUITE
+    all_ok = True
+    for name, suite_fen, expected in suite:
+        position = Position.from_fen(suite_fen)
+        start = time.perf_counter()
+        nodes = perft(position, depth)
+        elapsed = time.perf_counter() - start
+        nps = nodes / elapsed if elapsed > 0 else 0.0
+        status = ''
+        if depth <= len(expected):
+            ok = nodes == expected[depth - 1]
+            all_ok = all_ok and ok
+            status = 'OK' if ok else f'FAIL (expected {expected[depth - 1]})'
+        print(f"{name:<12} depth {depth}: {nodes:>10} nodes {elapsed:8.2f} s {nps:>10.0f} nps {status}")
+    return 0 if all_ok else 1
+
+
+def run_gui(qt_args, profile_startup=False):
+    """Open the game window; with profile_startup, print where the time to the first frame went."""
+    import importlib
+    timings = [] if profile_startup else None
+    # Qt and the game modules load here, one at a time so each can be timed
+    for module in ('PyQt5.QtWidgets', 'position', 'engine', 'gamestore', 'netplay', 'gui'):
+        start = time.perf_counter()
+        importlib.import_module(module)
+        if profile_startup:
+            timings.append((f"import {module}", time.perf_counter() - start))
+    import gui
+    return gui.run(qt_args, timings)
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-
-    # Utwórz wątek logowania
-    log_thread = LogThread()
-
-    # Uruchom wątek logowania
-    log_thread_thread = threading.Thread(target=log_thread.run)
-    log_thread_thread.start()
-
-    # Utwórz i wyświetl główne okno
-    mainWindow = MainWindow()
-    mainWindow.show()
-
-    sys.exit(app.exec_())
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Chess game")
+    parser.add_argument('--perft', type=int, metavar='N', help="count legal move tree leaves to depth N and exit")
+    parser.add_argument('--search', type=float, metavar='SECONDS', help="let the engine think on --fen and exit")
+    parser.add_argument('--smp-report', type=int, metavar='DEPTH', help="time Lazy SMP searches to DEPTH with 1-16 workers and exit")
+    parser.add_argument('--eval-benchmark', type=int, metavar='POSITIONS', help="time batch against per-position evaluation and exit")
+    parser.add_argument('--hash', type=int, default=16, metavar='MB', help="transposition table size for --search, --smp-report and --uci")
+    parser.add_argument('--uci', action='store_true', help="run the engine as a UCI engine on stdin/stdout")
+    parser.add_argument('--import-pgn', metavar='FILE', help="add the games in a PGN file to --db and exit")
+    parser.add_argument('--export-pgn', metavar='FILE', help="write the games in --db to a PGN file and exit")
+    parser.add_argument('--export-archive', metavar='FILE', help="write the games in --db to a binary archive and exit")
+    parser.add_argument('--import-archive', metavar='FILE', help="add the games in a binary archive to --db and exit")
+    parser.add_argument('--scan-archive', metavar='FILE', help="time reading every move of a binary archive and exit")
+    parser.add_argument('--net-latency', type=int, metavar='PLIES', help="time network moves over localhost and exit")
+    parser.add_argument('--serve', action='store_true', help="host network games without a window on --port")
+    parser.add_argument('--port', type=int, default=5555, help="port for --serve")
+    parser.add_argument('--serve-load-test', type=int, metavar='GAMES', help="play GAMES simultaneous games against a local server and exit")
+    parser.add_argument('--spectator-test', action='store_true', help="time a served game's moves with growing audiences and exit")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="game database for --import-pgn, --export-pgn, the archive options and --serve")
+    parser.add_argument('--profile-startup', action='store_true', help="print import and first-frame times")
+    parser.add_argument('--fen', help="position for --perft (default: the reference suite) or --search")
+    commands = parser.add_subparsers(dest='command')
+    replay_parser = commands.add_parser('replay', help="re-check every stored game against the rules and exit")
+    replay_parser.add_argument('--db', default=DEFAULT_DB_PATH, help="game database to check")
+    replay_parser.add_argument('--workers', type=int, default=os.cpu_count(), metavar='N',
+                               help="worker processes (default: one per core)")
+    replay_parser.add_argument('--shard-size', type=int, default=1000, metavar='GAMES',
+                               help="game ids per unit of work")
+    replay_parser.add_argument('--restart', action='store_true', help="forget earlier results and check everything")
+    match_parser = commands.add_parser('tournament', help="play two engine configurations against each other and exit")
+    match_parser.add_argument('--engine-a', default='hash=16,movetime=0.1', metavar='SPEC',
+                              help="first engine, e.g. 'hash=64,depth=5' or 'movetime=0.1,cmd=python old/szachy.py --uci'")
+    match_parser.add_argument('--engine-b', default='hash=16,movetime=0.1', metavar='SPEC', help="second engine")
+    match_parser.add_argument('--games', type=int, default=100, help="games to play, two per opening")
+    match_parser.add_argument('--concurrency', type=int, default=os.cpu_count(), metavar='N',
+                              help="games played at once, one process each (default: one per core)")
+    match_parser.add_argument('--openings', metavar='FILE', help="opening lines in UCI moves, one per line")
+    match_parser.add_argument('--max-plies', type=int, default=300, help="plies before a game is called a draw")
+    match_parser.add_argument('--db', default=DEFAULT_DB_PATH, help="game database the finished games go to")
+    tablebase_parser = commands.add_parser('tablebase', help="generate the 3- and 4-piece endgame tables and exit")
+    tablebase_parser.add_argument('tables', nargs='*', metavar='TABLE',
+                                  help="material sets such as KRvKP (default: all); what they depend on comes too")
+    tablebase_parser.add_argument('--dir', default=DEFAULT_TABLEBASE_DIR, help="directory the engine and the GUI read tables from")
+    tablebase_parser.add_argument('--workers', type=int, default=os.cpu_count(), metavar='N',
+                                  help="tables generated at once, one process each (default: one per core)")
+    tablebase_parser.add_argument('--overwrite', action='store_true', help="regenerate tables that already exist")
+    tablebase_parser.add_argument('--verify', action='store_true', help="check the existing tables instead")
+    tablebase_parser.add_argument('--probe', metavar='FEN', help="look a position up instead")
+    args, qt_args = parser.parse_known_args()
+
+    if args.command == 'replay':
+        sys.exit(run_replay(args.db, args.workers, args.shard_size, args.restart))
+    if args.command == 'tournament':
+        sys.exit(run_tournament(args))
+    if args.command == 'tablebase':
+        sys.exit(run_tablebase(args))
+
+    if args.uci:
+        sys.exit(run_uci(args.hash))
+    if args.perft:
+        sys.exit(run_perft(args.perft, args.fen))
+    if args.search:
+        sys.exit(run_search(args.search, args.fen, args.hash))
+    if args.smp_report:
+        sys.exit(run_smp_report(args.smp_report, args.hash))
+    if args.eval_benchmark:
+        sys.exit(run_eval_benchmark(args.eval_benchmark))
+    if args.import_pgn:
+        sys.exit(run_import_pgn(args.import_pgn, args.db))
+    if args.export_pgn:
+        sys.exit(run_export_pgn(args.export_pgn, args.db))
+    if args.export_archive:
+        sys.exit(run_export_archive(args.export_archive, args.db))
+    if args.import_archive:
+        sys.exit(run_import_archive(args.import_archive, args.db))
+    if args.scan_archive:
+        sys.exit(run_scan_archive(args.scan_archive))
+    if args.net_latency:
+        sys.exit(run_net_latency(args.net_latency))
+    if args.serve:
+        sys.exit(run_server(args.port, args.db))
+    if args.serve_load_test:
+        sys.exit(run_server_load_test(args.serve_load_test))
+    if args.spectator_test:
+        sys.exit(run_spectator_test())
+
+    sys.exit(run_gui(qt_args, args.profile_startup))
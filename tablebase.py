@@ -0,0 +1,222 @@
+"""Endgame tablebases: exact results for positions with at most four pieces.
+
+One file per material set (KQvK.tbl, KRvKP.tbl, ...), written by
+tbgen.py, holding a byte per position: won, lost or drawn for the side
+to move and, when decided, the number of plies to mate.  Positions are
+stored from the point of view of the side with more material as white;
+the other case is looked up with the colours swapped and the board
+turned over.  Symmetry keeps the files small: the white king is moved to
+a canonical part of the board (the a1-d1-d4 triangle without pawns, the
+a-d files with them) and only those king squares are stored.
+
+Index of a stored position, most significant first: side to move, the
+white king's canonical square, the black king's square, then the other
+pieces in order of kind (queen, rook, bishop, knight, pawn), white's
+before black's.
+
+Tablebases.probe() answers from a mapped file without reading it, a few
+microseconds a call, so the engine can call it at every node and the
+game-over checks after every move.  Positions with castling rights or an
+en passant capture are not covered: the tables know neither.
+"""
+
+import mmap
+import os
+import struct
+
+from position import WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK_FLAG, OCCUPANCY, NO_SQUARE
+
+# Next to this file rather than the working directory, like the GUI's images
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+SUFFIX = '.tbl'
+MAGIC = b'SZTB'
+VERSION = 1
+# magic, version, piece count, has pawns, longest mate in plies, material name
+HEADER = struct.Struct('<4sHBBI16s4x')
+MAX_PIECES = 4
+
+# Byte values
+DRAW = 0
+LOSS = 128  # LOSS + n: the side to move is mated in n plies; 1 to 127: it mates in that many plies
+INVALID = 255  # Not a legal position
+MAX_PLIES = 120
+
+KIND_ORDER = (QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+KIND_RANK = {kind: rank for rank, kind in enumerate(KIND_ORDER)}
+KIND_LETTERS = {QUEEN: 'Q', ROOK: 'R', BISHOP: 'B', KNIGHT: 'N', PAWN: 'P'}
+LETTER_KINDS = {letter: kind for kind, letter in KIND_LETTERS.items()}
+
+
+def _transforms():
+    # The eight symmetries of the board as square permutations: t & 1 mirrors the files,
+    # t & 2 the ranks, t & 4 swaps files and ranks first
+    perms = []
+    for t in range(8):
+        perm = []
+        for square in range(64):
+            row, col = square >> 3, square & 7
+            if t & 4:
+                row, col = col, row
+            if t & 1:
+                col = 7 - col
+            if t & 2:
+                row = 7 - row
+            perm.append(row * 8 + col)
+        perms.append(tuple(perm))
+    return tuple(perms)
+
+
+TRANSFORMS = _transforms()
+# Canonical white king squares: a1-d1-d4 triangle (row 7 is rank 1), or files a-d with pawns
+TRIANGLE = tuple(square for square in range(64) if (square & 7) <= 3 and 7 - (square >> 3) <= (square & 7))
+HALF_BOARD = tuple(square for square in range(64) if (square & 7) <= 3)
+KING_REGIONS = (TRIANGLE, HALF_BOARD)  # Indexed by has-pawns
+# KING_TRANSFORM[has_pawns][square]: the transform moving a white king on square into its region
+KING_TRANSFORM = (
+    tuple(next(t for t in range(8) if TRANSFORMS[t][square] in TRIANGLE) for square in range(64)),
+    tuple(0 if (square & 7) <= 3 else 1 for square in range(64)),
+)
+REGION_INDEX = tuple({square: index for index, square in enumerate(region)} for region in KING_REGIONS)
+
+
+def material_name(white_kinds, black_kinds):
+    """('KQvK', swapped): the table name for the material, swapped when black is the stronger side."""
+    white = sorted(white_kinds, key=KIND_ORDER.index)
+    black = sorted(black_kinds, key=KIND_ORDER.index)
+    swapped = (len(black), [-KIND_ORDER.index(kind) for kind in black]) > \
+        (len(white), [-KIND_ORDER.index(kind) for kind in white])
+    if swapped:
+        white, black = black, white
+    return 'K' + ''.join(KIND_LETTERS[kind] for kind in white) + 'vK' + ''.join(KIND_LETTERS[kind] for kind in black), \
+        swapped
+
+
+def parse_material(name):
+    """(white kinds, black kinds) of a table name such as 'KRvKP'."""
+    white, _, black = name.partition('v')
+    if not (white.startswith('K') and black.startswith('K')) or not set(white[1:] + black[1:]) <= set(LETTER_KINDS):
+        raise ValueError(f"Bad material name {name!r}")
+    return [LETTER_KINDS[letter] for letter in white[1:]], [LETTER_KINDS[letter] for letter in black[1:]]
+
+
+def decode(value):
+    """(wdl, plies) from a stored byte: wdl is 1, 0 or -1 for the side to move."""
+    if value == DRAW:
+        return 0, 0
+    if value >= LOSS:
+        return -1, value - LOSS
+    return 1, value
+
+
+class Table:
+    """One mapped table file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as table_file:
+            self.map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.pieces, pawns, self.longest, name = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a version {VERSION} tablebase file")
+        self.has_pawns = bool(pawns)
+        self.name = name.rstrip(b'\0').decode('ascii')
+        self.regions = len(KING_REGIONS[self.has_pawns])
+
+    def close(self):
+        self.map.close()
+
+    def value(self, side, squares):
+        """The stored byte for side to move and squares in index order (white king first)."""
+        pawns = self.has_pawns
+        transform = TRANSFORMS[KING_TRANSFORM[pawns][squares[0]]]
+        index = side * self.regions + REGION_INDEX[pawns][transform[squares[0]]]
+        for square in squares[1:]:
+            index = index * 64 + transform[square]
+        return self.map[HEADER.size + index]
+
+
+class Tablebases:
+    """Every table found in a directory, opened as they are first needed."""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self.tables = {}
+        self.names = {name[:-len(SUFFIX)] for name in os.listdir(directory) if name.endswith(SUFFIX)}
+        self.materials = {}  # (white kind ranks, black kind ranks) -> (table or None, swapped)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables.clear()
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None and name in self.names:
+            table = self.tables[name] = Table(os.path.join(self.directory, name + SUFFIX))
+        return table
+
+    def probe(self, position):
+        """(wdl, plies) for the side to move, or None if the position is not in the tables.
+
+        wdl is 1 for a win, 0 for a draw and -1 for a loss; plies counts
+        the half-moves to mate with best play (0 for a draw).  The fifty-move
+        rule is not taken into account.
+        """
+        bitboards = position.bitboards
+        occupied = bitboards[OCCUPANCY] | bitboards[OCCUPANCY | BLACK_FLAG]
+        if occupied.bit_count() > MAX_PIECES or position.castling or position.ep_square != NO_SQUARE:
+            return None
+        white_pieces = []
+        black_pieces = []
+        kings = [0, 0]
+        board = position.board
+        while occupied:
+            low = occupied & -occupied
+            square = low.bit_length() - 1
+            occupied ^= low
+            piece = board[square]
+            if piece & 7 == KING:
+                kings[piece >> 3] = square
+            elif piece & BLACK_FLAG:
+                black_pieces.append((KIND_RANK[piece & 7], square))
+            else:
+                white_pieces.append((KIND_RANK[piece & 7], square))
+        if not white_pieces and not black_pieces:
+            return 0, 0
+        white_pieces.sort()
+        black_pieces.sort()
+        key = tuple(rank for rank, _ in white_pieces), tuple(rank for rank, _ in black_pieces)
+        material = self.materials.get(key)
+        if material is None:
+            name, swapped = material_name([KIND_ORDER[rank] for rank in key[0]], [KIND_ORDER[rank] for rank in key[1]])
+            material = self.materials[key] = self.table(name), swapped
+        table, swapped = material
+        if table is None:
+            return None
+        side = position.side
+        if swapped:
+            white_pieces, black_pieces = ([(kind, square ^ 56) for kind, square in black_pieces],
+                                          [(kind, square ^ 56) for kind, square in white_pieces])
+            kings = [kings[BLACK] ^ 56, kings[WHITE] ^ 56]
+            side ^= 1
+        squares = kings + [square for _, square in white_pieces] + [square for _, square in black_pieces]
+        value = table.value(side, squares)
+        return None if value == INVALID else decode(value)
+
+
+_default = {}
+
+
+def default_tablebases():
+    """Tablebases in DEFAULT_DIRECTORY, shared within the process; None if there are none.
+
+    Only tables that were found are kept, so ones generated later in the
+    process are picked up by the next call.
+    """
+    tablebases = _default.get(DEFAULT_DIRECTORY)
+    if tablebases is None and os.path.isdir(DEFAULT_DIRECTORY):
+        tablebases = Tablebases(DEFAULT_DIRECTORY)
+        if not tablebases.names:
+            return None
+        _default[DEFAULT_DIRECTORY] = tablebases
+    return tablebases
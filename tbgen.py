@@ -0,0 +1,599 @@
+"""Retrograde generation of the endgame tables read by tablebase.py.
+
+Each material set is solved on its own, smallest first, since captures
+and promotions lead into the smaller tables.  The solver works on every
+placement of the pieces, one byte per position and side to move, with
+NumPy doing the move generation for hundreds of thousands of positions
+at a time:
+
+1. A forward pass finds the legal positions, counts each one's moves
+   that stay in the table, and looks up every capture and promotion in
+   the finished smaller tables.  Mates, stalemates and positions whose
+   only moves leave the table are decided right away.
+2. Retrograde passes then walk back from what is decided: ply n's
+   winners are the predecessors of positions lost at ply n - 1, and a
+   predecessor of a position won at ply n - 1 loses at ply n once the
+   last of its moves has been refuted (its move count reaches zero).
+3. What is left undecided is a draw.  The table is written with only
+   the canonical white-king squares (see tablebase.py).
+
+Tables are generated in parallel, one worker process per table, as soon
+as the tables they depend on are finished.  En passant captures and
+castling are not modelled.
+"""
+
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("NumPy is needed for tablebase generation: pip install numpy") from None
+
+from position import WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, KNIGHT_STEPS, KING_STEPS
+from tablebase import (DEFAULT_DIRECTORY, SUFFIX, MAGIC, VERSION, HEADER, MAX_PIECES, DRAW, LOSS, INVALID, MAX_PLIES,
+                       KIND_ORDER, TRANSFORMS, KING_REGIONS, KING_TRANSFORM, REGION_INDEX, material_name, parse_material)
+
+UNKNOWN = 254  # Not decided yet, during generation only
+NONE = 64  # No square: off the board, or a captured piece
+CHUNK = 1 << 18  # Positions handled per array operation
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def standard_sets(max_pieces=MAX_PIECES):
+    """Names of every material set with 3 to max_pieces pieces, kings included."""
+    names = set()
+    for others in range(1, max_pieces - 1):
+        for white_count in range(others + 1):
+            for white in itertools.combinations_with_replacement(KIND_ORDER, white_count):
+                for black in itertools.combinations_with_replacement(KIND_ORDER, others - white_count):
+                    names.add(material_name(white, black)[0])
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def dependencies(name):
+    """The tables a capture or promotion in this one leads to."""
+    white, black = parse_material(name)
+    found = set()
+    for own, other in ((white, black), (black, white)):
+        for index, kind in enumerate(own):
+            rest = own[:index] + own[index + 1:]
+            found.add(material_name(rest, other)[0])
+            if kind == PAWN:
+                for promotion in PROMOTIONS:
+                    found.add(material_name(rest + [promotion], other)[0])
+    found.discard('KvK')
+    return found
+
+
+def with_dependencies(names):
+    """names and everything they depend on, each table after its dependencies."""
+    ordered = []
+
+    def visit(name):
+        if name not in ordered:
+            for dependency in sorted(dependencies(name)):
+                visit(dependency)
+            ordered.append(name)
+    for name in names:
+        visit(name)
+    return ordered
+
+
+# Move tables over 65 squares, the 65th standing for "no square"
+
+def _square(col, row):
+    return row * 8 + col if 0 <= col < 8 and 0 <= row < 8 else NONE
+
+
+def _leaps(steps):
+    table = np.full((65, len(steps)), NONE, dtype=np.int64)
+    for square in range(64):
+        for slot, (d_col, d_row) in enumerate(steps):
+            table[square, slot] = _square((square & 7) + d_col, (square >> 3) + d_row)
+    return table
+
+
+LEAPS = {KING: _leaps(KING_STEPS), KNIGHT: _leaps(KNIGHT_STEPS)}
+# Pawn captures by colour; white moves towards row 0
+PAWN_CAPTURES = (_leaps(((-1, -1), (1, -1))), _leaps(((-1, 1), (1, 1))))
+PAWN_STEP = (-8, 8)
+PAWN_START_ROW = (6, 1)
+PAWN_PROMOTION_ROW = (1, 6)  # The row a pawn promotes from
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+SLIDER_DIRECTIONS = {ROOK: range(4), BISHOP: range(4, 8), QUEEN: range(8)}
+
+
+def _rays():
+    rays = np.full((8, 65, 7), NONE, dtype=np.int64)
+    for direction, (d_col, d_row) in enumerate(DIRECTIONS):
+        for square in range(64):
+            for step in range(7):
+                rays[direction, square, step] = _square((square & 7) + d_col * (step + 1),
+                                                        (square >> 3) + d_row * (step + 1))
+    return rays
+
+
+RAYS = _rays()
+BIT = np.array([1 << square for square in range(64)] + [0], dtype=np.uint64)
+
+
+def _attack_tables():
+    # Flat [attacker square * 65 + target] tables
+    leaps = {kind: np.zeros(65 * 65, dtype=bool) for kind in (KING, KNIGHT)}
+    pawns = (np.zeros(65 * 65, dtype=bool), np.zeros(65 * 65, dtype=bool))
+    lines = {kind: np.zeros(65 * 65, dtype=bool) for kind in (BISHOP, ROOK, QUEEN)}
+    between = np.zeros(65 * 65, dtype=np.uint64)
+    for square in range(64):
+        for kind in (KING, KNIGHT):
+            for target in LEAPS[kind][square]:
+                if target != NONE:
+                    leaps[kind][square * 65 + target] = True
+        for color in (WHITE, BLACK):
+            for target in PAWN_CAPTURES[color][square]:
+                if target != NONE:
+                    pawns[color][square * 65 + target] = True
+        for direction in range(8):
+            passed = 0
+            for target in RAYS[direction, square]:
+                if target == NONE:
+                    break
+                for kind in ((ROOK, QUEEN) if direction < 4 else (BISHOP, QUEEN)):
+                    lines[kind][square * 65 + target] = True
+                between[square * 65 + target] = passed
+                passed |= 1 << int(target)
+    return leaps, pawns, lines, between
+
+
+LEAP_ATTACKS, PAWN_ATTACKS, LINE_ATTACKS, BETWEEN = _attack_tables()
+
+PERMS = np.array(TRANSFORMS, dtype=np.int64)
+KING_TRANSFORM_NP = tuple(np.array(table, dtype=np.int64) for table in KING_TRANSFORM)
+REGION_INDEX_NP = tuple(np.array([index.get(square, -1) for square in range(64)], dtype=np.int64)
+                        for index in REGION_INDEX)
+
+
+def attacked(target, attackers, occupied):
+    """Rows where any of attackers, (kind, colour, squares) triples, attacks the target squares."""
+    hit = np.zeros(len(target), dtype=bool)
+    for kind, color, square in attackers:
+        pair = square * 65 + target
+        if kind in LEAP_ATTACKS:
+            hit |= LEAP_ATTACKS[kind][pair]
+        elif kind == PAWN:
+            hit |= PAWN_ATTACKS[color][pair]
+        else:
+            hit |= LINE_ATTACKS[kind][pair] & ((BETWEEN[pair] & occupied) == 0)
+    return hit
+
+
+class StoredTable:
+    """A finished table file, read through a memory map for vectorised lookups."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as table_file:
+            header = table_file.read(HEADER.size)
+        magic, version, self.pieces, pawns, self.longest, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase file")
+        self.has_pawns = bool(pawns)
+        self.regions = len(KING_REGIONS[self.has_pawns])
+        self.data = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size)
+
+    def values(self, side, squares):
+        """Stored bytes for one side to move and arrays of squares in index order."""
+        pawns = self.has_pawns
+        transform = KING_TRANSFORM_NP[pawns][squares[0]]
+        index = side * self.regions + REGION_INDEX_NP[pawns][PERMS[transform, squares[0]]]
+        for square in squares[1:]:
+            index = index * 64 + PERMS[transform, square]
+        return self.data[index]
+
+
+class Generator:
+    """Solves one material set; generate() runs the passes and writes the file."""
+
+    def __init__(self, name, directory=DEFAULT_DIRECTORY):
+        white, black = parse_material(name)
+        self.name = name
+        self.directory = directory
+        self.pieces = [(KING, WHITE), (KING, BLACK)] + [(kind, WHITE) for kind in white] + \
+            [(kind, BLACK) for kind in black]
+        self.count = len(self.pieces)
+        self.has_pawns = PAWN in white or PAWN in black
+        self.size = 64 ** self.count  # Positions per side to move
+        self.subtables = {}
+        self.conversions = {}
+        self.values = None
+        self.counter = None
+        self.loss_ready = None
+        self.by_ply = {}  # Ply -> [(side, indices)] decided at that ply, until the passes reach it
+        self.longest = 0
+        self.conversion_wins = {}  # Ply -> [(side, indices)] that a capture or promotion wins at that ply
+
+    # Position index: sum of square_i * 64 ** (count - 1 - i), pieces in self.pieces order
+
+    def decode(self, index):
+        return [(index >> (6 * (self.count - 1 - i))) & 63 for i in range(self.count)]
+
+    def side_pieces(self, color, squares, skip=None):
+        return [(kind, piece_color, squares[i]) for i, (kind, piece_color) in enumerate(self.pieces)
+                if piece_color == color and i != skip]
+
+    def occupancy(self, squares):
+        occupied = np.zeros(len(squares[0]), dtype=np.uint64)
+        for square in squares:
+            occupied |= BIT[square]
+        return occupied
+
+    def legal(self, squares, side):
+        """Rows that are legal positions with side to move."""
+        ok = np.ones(len(squares[0]), dtype=bool)
+        for i in range(self.count):
+            for j in range(i + 1, self.count):
+                ok &= squares[i] != squares[j]
+            if self.pieces[i][0] == PAWN:
+                row = squares[i] >> 3
+                ok &= (row != 0) & (row != 7)
+        ok &= ~attacked(squares[side ^ 1], self.side_pieces(side, squares), self.occupancy(squares))
+        return ok
+
+    # Forward moves
+
+    def moves(self, side, squares, occupied):
+        """Yield (piece, targets, reach, captured, promotion) for every move of side's pieces.
+
+        reach marks the positions where the move exists; captured is the
+        index of the piece taken, promotion the new kind, either None.
+        Moves are not checked for leaving the king in check.
+        """
+        enemies = [i for i, (kind, color) in enumerate(self.pieces) if color != side and kind != KING]
+        for piece, (kind, color) in enumerate(self.pieces):
+            if color != side:
+                continue
+            square = squares[piece]
+            if kind == PAWN:
+                yield from self.pawn_moves(piece, side, squares, occupied, enemies)
+                continue
+            if kind in LEAPS:
+                steps = [(LEAPS[kind][square, slot], None) for slot in range(LEAPS[kind].shape[1])]
+            else:
+                steps = [(direction, step) for direction in SLIDER_DIRECTIONS[kind] for step in range(7)]
+            alive = None
+            for first, step in steps:
+                if step is None:
+                    target = first
+                    reach = target != NONE
+                else:
+                    target = RAYS[first, square, step]
+                    if step == 0:
+                        alive = target != NONE
+                    reach = alive & (target != NONE)
+                empty = (occupied & BIT[target]) == 0
+                yield piece, target, reach & empty, None, None
+                for enemy in enemies:
+                    yield piece, target, reach & (target == squares[enemy]), enemy, None
+                if step is not None:
+                    alive = reach & empty
+
+    def pawn_moves(self, piece, side, squares, occupied, enemies):
+        square = squares[piece]
+        row = square >> 3
+        last = row == PAWN_PROMOTION_ROW[side]
+        target = square + PAWN_STEP[side]
+        empty = (occupied & BIT[target]) == 0
+        yield piece, target, empty & ~last, None, None
+        for promotion in PROMOTIONS:
+            yield piece, target, empty & last, None, promotion
+        on_start = row == PAWN_START_ROW[side]
+        double = np.where(on_start, square + 2 * PAWN_STEP[side], NONE)
+        yield piece, double, on_start & empty & ((occupied & BIT[double]) == 0), None, None
+        for slot in range(2):
+            target = PAWN_CAPTURES[side][square, slot]
+            for enemy in enemies:
+                hit = (target != NONE) & (target == squares[enemy])
+                yield piece, target, hit & ~last, enemy, None
+                for promotion in PROMOTIONS:
+                    yield piece, target, hit & last, enemy, promotion
+
+    def conversion(self, piece, captured, promotion):
+        """(subtable or None for a bare-kings draw, swapped, piece order) for a capture or promotion."""
+        key = (piece, captured, promotion)
+        if key not in self.conversions:
+            pieces = list(self.pieces)
+            if promotion:
+                pieces[piece] = (promotion, pieces[piece][1])
+            kept = [i for i in range(self.count) if i != captured]
+            name, swapped = material_name([pieces[i][0] for i in kept if pieces[i] != (KING, WHITE)
+                                           and pieces[i][1] == WHITE],
+                                          [pieces[i][0] for i in kept if pieces[i] != (KING, BLACK)
+                                           and pieces[i][1] == BLACK])
+            order = sorted(kept, key=lambda i: (pieces[i][0] != KING, pieces[i][1] ^ swapped,
+                                                KIND_ORDER.index(pieces[i][0]) if pieces[i][0] != KING else 0))
+            table = None
+            if name != 'KvK':
+                if name not in self.subtables:
+                    self.subtables[name] = StoredTable(os.path.join(self.directory, name + SUFFIX))
+                table = self.subtables[name]
+            self.conversions[key] = table, swapped, order
+        return self.conversions[key]
+
+    def forward(self, side, start, stop, table=None):
+        """Legal positions in [start, stop) with side to move, with their moves summarised.
+
+        Returns (indices, in-table move count, best capture/promotion win,
+        drawn capture/promotion exists, longest capture/promotion loss,
+        any capture/promotion, in check).  With table, a StoredTable of
+        this material, moves within the table are looked up in it as
+        well instead of counted (see verify).
+        """
+        index = np.arange(start, stop, dtype=np.int64)
+        squares = self.decode(index)
+        rows = np.flatnonzero(self.legal(squares, side))
+        index = index[rows]
+        squares = [square[rows] for square in squares]
+        occupied = self.occupancy(squares)
+        count = np.zeros(len(index), dtype=np.int32)
+        best_win = np.full(len(index), 255, dtype=np.int32)
+        drawn = np.zeros(len(index), dtype=bool)
+        longest_loss = np.zeros(len(index), dtype=np.int32)
+        converts = np.zeros(len(index), dtype=bool)
+        king = side  # Index of side's king in self.pieces
+        enemies = self.side_pieces(side ^ 1, squares)
+
+        for piece, target, reach, captured, promotion in self.moves(side, squares, occupied):
+            after = (occupied ^ BIT[squares[piece]]) | BIT[target]
+            if captured is None and promotion is None and table is None:
+                # Quiet moves exist in most rows, so test them all rather than gather the ones that move
+                king_square = target if piece == king else squares[king]
+                count += reach & ~attacked(king_square, enemies, after)
+                continue
+            rows = np.flatnonzero(reach)
+            if not len(rows):
+                continue
+            moved = [square[rows] for square in squares]
+            moved[piece] = target[rows]
+            legal = ~attacked(moved[king], self.side_pieces(side ^ 1, moved, skip=captured), after[rows])
+            rows, moved = rows[legal], [square[legal] for square in moved]
+            if not len(rows):
+                continue
+            if captured is None and promotion is None:
+                values = table.values(side ^ 1, moved)
+            else:
+                subtable, swapped, order = self.conversion(piece, captured, promotion)
+                if subtable is None:
+                    drawn[rows] = converts[rows] = True
+                    continue
+                values = subtable.values(side ^ 1 ^ swapped, [moved[i] ^ 56 if swapped else moved[i] for i in order])
+            if (values == INVALID).any():
+                raise RuntimeError(f"{self.name}: a legal move leads to a position marked illegal")
+            wins = values >= LOSS  # The opponent is lost
+            # Each position has at most one move per batch, so plain fancy indexing is safe
+            won = rows[wins]
+            best_win[won] = np.minimum(best_win[won], values[wins].astype(np.int32) - LOSS + 1)
+            drawn[rows[values == DRAW]] = True
+            losses = (values != DRAW) & ~wins
+            lost = rows[losses]
+            longest_loss[lost] = np.maximum(longest_loss[lost], values[losses].astype(np.int32) + 1)
+            converts[rows] = True
+
+        in_check = attacked(squares[king], enemies, occupied)
+        return index, count, best_win, drawn, longest_loss, converts, in_check
+
+    # Retrograde moves
+
+    def predecessors(self, side, index):
+        """Positions, with the other side to move, that reach these ones by a move staying in the table."""
+        squares = self.decode(index)
+        mover = side ^ 1
+        occupied = self.occupancy(squares)
+        found = []
+        for piece, (kind, color) in enumerate(self.pieces):
+            if color != mover:
+                continue
+            weight = 64 ** (self.count - 1 - piece)
+            for origin, reach in self.unmoves(kind, mover, squares[piece], occupied):
+                rows = np.flatnonzero(reach)
+                if not len(rows):
+                    continue
+                origin, square = origin[rows], squares[piece][rows]
+                # The side now to move must not have been left in check
+                after = occupied[rows] ^ BIT[square] ^ BIT[origin]
+                attackers = [(other_kind, mover, origin if other == piece else squares[other][rows])
+                             for other, (other_kind, other_color) in enumerate(self.pieces) if other_color == mover]
+                legal = ~attacked(squares[side][rows], attackers, after)
+                found.append(index[rows[legal]] + (origin[legal] - square[legal]) * weight)
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def unmoves(self, kind, color, square, occupied):
+        """Yield (origins, rows) a piece on square could have come from without capturing."""
+        if kind == PAWN:
+            row = square >> 3
+            step = -PAWN_STEP[color]
+            origin = np.where((row != 0) & (row != 7), square + step, NONE)
+            origin_row = origin >> 3
+            from_back = (origin == NONE) | (origin_row == 0) | (origin_row == 7)
+            single = ~from_back & ((occupied & BIT[origin]) == 0)
+            yield origin, single
+            double_origin = np.where(row == PAWN_START_ROW[color] + 2 * PAWN_STEP[color] // 8, square + 2 * step, NONE)
+            yield double_origin, single & (double_origin != NONE) & ((occupied & BIT[double_origin]) == 0)
+        elif kind in LEAPS:
+            for slot in range(LEAPS[kind].shape[1]):
+                origin = LEAPS[kind][square, slot]
+                yield origin, (origin != NONE) & ((occupied & BIT[origin]) == 0)
+        else:
+            for direction in SLIDER_DIRECTIONS[kind]:
+                alive = None
+                for step in range(7):
+                    origin = RAYS[direction, square, step]
+                    reach = (origin != NONE) & ((occupied & BIT[origin]) == 0)
+                    alive = reach if alive is None else alive & reach
+                    yield origin, alive
+
+    # Passes
+
+    def assign(self, side, index, ply, win):
+        if ply > MAX_PLIES:
+            raise RuntimeError(f"{self.name}: mate distance over {MAX_PLIES} plies")
+        if len(index):
+            self.values[side, index] = ply if win else LOSS + ply
+            self.longest = max(self.longest, ply)
+            self.by_ply.setdefault(ply, []).append((side, index))
+
+    def initialise(self):
+        self.values = np.full((2, self.size), INVALID, dtype=np.uint8)
+        self.counter = np.zeros((2, self.size), dtype=np.uint8)
+        self.loss_ready = np.zeros((2, self.size), dtype=np.uint8)
+        for side in (WHITE, BLACK):
+            for start in range(0, self.size, CHUNK):
+                index, count, best_win, drawn, longest_loss, converts, in_check = \
+                    self.forward(side, start, min(start + CHUNK, self.size))
+                self.values[side, index] = UNKNOWN
+                self.counter[side, index] = count
+                # A position without moves in the table is decided by its captures and promotions alone
+                final = count == 0
+                self.assign(side, index[final & ~converts & in_check], 0, False)
+                self.values[side, index[final & ((~converts & ~in_check) | (drawn & (best_win == 255)))]] = DRAW
+                for ply in np.unique(best_win[final & (best_win != 255)]):
+                    self.assign(side, index[final & (best_win == ply)], int(ply), True)
+                lost = final & converts & ~drawn & (best_win == 255)
+                for ply in np.unique(longest_loss[lost]):
+                    self.assign(side, index[lost & (longest_loss == ply)], int(ply), False)
+                # Otherwise the retrograde passes decide; a drawing or winning capture rules out a loss
+                open_rows = ~final
+                self.loss_ready[side, index[open_rows]] = np.where(drawn | (best_win != 255), 255,
+                                                                   longest_loss)[open_rows]
+                for ply in np.unique(best_win[open_rows & (best_win != 255)]):
+                    self.conversion_wins.setdefault(int(ply), []).append(
+                        (side, index[open_rows & (best_win == ply)]))
+
+    def retrograde(self):
+        ply = 1
+        while self.by_ply or self.conversion_wins:
+            frontier = self.by_ply.pop(ply - 1, [])
+            for side in (WHITE, BLACK):
+                # Decided in many small pieces; one array per side keeps the batches large
+                decided = [index for decided_side, index in frontier if decided_side == side]
+                if not decided:
+                    continue
+                decided = np.concatenate(decided)
+                other = side ^ 1
+                for start in range(0, len(decided), CHUNK):
+                    found = self.predecessors(side, decided[start:start + CHUNK])
+                    # Most predecessors are decided already; dropping them first keeps the sorts small
+                    found = found[self.values[other, found] == UNKNOWN]
+                    if ply % 2:
+                        # Predecessors of a loss win by moving into it
+                        self.assign(other, np.unique(found), ply, True)
+                        continue
+                    # Predecessors of a win lose one move; once none are left, they are lost
+                    found, moves = np.unique(found, return_counts=True)
+                    left = self.counter[other, found].astype(np.int32) - moves
+                    self.counter[other, found] = left
+                    lost = found[left == 0]
+                    ready = self.loss_ready[other, lost]
+                    lost, ready = lost[ready != 255], np.maximum(ready[ready != 255], ply)
+                    for loss_ply in np.unique(ready):
+                        self.assign(other, lost[ready == loss_ply], int(loss_ply), False)
+            if ply % 2:
+                for side, candidates in self.conversion_wins.pop(ply, []):
+                    self.assign(side, candidates[self.values[side, candidates] == UNKNOWN], ply, True)
+            ply += 1
+        self.values[self.values == UNKNOWN] = DRAW
+
+    def write(self):
+        regions = KING_REGIONS[self.has_pawns]
+        stored = self.values.reshape(2, 64, self.size // 64)[:, list(regions), :]
+        path = os.path.join(self.directory, self.name + SUFFIX)
+        partial = path + '.part'
+        with open(partial, 'wb') as table_file:
+            table_file.write(HEADER.pack(MAGIC, VERSION, self.count, self.has_pawns, self.longest, self.name.encode('ascii')))
+            stored.tofile(table_file)
+        os.replace(partial, path)  # Never leave a half-written table where the probe looks
+
+    def generate(self):
+        """Solve the table and write it; returns a summary dict."""
+        start = time.perf_counter()
+        self.initialise()
+        self.retrograde()
+        self.write()
+        legal = self.values != INVALID
+        summary = {'name': self.name, 'positions': int(legal.sum()),
+                   'wins': int(((self.values >= 1) & (self.values < LOSS)).sum()),
+                   'losses': int(((self.values >= LOSS) & legal).sum()),
+                   'draws': int((self.values == DRAW).sum()), 'longest': self.longest,
+                   'seconds': time.perf_counter() - start}
+        self.values = self.counter = self.loss_ready = None
+        return summary
+
+    def verify(self):
+        """Positions whose stored value disagrees with the best of their moves' values; 0 for a sound table."""
+        table = StoredTable(os.path.join(self.directory, self.name + SUFFIX))
+        regions = KING_REGIONS[self.has_pawns]
+        block = self.size // 64  # Positions per white king square
+        wrong = 0
+        for side in (WHITE, BLACK):
+            for region in regions:
+                for start in range(region * block, (region + 1) * block, CHUNK):
+                    index, count, best_win, drawn, longest_loss, converts, in_check = \
+                        self.forward(side, start, min(start + CHUNK, (region + 1) * block), table)
+                    expected = np.where(best_win != 255, best_win,
+                                        np.where(drawn | (~converts & ~in_check), DRAW, LOSS + longest_loss))
+                    wrong += int((table.values(side, self.decode(index)) != expected).sum())
+        return wrong
+
+
+def _generate(name, directory):
+    return Generator(name, directory).generate()
+
+
+def generate_tables(names=None, directory=DEFAULT_DIRECTORY, workers=1, overwrite=False, report=print):
+    """Generate names (every 3- and 4-piece set by default) and the tables they need.
+
+    Up to workers tables are solved at once, each as soon as its
+    dependencies exist.  Tables already in directory are kept unless
+    overwrite.  Returns the summaries of the tables generated.
+    """
+    names = [material_name(*parse_material(name))[0] for name in names or standard_sets()]
+    for name in names:
+        if len(name) - 1 > MAX_PIECES:
+            raise ValueError(f"{name}: the tables go up to {MAX_PIECES} pieces")
+    os.makedirs(directory, exist_ok=True)
+    pending = with_dependencies(names)
+    done = set() if overwrite else {name for name in pending
+                                    if os.path.exists(os.path.join(directory, name + SUFFIX))}
+    pending = [name for name in pending if name not in done]
+    summaries = []
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                if len(running) < workers and dependencies(name) <= done:
+                    running[executor.submit(_generate, name, directory)] = name
+                    pending.remove(name)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                summary = future.result()
+                done.add(running.pop(future))
+                summaries.append(summary)
+                report(f"{summary['name']:>7}: {summary['positions']} positions, {summary['wins']} won, "
+                       f"{summary['draws']} drawn, {summary['losses']} lost, longest mate "
+                       f"{summary['longest']} plies, {summary['seconds']:.1f} s")
+    return summaries
+
+
+def verify_tables(names=None, directory=DEFAULT_DIRECTORY, report=print):
+    """Check every stored value against one step of search over the tables; returns the mismatch count."""
+    wrong = 0
+    for name in names or [name[:-len(SUFFIX)] for name in sorted(os.listdir(directory)) if name.endswith(SUFFIX)]:
+        start = time.perf_counter()
+        mismatches = Generator(name, directory).verify()
+        report(f"{name:>7}: {'ok' if not mismatches else f'{mismatches} positions disagree'} "
+               f"({time.perf_counter() - start:.1f} s)")
+        wrong += mismatches
+    return wrong
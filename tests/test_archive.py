@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from archive import GameArchive, export_archive, import_archive
+from gamestore import UNKNOWN_DATE, GameStore
+from position import parse_uci_move
+
+GAMES = (
+    # (moves, result, played_at)
+    ('e2e4 e7e5 d1h5 b8c6 f1c4 g8f6 h5f7', '1-0', '2024-05-06 07:08:09'),
+    ('d2d4 d7d5', '*', '2001-02-03'),
+    ('g1f3', '*', UNKNOWN_DATE),
+)
+
+
+def test_round_trip_keeps_games_and_dates(tmp_path):
+    source = GameStore(str(tmp_path / 'source.db'))
+    copy = GameStore(str(tmp_path / 'copy.db'))
+    try:
+        for moves, result, played_at in GAMES:
+            source.add_game([parse_uci_move(move) for move in moves.split()], result, name='Test', white='A',
+                            black='B', played_at=played_at)
+        assert export_archive(source, str(tmp_path / 'games.szg'))[0] == len(GAMES)
+        with GameArchive(str(tmp_path / 'games.szg')) as archive:
+            assert archive.game(2)[1] is None
+        assert import_archive(copy, str(tmp_path / 'games.szg'))[0] == len(GAMES)
+        assert list(copy.iter_games()) == list(source.iter_games())
+        # The undated game is still undated, not stamped with the import time
+        assert copy.game(3)[1] is None
+    finally:
+        source.close()
+        copy.close()
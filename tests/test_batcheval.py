@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip('numpy', minversion='2.0')
+
+from batcheval import encode_positions, evaluate_batch, evaluate_position
+from engine import evaluate
+from position import PERFT_SUITE, START_FEN, Position
+
+FENS = [START_FEN] + [fen for _, fen, _ in PERFT_SUITE] + ['k7/8/2Q5/8/8/8/8/7K b - - 0 1']
+
+
+def test_batch_matches_position_by_position():
+    positions = [Position.from_fen(fen) for fen in FENS]
+    boards, sides = encode_positions(positions)
+    assert list(evaluate_batch(boards, sides)) == [evaluate_position(position) for position in positions]
+    assert list(evaluate_batch(boards, sides, terms=('material',))) == [evaluate(position) for position in positions]
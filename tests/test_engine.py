@@ -0,0 +1,43 @@
+from engine import MATE_SCORE, Engine, SearchPool
+from position import PERFT_SUITE, Position, move_to_uci
+
+
+def test_search_finds_mate_in_one():
+    engine = Engine()
+    engine.tablebases = None  # The search itself has to find it
+    result = engine.search(Position.from_fen('k7/8/1K6/8/8/8/8/2Q5 w - - 0 1'), time_limit=None, max_depth=4)
+    assert move_to_uci(result.best_move) == 'c1c8'
+    assert result.score == MATE_SCORE - 1
+
+
+def test_search_prefers_material():
+    # Black's queen hangs to the knight
+    engine = Engine()
+    result = engine.search(Position.from_fen('4k3/8/8/3q4/8/4N3/8/4K3 w - - 0 1'), time_limit=None, max_depth=3)
+    assert move_to_uci(result.best_move) == 'e3d5'
+    assert result.score > 200  # A knight up once the queen is gone
+
+
+def test_analyse_runs_every_search_to_depth():
+    # A search finishing first must not stop the others running beside it
+    pool = SearchPool(workers=2, threads=1)
+    try:
+        # The quick endgame search is submitted last, so it has the higher id and finishes first
+        positions = [Position.from_fen(PERFT_SUITE[1][1]), Position.from_fen('8/8/4k3/8/8/4K3/4P3/8 w - - 0 1')]
+        results = [future.result(timeout=120) for future in pool.analyse(positions, time_limit=None, max_depth=4)]
+    finally:
+        pool.shutdown()
+    assert [result.depth for result in results] == [4, 4]
+    assert all(result.best_move is not None for result in results)
+
+
+def test_lazy_smp_helpers_stop_with_their_search():
+    pool = SearchPool(workers=2, threads=2)
+    try:
+        future = pool.submit(Position.initial(), time_limit=None, max_depth=3)
+        assert future.result(timeout=120).depth == 3
+        # The helper has no depth limit of its own and must notice its main search finished
+        for helper in future.helpers:
+            helper.result(timeout=60)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,68 @@
+import asyncio
+
+from netplay import Guest, Host
+from position import parse_uci_move
+
+
+async def _connect(host, guest):
+    host_task = asyncio.create_task(host.run('127.0.0.1', 0))
+    while host.listening is None or not host.listening.is_set():
+        await asyncio.sleep(0.01)
+    guest_task = asyncio.create_task(guest.run('127.0.0.1', host.port))
+    while host.connection is None:
+        await asyncio.sleep(0.01)
+    return host_task, guest_task
+
+
+def test_idle_guest_loses_on_time():
+    async def session():
+        results = []
+        host = Host(clock_ms=300)
+        guest = Guest(clock_ms=300, on_result=lambda result, reason: results.append((result, reason)))
+        host_task, guest_task = await _connect(host, guest)
+        await host.play(parse_uci_move('e2e4'))
+        # The guest never answers; the host must flag it without any further message
+        await asyncio.wait_for(guest.finished.wait(), timeout=5)
+        host.close()
+        await asyncio.wait_for(asyncio.gather(host_task, guest_task), timeout=5)
+        return host.game.result, results, host.game.clocks
+
+    host_result, guest_results, clocks = asyncio.run(session())
+    assert host_result == ('1-0', 'time')
+    assert guest_results == [('1-0', 'time')]
+    assert clocks[1] <= 0 < clocks[0]
+
+
+def test_idle_host_loses_on_time_before_its_first_move():
+    async def session():
+        host = Host(clock_ms=200)
+        guest = Guest(clock_ms=200)
+        host_task, guest_task = await _connect(host, guest)
+        await asyncio.wait_for(guest.finished.wait(), timeout=5)
+        host.close()
+        await asyncio.wait_for(asyncio.gather(host_task, guest_task), timeout=5)
+        return guest.game.result
+
+    assert asyncio.run(session()) == ('0-1', 'time')
+
+
+def test_host_refuses_moves_after_the_game_ends():
+    async def session():
+        statuses = []
+        host = Host(clock_ms=200, on_status=statuses.append)
+        guest = Guest(clock_ms=200)
+        host_task, guest_task = await _connect(host, guest)
+        await asyncio.wait_for(guest.finished.wait(), timeout=5)
+        await host.play(parse_uci_move('e2e4'))
+        host.close()
+        await asyncio.wait_for(asyncio.gather(host_task, guest_task), timeout=5)
+        return host.game.ply, guest.game.ply, statuses
+
+    host_ply, guest_ply, statuses = asyncio.run(session())
+    assert host_ply == guest_ply == 0
+    assert 'move not played' in statuses[-1]
+
+
+def test_close_before_run():
+    Host().close()
+    Guest().close()
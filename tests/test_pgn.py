@@ -0,0 +1,29 @@
+from gamestore import GameStore
+from pgn import export_pgn, import_pgn
+
+UNDATED = """[Event "Casual"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+"""
+
+
+def test_game_without_date_round_trips(tmp_path):
+    source = tmp_path / 'in.pgn'
+    source.write_text(UNDATED + UNDATED.replace('[Event "Casual"]', '[Event "Dated"]\n[Date "2001.02.03"]'),
+                      encoding='utf-8')
+    store = GameStore(str(tmp_path / 'games.db'))
+    try:
+        assert import_pgn(store, str(source), report=lambda message: None)[:2] == (2, 0)
+        (_, undated_at, *_), (_, dated_at, *_) = store.game(1), store.game(2)
+        assert undated_at is None
+        assert dated_at == '2001-02-03'
+        export_pgn(store, str(tmp_path / 'out.pgn'))
+    finally:
+        store.close()
+    exported = (tmp_path / 'out.pgn').read_text(encoding='utf-8')
+    assert exported.count('[Date "????.??.??"]') == 1
+    assert '[Date "2001.02.03"]' in exported
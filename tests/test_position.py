@@ -0,0 +1,19 @@
+import pytest
+
+from position import PERFT_SUITE, Position, perft
+
+
+@pytest.mark.parametrize('name, fen, counts', PERFT_SUITE, ids=[name for name, _, _ in PERFT_SUITE])
+def test_perft_depth_3(name, fen, counts):
+    assert perft(Position.from_fen(fen), 3) == counts[2]
+
+
+@pytest.mark.parametrize('fen', [
+    '8/8/8/8/8/8/8/K7 w - - 0 1',
+    '7k/8/8/8/8/8/8/8 w - - 0 1',
+    'kk6/8/8/8/8/8/8/K7 w - - 0 1',
+    'k7/8/8/8/8/8/8/KK6 b - - 0 1',
+])
+def test_fen_needs_one_king_a_side(fen):
+    with pytest.raises(ValueError, match="one king"):
+        Position.from_fen(fen)
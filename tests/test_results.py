@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from gamestore import to_db_key
+from pgn import PgnError, parse_game, read_games
+from position import Position, parse_uci_move
+from replay import replay_game
+
+STALEMATE_START = 'k7/8/2Q5/8/8/8/8/7K w - - 0 1'  # 1. Qc7 stalemates
+STALEMATE = 'k7/2Q5/8/8/8/8/8/7K b - - 1 1'
+
+
+def _replay(result):
+    position = Position.from_fen(STALEMATE_START)
+    move = parse_uci_move('c6c7')
+    position.make_move(move)
+    return replay_game(result, STALEMATE_START, 1, [(move, to_db_key(position.hash))])[:2]
+
+
+def _parse(result):
+    text = f'[SetUp "1"]\n[FEN "{STALEMATE_START}"]\n[Result "{result}"]\n\n1. Qc7 {result}\n\n'
+    return parse_game(next(read_games(io.StringIO(text))))
+
+
+def test_unfinished_game_ending_in_stalemate_is_no_claim():
+    assert Position.from_fen(STALEMATE).result_conflict('*') is None
+    assert _parse('*')[2] == '*'
+    assert _replay('*') == ('ok', None)
+
+
+def test_contradicted_result_is_flagged_by_import_and_replay():
+    assert Position.from_fen(STALEMATE).result_conflict('1-0') == ('1/2-1/2', 'stalemate')
+    with pytest.raises(PgnError, match='stalemate'):
+        _parse('1-0')
+    assert _replay('1-0')[0] == 'wrong_result'
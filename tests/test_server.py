@@ -0,0 +1,84 @@
+import asyncio
+
+from gamestore import GameStore
+from netplay import Connection
+from server import GameServer
+
+
+async def _expect(connection, command):
+    while True:
+        fields = await asyncio.wait_for(connection.receive(), timeout=5)
+        if fields[0] == command:
+            return fields
+
+
+def test_idle_player_loses_on_time(tmp_path):
+    db_path = str(tmp_path / 'games.db')
+
+    async def session():
+        # Idle games are suspended quickly too, so the flag has to reach a game that is on disk
+        server = GameServer(db_path, str(tmp_path / 'suspended'), clock_ms=500, idle_seconds=0.1,
+                            report=lambda text: None)
+        server_task = asyncio.create_task(server.run('127.0.0.1', 0))
+        while server.port is None:
+            await asyncio.sleep(0.01)
+        white = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        black = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        await white.send('new')
+        game_id = (await _expect(white, 'game'))[1]
+        await black.send('join', game_id)
+        await _expect(black, 'game')
+        await white.send('move', game_id, 0, 'e2e4')
+        await _expect(white, 'move')
+        # Black never moves
+        results = [await _expect(connection, 'result') for connection in (white, black)]
+        suspended = server.stats['suspended']
+        white.close()
+        black.close()
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+        return game_id, results, suspended, server.games, server.flag_timers
+
+    game_id, results, suspended, games, timers = asyncio.run(session())
+    assert results == [['result', game_id, '1-0', 'time']] * 2
+    assert suspended >= 1
+    assert not games and not timers
+    store = GameStore(db_path)
+    try:
+        assert store.game(1)[4] == '1-0'
+    finally:
+        store.close()
+
+
+def test_spectator_catches_up_in_one_batch(tmp_path):
+    async def session():
+        server = GameServer(str(tmp_path / 'games.db'), str(tmp_path / 'suspended'), report=lambda text: None)
+        server_task = asyncio.create_task(server.run('127.0.0.1', 0))
+        while server.port is None:
+            await asyncio.sleep(0.01)
+        white = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        black = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        spectator = Connection(*await asyncio.open_connection('127.0.0.1', server.port))
+        await white.send('new')
+        game_id = (await _expect(white, 'game'))[1]
+        await black.send('join', game_id)
+        await _expect(black, 'game')
+        for ply, (player, uci) in enumerate(((white, 'e2e4'), (black, 'e7e5'), (white, 'g1f3'))):
+            await player.send('move', game_id, ply, uci)
+            last_move = await _expect(player, 'move')
+        await spectator.send('watch', game_id, 1)
+        catch_up = await _expect(spectator, 'moves')
+        for connection in (white, black, spectator):
+            connection.close()
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+        return game_id, catch_up, last_move
+
+    game_id, catch_up, last_move = asyncio.run(session())
+    assert catch_up == ['moves', game_id, '1', *last_move[4:], 'e7e5', 'g1f3']
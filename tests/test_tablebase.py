@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+import tablebase
+import tbgen
+from position import Position
+
+
+@pytest.fixture(scope='module')
+def kqvk_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tablebases')
+    summary, = tbgen.generate_tables(['KQvK'], str(directory), report=lambda text: None)
+    assert summary['longest'] == 20  # Ten moves, the known longest KQvK mate
+    return directory
+
+
+def test_default_tablebases_picks_up_tables_generated_later(kqvk_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(tablebase, 'DEFAULT_DIRECTORY', str(tmp_path / 'tablebases'))
+    assert tablebase.default_tablebases() is None
+    (tmp_path / 'tablebases').mkdir()
+    assert tablebase.default_tablebases() is None
+    (tmp_path / 'tablebases' / 'KQvK.tbl').write_bytes((kqvk_dir / 'KQvK.tbl').read_bytes())
+    tablebases = tablebase.default_tablebases()
+    assert tablebases is not None and tablebases.names == {'KQvK'}
+    assert tablebase.default_tablebases() is tablebases
+    tablebases.close()
+
+
+@pytest.mark.parametrize('fen, expected', [
+    ('k7/8/1K6/8/8/8/8/2Q5 w - - 0 1', (1, 1)),  # Qc8 mates
+    ('k7/1Q6/1K6/8/8/8/8/8 b - - 0 1', (-1, 0)),  # Mated already
+    ('k7/2Q5/1K6/8/8/8/8/8 b - - 0 1', (0, 0)),  # Stalemate
+    ('7k/8/8/8/8/8/8/KQ6 b - - 0 1', (-1, 16)),
+    ('kq6/8/8/8/8/8/8/7K w - - 0 1', (-1, 16)),  # The same with the colours swapped
+])
+def test_probe_kqvk(kqvk_dir, fen, expected):
+    tablebases = tablebase.Tablebases(str(kqvk_dir))
+    try:
+        assert tablebases.probe(Position.from_fen(fen)) == expected
+        assert tablebases.probe(Position.from_fen('k7/8/1K6/8/8/8/8/7Q w - - 0 1')) is None  # Black in check
+        assert tablebases.probe(Position.from_fen('k7/8/1K6/8/8/8/8/1RR5 w - - 0 1')) is None  # No KRRvK table
+    finally:
+        tablebases.close()
@@ -0,0 +1,21 @@
+import pytest
+
+import tournament
+
+
+def test_openings_file_without_lines_is_rejected(tmp_path):
+    path = tmp_path / 'openings.txt'
+    path.write_text("# only a comment\n\n   \n", encoding='utf-8')
+    with pytest.raises(ValueError, match="no opening lines"):
+        tournament.load_openings(path)
+    with pytest.raises(ValueError):
+        tournament.run_match({}, {}, games=2, openings=(), report=lambda line: None)
+
+
+def test_openings_file_is_checked_for_illegal_moves(tmp_path):
+    path = tmp_path / 'openings.txt'
+    path.write_text("# main lines\ne2e4 e7e5\nd2d4 d7d5\n", encoding='utf-8')
+    assert tournament.load_openings(path) == ('e2e4 e7e5', 'd2d4 d7d5')
+    path.write_text("e2e4 e2e4\n", encoding='utf-8')
+    with pytest.raises(ValueError, match="illegal move"):
+        tournament.load_openings(path)
@@ -0,0 +1,47 @@
+import io
+import time
+
+from position import Position, parse_uci_move
+from uci import UciSession
+
+
+def wait_for_bestmove(output, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        lines = output.getvalue().splitlines()
+        if lines and lines[-1].startswith('bestmove'):
+            return lines[-1]
+        time.sleep(0.01)
+    return None
+
+
+def test_scripted_session():
+    output = io.StringIO()
+    session = UciSession(output=output)
+    for line in ('uci', 'isready', 'position startpos moves e2e4 e7e5', 'go depth 2'):
+        assert session.handle(line)
+    session.search_thread.join(30)
+    assert session.handle('stop')
+    assert not session.handle('quit')
+
+    lines = output.getvalue().splitlines()
+    assert lines[:2] == ['id name Szachy', 'id author Chess-Game contributors']
+    assert 'uciok' in lines and lines.index('uciok') < lines.index('readyok')
+    assert [line.split()[2] for line in lines if line.startswith('info depth')] == ['1', '2']
+    assert lines[-1].startswith('bestmove ')
+    position = Position.initial()
+    for text in ('e2e4', 'e7e5'):
+        position.make_move(parse_uci_move(text))
+    assert position.is_legal(parse_uci_move(lines[-1].split()[1]))
+
+
+def test_ponderhit_starts_the_clock():
+    output = io.StringIO()
+    session = UciSession(output=output)
+    session.handle('position startpos moves e2e4')
+    session.handle('go ponder wtime 3000 btime 3000')
+    assert wait_for_bestmove(output, 0.5) is None  # Pondering waits for ponderhit or stop
+    session.handle('ponderhit')
+    assert wait_for_bestmove(output, 5) is not None
+    session.handle('quit')
+    session.stop()
@@ -0,0 +1,425 @@
+"""Engine-vs-engine matches for strength and speed regression testing.
+
+Two engine configurations play each other from a set of opening lines,
+every opening twice with colours swapped.  A configuration is a short
+spec string of comma-separated key=value pairs:
+
+    hash=16,movetime=0.1        this tree's engine, 16 MB table, 0.1 s a move
+    depth=4                     this tree's engine to a fixed depth
+    movetime=0.1,cmd=python ../old/szachy.py --uci
+                                another build, or any UCI engine, as a subprocess
+
+(cmd takes the rest of the string.)  Each game runs in a worker process
+of its own, so `concurrency` games are played at once.  The parent
+collects the finished games, stores them in the game database a batch
+at a time and keeps the match statistics: Elo difference with a 95%
+error margin, nodes per second, time-per-move percentiles, and crash,
+illegal-move and time-forfeit counts.  A game that reaches a position
+in the endgame tables (see tbgen.py) is adjudicated with their result.
+A worker that dies takes only its own game down: the pool is rebuilt
+and the remaining games go on, so a long run needs no supervision.
+"""
+
+import math
+import multiprocessing
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import tablebase
+from position import Position, WHITE, move_to_uci, parse_uci_move
+
+# Short, balanced opening lines in UCI notation; each is played with both colour assignments
+OPENINGS = (
+    'e2e4 e7e5 g1f3 b8c6',
+    'e2e4 c7c5 g1f3 d7d6',
+    'e2e4 c7c5 b1c3 b8c6',
+    'e2e4 e7e6 d2d4 d7d5',
+    'e2e4 c7c6 d2d4 d7d5',
+    'e2e4 d7d6 d2d4 g8f6',
+    'e2e4 g7g6 d2d4 f8g7',
+    'e2e4 d7d5 e4d5 d8d5',
+    'd2d4 d7d5 c2c4 e7e6',
+    'd2d4 d7d5 c2c4 c7c6',
+    'd2d4 g8f6 c2c4 e7e6',
+    'd2d4 g8f6 c2c4 g7g6',
+    'd2d4 f7f5 g2g3 g8f6',
+    'd2d4 d7d5 g1f3 g8f6',
+    'c2c4 e7e5 b1c3 g8f6',
+    'c2c4 c7c5 g1f3 b8c6',
+    'g1f3 d7d5 g2g3 g8f6',
+    'g1f3 g8f6 c2c4 e7e6',
+    'e2e4 e7e5 f2f4 e5f4',
+    'b2b3 e7e5 c1b2 b8c6',
+)
+
+DEFAULT_MOVETIME = 0.1
+MAX_PLIES = 300  # Adjudicated a draw after this many plies
+UCI_TIMEOUT = 10.0  # Seconds an external engine may take to answer beyond its move time
+REPORT_EVERY = 10  # Games between progress lines
+STORE_BATCH = 100  # Finished games per database transaction
+WORKER_RESTARTS = 10  # Pool rebuilds before a match is given up
+
+
+def load_openings(path):
+    """Opening lines from a file, one per line in UCI moves; '#' starts a comment line.
+
+    Raises ValueError for a file without any lines or with a line that
+    is not legal from the starting position.
+    """
+    with open(path, encoding='utf-8') as openings_file:
+        openings = tuple(line.strip() for line in openings_file if line.strip() and not line.startswith('#'))
+    if not openings:
+        raise ValueError(f"{path} has no opening lines")
+    for number, opening in enumerate(openings, 1):
+        position = Position.initial()
+        for text in opening.split():
+            try:
+                move = parse_uci_move(text)
+            except (ValueError, KeyError, IndexError):
+                move = None
+            if move is None or not position.is_legal(move):
+                raise ValueError(f"{path}: opening {number} ({opening!r}) has an illegal move {text}")
+            position.make_move(move)
+    return openings
+
+
+def parse_engine_spec(text):
+    """A configuration dict from a spec string such as 'hash=16,movetime=0.1'."""
+    spec = {'hash': 16, 'movetime': DEFAULT_MOVETIME, 'depth': None, 'cmd': None}
+    rest = text.strip()
+    while rest:
+        item, _, rest = rest.partition(',')
+        key, sep, value = item.partition('=')
+        key = key.strip()
+        if not sep or key not in spec:
+            raise ValueError(f"Bad engine option {item!r}; expected hash=, movetime=, depth= or cmd=")
+        if key == 'cmd':
+            spec['cmd'] = ','.join(filter(None, (value, rest))).strip()
+            break
+        spec[key] = float(value) if key == 'movetime' else int(value)
+    return spec
+
+
+def describe_spec(spec):
+    if spec['cmd']:
+        return f"{spec['cmd']} ({spec['movetime']} s/move)"
+    limit = f"depth {spec['depth']}" if spec['depth'] else f"{spec['movetime']} s/move"
+    return f"engine, {spec['hash']} MB hash, {limit}"
+
+
+class EngineCrash(Exception):
+    pass
+
+
+class InternalPlayer:
+    """This tree's engine, searched in the game's own process."""
+
+    def __init__(self, spec):
+        from engine import Engine
+        self.spec = spec
+        self.engine = Engine(hash_mb=spec['hash'])
+
+    def choose(self, position, moves):
+        spec = self.spec
+        depth = spec['depth']
+        result = self.engine.search(position.copy(), time_limit=None if depth else spec['movetime'],
+                                    max_depth=depth or 127)
+        return result.best_move, result.nodes
+
+    def close(self):
+        pass
+
+
+class UciPlayer:
+    """An external engine over UCI, for example another build of this program run with --uci."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.process = subprocess.Popen(shlex.split(spec['cmd']), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read, daemon=True).start()
+        self.send('uci')
+        self.wait_for('uciok', UCI_TIMEOUT)
+        self.send(f"setoption name Hash value {spec['hash']}")
+        self.send('ucinewgame')
+        self.send('isready')
+        self.wait_for('readyok', UCI_TIMEOUT)
+
+    def read(self):
+        for line in self.process.stdout:
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def send(self, line):
+        try:
+            self.process.stdin.write(line + '\n')
+        except OSError as e:
+            raise EngineCrash(f"engine stopped reading: {e}") from None
+
+    def wait_for(self, token, timeout):
+        """Lines up to and including the one starting with token."""
+        deadline = time.monotonic() + timeout
+        lines = []
+        while True:
+            try:
+                line = self.lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise EngineCrash(f"no {token} within {timeout:.1f} s") from None
+            if line is None:
+                raise EngineCrash(f"engine exited with code {self.process.wait()}")
+            lines.append(line)
+            if line.startswith(token):
+                return lines
+
+    def choose(self, position, moves):
+        spec = self.spec
+        self.send(f"position fen {position.fen()}")
+        self.send(f"go depth {spec['depth']}" if spec['depth'] else f"go movetime {int(spec['movetime'] * 1000)}")
+        lines = self.wait_for('bestmove', (spec['movetime'] or 0) + UCI_TIMEOUT)
+        nodes = 0
+        for line in lines:
+            fields = line.split()
+            if fields[0] == 'info' and 'nodes' in fields:
+                nodes = int(fields[fields.index('nodes') + 1])
+        best = lines[-1].split()[1]
+        try:
+            return parse_uci_move(best), nodes
+        except (ValueError, KeyError, IndexError):
+            return None, nodes
+
+    def close(self):
+        try:
+            self.send('quit')
+            self.process.wait(timeout=2)
+        except (EngineCrash, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+def make_player(spec):
+    return UciPlayer(spec) if spec['cmd'] else InternalPlayer(spec)
+
+
+def play_game(white_spec, black_spec, opening, max_plies=MAX_PLIES):
+    """Play one game in this process.
+
+    Returns a dict with the encoded moves (opening included), result,
+    reason, and per colour the thinking times, nodes searched and any
+    fault ('crash', 'illegal' or 'time').
+    """
+    position = Position.initial()
+    moves = []
+    for text in opening.split():
+        move = parse_uci_move(text)
+        if not position.is_legal(move):
+            raise ValueError(f"Opening {opening!r} has an illegal move {text}")
+        position.make_move(move)
+        moves.append(move)
+
+    record = {'moves': moves, 'times': ([], []), 'nodes': [0, 0], 'fault': [None, None]}
+    tablebases = tablebase.default_tablebases()
+    players = [None, None]
+    try:
+        for color, spec in ((WHITE, white_spec), (1 - WHITE, black_spec)):
+            try:
+                players[color] = make_player(spec)
+            except (EngineCrash, OSError) as e:
+                record['fault'][color] = 'crash'
+                return finish(record, color, f"crash: {e}")
+
+        while True:
+            outcome = position.outcome()
+            if outcome is not None:
+                record['result'], record['reason'] = outcome
+                return record
+            found = tablebases.probe(position) if tablebases else None
+            if found is not None:
+                wdl = found[0] if position.side == WHITE else -found[0]
+                record['result'], record['reason'] = ('0-1', '1/2-1/2', '1-0')[wdl + 1], 'tablebase'
+                return record
+            if len(moves) >= max_plies:
+                record['result'], record['reason'] = '1/2-1/2', 'move limit'
+                return record
+
+            side = position.side
+            legal = position.legal_moves()
+            spec = white_spec if side == WHITE else black_spec
+            start = time.perf_counter()
+            try:
+                move, nodes = players[side].choose(position, legal)
+            except EngineCrash as e:
+                record['fault'][side] = 'crash'
+                return finish(record, side, f"crash: {e}")
+            except Exception as e:
+                record['fault'][side] = 'crash'
+                return finish(record, side, f"crash: {type(e).__name__}: {e}")
+            elapsed = time.perf_counter() - start
+            record['times'][side].append(elapsed)
+            record['nodes'][side] += nodes
+            if move not in legal:
+                record['fault'][side] = 'illegal'
+                return finish(record, side, f"illegal move {move_to_uci(move) if move is not None else '(none)'}")
+            if not spec['depth'] and elapsed > spec['movetime'] * 3 + 1:
+                record['fault'][side] = 'time'
+                return finish(record, side, f"took {elapsed:.2f} s for a move")
+            position.make_move(move)
+            moves.append(move)
+    finally:
+        for player in players:
+            if player is not None:
+                player.close()
+
+
+def finish(record, loser, reason):
+    record['result'] = '0-1' if loser == WHITE else '1-0'
+    record['reason'] = reason
+    return record
+
+
+def elo_difference(wins, draws, losses):
+    """(Elo difference, 95% margin) from one side's wins, draws and losses; None if it cannot be told."""
+    games = wins + draws + losses
+    if not games:
+        return None
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(s):
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / s - 1)
+    return elo(score), (elo(min(score + margin, 1)) - elo(max(score - margin, 0))) / 2
+
+
+def percentiles(values, points=(50, 90, 99)):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {point: ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+
+
+class MatchStats:
+    """Running totals of a match, from engine A's side."""
+
+    def __init__(self):
+        self.wins = self.draws = self.losses = 0
+        self.times = ([], [])  # Per engine (A, B), seconds per move
+        self.nodes = [0, 0]
+        self.faults = [{'crash': 0, 'illegal': 0, 'time': 0}, {'crash': 0, 'illegal': 0, 'time': 0}]
+        self.aborted = 0  # Games lost to a dead worker process
+
+    def add(self, record, a_color):
+        result = record['result']
+        if result == '1/2-1/2':
+            self.draws += 1
+        elif (result == '1-0') == (a_color == WHITE):
+            self.wins += 1
+        else:
+            self.losses += 1
+        for engine, color in ((0, a_color), (1, 1 - a_color)):
+            self.times[engine].extend(record['times'][color])
+            self.nodes[engine] += record['nodes'][color]
+            fault = record['fault'][color]
+            if fault:
+                self.faults[engine][fault] += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score_line(self):
+        line = f"+{self.wins} ={self.draws} -{self.losses}"
+        elo = elo_difference(self.wins, self.draws, self.losses)
+        if elo:
+            line += f", Elo A-B {elo[0]:+.1f} +/- {elo[1]:.1f}"
+        return line
+
+    def report(self, names, elapsed):
+        lines = [f"{self.games} games in {elapsed:.0f} s: {self.score_line()}"]
+        for engine, name in enumerate(names):
+            times = self.times[engine]
+            total = sum(times)
+            nps = int(self.nodes[engine] / total) if total > 0 else 0
+            spread = [f"p{point} {value * 1000:.0f} ms" for point, value in percentiles(times).items()]
+            spread.append(f"max {max(times, default=0) * 1000:.0f} ms")
+            faults = ', '.join(f"{count} {kind}" for kind, count in self.faults[engine].items())
+            lines.append(f"  {name}: {nps} nodes/s, {len(times)} moves ({', '.join(spread)}), {faults}")
+        if self.aborted:
+            lines.append(f"  {self.aborted} games lost to dead worker processes")
+        return '\n'.join(lines)
+
+
+def run_match(spec_a, spec_b, games=100, concurrency=1, store=None, openings=OPENINGS, max_plies=MAX_PLIES,
+              report=print):
+    """Play games between two engine specs and return the MatchStats.
+
+    Game i uses opening i // 2 and gives engine A white when i is even.
+    Finished games go to store (a GameStore) STORE_BATCH at a time.
+    """
+    if not openings:
+        raise ValueError("No opening lines to play")
+    names = (f"A: {describe_spec(spec_a)}", f"B: {describe_spec(spec_b)}")
+    for name in names:
+        report(name)
+    stats = MatchStats()
+    pending = {}  # Game index -> engine A's colour
+    for index in range(games):
+        pending[index] = WHITE if index % 2 == 0 else 1 - WHITE
+    unsaved = []
+    start = time.perf_counter()
+
+    def save():
+        if store is not None and unsaved:
+            with store.transaction():
+                for record, white, black in unsaved:
+                    store.add_game(record['moves'], record['result'], name='Tournament', white=white, black=black,
+                                   validate=False)
+        unsaved.clear()
+
+    context = multiprocessing.get_context('spawn')
+    retries = 0
+    try:
+        while pending:
+            with ProcessPoolExecutor(max_workers=concurrency, mp_context=context) as executor:
+                futures = {}
+                for index, a_color in pending.items():
+                    white, black = (spec_a, spec_b) if a_color == WHITE else (spec_b, spec_a)
+                    opening = openings[(index // 2) % len(openings)]
+                    futures[executor.submit(play_game, white, black, opening, max_plies)] = index
+                try:
+                    for future in as_completed(futures):
+                        index = futures[future]
+                        try:
+                            record = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            report(f"Game {index} failed: {type(e).__name__}: {e}")
+                            del pending[index]
+                            stats.aborted += 1
+                            continue
+                        a_color = pending.pop(index)
+                        stats.add(record, a_color)
+                        white, black = names if a_color == WHITE else names[::-1]
+                        unsaved.append((record, white, black))
+                        if len(unsaved) >= STORE_BATCH:
+                            save()
+                        if stats.games % REPORT_EVERY == 0:
+                            report(f"{stats.games}/{games}: {stats.score_line()}")
+                except BrokenProcessPool:
+                    # A worker died (out of memory, a signal): start a fresh pool for the games left
+                    retries += 1
+                    report(f"Worker process died; restarting the pool ({len(pending)} games left)")
+                    if retries > WORKER_RESTARTS:
+                        report("Giving up after repeated worker deaths")
+                        stats.aborted += len(pending)
+                        break
+    finally:
+        save()
+    report(stats.report(names, time.perf_counter() - start))
+    return stats
@@ -0,0 +1,242 @@
+"""UCI front end: the engine as a headless process on stdin/stdout.
+
+Speaks enough of the Universal Chess Interface for GUIs and tournament
+managers: uci, isready, setoption (Hash), ucinewgame, position
+(startpos or fen, then moves), go (wtime/btime/winc/binc/movestogo,
+movetime, depth, infinite, ponder), stop, ponderhit and quit.  The
+search runs on a thread of its own so that stop and isready are answered
+while it thinks; it reports an info line per completed depth and a
+bestmove at the end.  go ponder searches without a limit until ponderhit,
+which starts the clock on the time the go command gave.  Moves are checked with position.Position, the same rules the
+board uses, and nothing here imports Qt.
+"""
+
+import sys
+import threading
+import time
+
+from engine import Engine, MATE_SCORE, MATE_BOUND, MAX_PLY
+from position import Position, WHITE, START_FEN, move_to_uci, parse_uci_move
+
+ENGINE_NAME = 'Szachy'
+ENGINE_AUTHOR = 'Chess-Game contributors'
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MOVE_OVERHEAD = 0.05  # Seconds kept back from every time budget for the GUI and the pipe
+DEFAULT_MOVES_TO_GO = 30  # Moves the remaining time is shared out over without a movestogo
+
+
+def format_score(score):
+    """'cp N' or 'mate N' as UCI wants it; mate distances are in moves, negative when getting mated."""
+    if score >= MATE_BOUND:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_BOUND:
+        return f"mate {-((MATE_SCORE + score) // 2)}"
+    return f"cp {score}"
+
+
+def time_budget(side_time, increment=0, moves_to_go=None):
+    """Seconds to think on one move given the clock, in milliseconds as the go command sends them."""
+    budget = side_time / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * 0.8
+    budget = min(budget, side_time * 0.5) / 1000 - MOVE_OVERHEAD
+    return max(budget, 0.01)
+
+
+class UciSession:
+    """One UCI conversation; feed it lines with handle() or hand it a stream with run()."""
+
+    def __init__(self, output=sys.stdout, hash_mb=DEFAULT_HASH_MB):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.hash_mb = hash_mb
+        self.stop_requested = threading.Event()
+        self.engine = self.new_engine()
+        self.position = Position.initial()
+        self.search_thread = None
+        # Cleared by go infinite and go ponder, which answer only after stop (or ponderhit)
+        self.bestmove_allowed = threading.Event()
+        self.pondering = False
+        self.ponder_limit = None  # Seconds the search gets once a ponderhit arrives
+        self.deadline = None  # time.perf_counter() the search ends at, set by ponderhit
+
+    def new_engine(self):
+        engine = Engine(hash_mb=self.hash_mb)
+        # Polled by the search itself, so a stop sent before the thread gets going still counts
+        engine.cancel_check = self.search_cancelled
+        return engine
+
+    def search_cancelled(self):
+        deadline = self.deadline
+        return self.stop_requested.is_set() or (deadline is not None and time.perf_counter() > deadline)
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, stream=sys.stdin):
+        for line in stream:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        """Act on one command line; returns False after quit."""
+        fields = line.split()
+        if not fields:
+            return True
+        command, args = fields[0], fields[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.engine.tt.clear()
+            self.position = Position.initial()
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            return False
+        else:
+            self.send(f"info string Unknown command: {line.strip()}")
+        return True
+
+    def set_option(self, args):
+        # setoption name <name> [value <value>]
+        text = ' '.join(args)
+        name, _, value = text.partition(' value ')
+        name = name.removeprefix('name ').strip().lower()
+        if name == 'hash':
+            try:
+                hash_mb = min(max(int(value), 1), MAX_HASH_MB)
+            except ValueError:
+                self.send(f"info string Invalid Hash value: {value}")
+                return
+            self.stop()
+            self.hash_mb = hash_mb
+            self.engine = self.new_engine()
+        elif name != 'ponder':  # Only tells us whether go ponder may come; nothing to set
+            self.send(f"info string Unknown option: {name}")
+
+    def set_position(self, args):
+        if 'moves' in args:
+            split = args.index('moves')
+            setup, moves = args[:split], args[split + 1:]
+        else:
+            setup, moves = args, []
+        try:
+            if setup[:1] == ['startpos']:
+                position = Position.initial()
+            elif setup[:1] == ['fen']:
+                position = Position.from_fen(' '.join(setup[1:]) or START_FEN)
+            else:
+                raise ValueError(f"expected startpos or fen, got {' '.join(setup)!r}")
+            for text in moves:
+                move = parse_uci_move(text)
+                if not position.is_legal(move):
+                    raise ValueError(f"illegal move {text}")
+                position.make_move(move)
+        except (ValueError, KeyError, IndexError) as e:
+            self.send(f"info string Invalid position: {e}")
+            return
+        self.position = position
+
+    def go(self, args):
+        options = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            if args[index] in ('infinite', 'ponder'):
+                flags.add(args[index])
+                index += 1
+            elif index + 1 < len(args):
+                try:
+                    options[args[index]] = int(args[index + 1])
+                except ValueError:
+                    pass  # searchmoves and anything else unsupported
+                index += 2
+            else:
+                index += 1
+
+        side_time, increment = ('wtime', 'winc') if self.position.side == WHITE else ('btime', 'binc')
+        max_depth = min(max(options.get('depth', MAX_PLY - 1), 1), MAX_PLY - 1)
+        if 'infinite' in flags:
+            time_limit = None
+        elif 'movetime' in options:
+            time_limit = max(options['movetime'] / 1000 - MOVE_OVERHEAD, 0.01)
+        elif side_time in options:
+            time_limit = time_budget(options[side_time], options.get(increment, 0), options.get('movestogo'))
+        elif 'depth' in options:
+            time_limit = None
+        else:
+            time_limit = 1.0
+        # Pondering searches on the opponent's time; the limit applies from ponderhit on
+        self.pondering = 'ponder' in flags
+        if self.pondering:
+            self.ponder_limit, time_limit = time_limit, None
+
+        self.deadline = None
+        self.stop_requested.clear()
+        if flags:
+            self.bestmove_allowed.clear()
+        else:
+            self.bestmove_allowed.set()
+        self.search_thread = threading.Thread(
+            target=self.search, args=(self.position.copy(), time_limit, max_depth), daemon=True)
+        self.search_thread.start()
+
+    def search(self, position, time_limit, max_depth):
+        result = self.engine.search(position, time_limit=time_limit, max_depth=max_depth,
+                                    info_callback=self.send_info)
+        self.bestmove_allowed.wait()  # Even after a mate is found
+        if result.best_move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) > 1:
+            self.send(f"bestmove {move_to_uci(result.best_move)} ponder {move_to_uci(result.pv[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(result.best_move)}")
+
+    def send_info(self, result):
+        pv = ' '.join(move_to_uci(move) for move in result.pv)
+        self.send(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+                  f"nps {result.nps} time {int(result.elapsed * 1000)} hashfull {self.engine.tt.hashfull()} "
+                  f"tbhits {self.engine.tb_hits} pv {pv}")
+
+    def ponderhit(self):
+        """The opponent played the move we pondered on: search on as a normal timed search."""
+        if self.search_thread is None or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponder_limit is not None:
+            self.deadline = time.perf_counter() + self.ponder_limit
+        self.bestmove_allowed.set()
+
+    def stop(self):
+        """End the running search, if any, and wait for its bestmove."""
+        thread = self.search_thread
+        if thread is None:
+            return
+        self.stop_requested.set()
+        self.bestmove_allowed.set()
+        thread.join()
+        self.search_thread = None
+
+
+def main(hash_mb=DEFAULT_HASH_MB):
+    UciSession(hash_mb=hash_mb).run()
+    return 0